@@ -3,8 +3,12 @@
 Quick Backend Status Checker for Virtual Garden
 """
 
-import requests
-import json
+from garden_client import (
+    PlantDetectionClient,
+    PlantDetectionError,
+    BackendUnavailableError,
+    BackendTimeoutError,
+)
 
 def check_backend_status():
     """Check if the backend is running and YOLOv5 model is loaded"""
@@ -12,57 +16,54 @@ def check_backend_status():
     print("🔍 Checking Virtual Garden Backend...")
     print("-" * 40)
     
+    # Status checks fail fast instead of retrying
+    client = PlantDetectionClient(timeout=3, max_retries=0)
     try:
         # Test health endpoint
-        response = requests.get("http://localhost:8000/health", timeout=3)
+        data = client.health()
+        print("✅ Backend is RUNNING!")
+        print(f"   Status: {data.get('status')}")
+        print(f"   Model loaded: {data.get('model_loaded')}")
         
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Backend is RUNNING!")
-            print(f"   Status: {data.get('status')}")
-            print(f"   Model loaded: {data.get('model_loaded')}")
-            
-            # Test root endpoint
-            root_response = requests.get("http://localhost:8000/", timeout=3)
-            if root_response.status_code == 200:
-                root_data = root_response.json()
-                print(f"   API Version: {root_data.get('version')}")
-                print(f"   Message: {root_data.get('message')}")
-            
-            # Check plant categories
-            try:
-                cat_response = requests.get("http://localhost:8000/api/plant-categories", timeout=3)
-                if cat_response.status_code == 200:
-                    cat_data = cat_response.json()
-                    categories = cat_data.get('categories', {})
-                    print(f"   Plant categories available: {len(categories)}")
-                    print(f"   Sample plants: {list(categories.keys())[:5]}")
-            except:
-                pass
-            
-            print("\n🎯 Backend is ready for plant detection!")
-            print("   Upload an image in your Virtual Garden frontend")
-            
-            return True
-            
-        else:
-            print(f"❌ Backend returned status code: {response.status_code}")
-            return False
-            
-    except requests.exceptions.ConnectionError:
+        # Test root endpoint
+        root_data = client.root()
+        print(f"   API Version: {root_data.get('version')}")
+        print(f"   Message: {root_data.get('message')}")
+        
+        # Check plant categories
+        try:
+            categories = client.plant_categories()
+            print(f"   Plant categories available: {len(categories)}")
+            print(f"   Sample plants: {list(categories.keys())[:5]}")
+        except PlantDetectionError:
+            pass
+        
+        print("\n🎯 Backend is ready for plant detection!")
+        print("   Upload an image in your Virtual Garden frontend")
+        
+        return True
+        
+    except BackendUnavailableError:
         print("❌ Backend is NOT running on localhost:8000")
         print("\n🚀 To start the backend:")
         print("   cd ml-backend")
         print("   uvicorn main:app --reload")
         return False
         
-    except requests.exceptions.Timeout:
+    except BackendTimeoutError:
         print("❌ Backend connection timeout")
         return False
         
+    except PlantDetectionError as e:
+        print(f"❌ Backend returned status code: {e.status_code}")
+        return False
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         return False
+    
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     is_running = check_backend_status()
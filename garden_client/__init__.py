@@ -0,0 +1,35 @@
+"""
+Python client for the Virtual Garden Plant Detection API
+
+    from garden_client import PlantDetectionClient
+
+    with PlantDetectionClient("http://localhost:8000") as client:
+        print(client.health())
+        result = client.detect("garden.jpg")
+
+``AsyncPlantDetectionClient`` (requires httpx) offers the same calls as coroutines.
+"""
+
+from .client import (
+    PlantDetectionClient,
+    PlantDetectionError,
+    BackendUnavailableError,
+    BackendTimeoutError,
+    DEFAULT_BASE_URL,
+)
+from .formats import expand_columnar
+
+try:
+    from .async_client import AsyncPlantDetectionClient
+except ImportError:  # pragma: no cover - httpx is optional
+    AsyncPlantDetectionClient = None
+
+__all__ = [
+    "PlantDetectionClient",
+    "AsyncPlantDetectionClient",
+    "PlantDetectionError",
+    "BackendUnavailableError",
+    "BackendTimeoutError",
+    "DEFAULT_BASE_URL",
+    "expand_columnar",
+]
@@ -0,0 +1,142 @@
+"""
+Asynchronous client for the Plant Detection API built on httpx
+"""
+
+import asyncio
+import random
+from typing import Dict, Any, List, Optional, Sequence
+
+import httpx
+
+from .client import (
+    DEFAULT_BASE_URL,
+    MAX_RETRY_AFTER,
+    RETRY_STATUSES,
+    ImageInput,
+    PlantDetectionError,
+    BackendUnavailableError,
+    BackendTimeoutError,
+    read_image,
+)
+from .formats import decode_detections, preferred_accept
+
+
+class AsyncPlantDetectionClient:
+    """Async counterpart of ``PlantDetectionClient``.
+
+    Shares one pooled ``httpx.AsyncClient``; ``detect_many`` bounds the number of
+    in-flight requests with a semaphore. Retries on 429/503 and connection errors
+    use exponential backoff with jitter and honour ``Retry-After`` (up to ``MAX_RETRY_AFTER``).
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, timeout: float = 30.0, max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 10, compact: bool = True,
+                 headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.compact = compact
+        self._batch_supported: Optional[bool] = None
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            headers=headers,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        return self.backoff_factor * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TimeoutException as e:
+                raise BackendTimeoutError(f"Timed out calling {path}: {e}") from e
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise BackendUnavailableError(f"Cannot connect to backend at {self.base_url}: {e}") from e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, response))
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise PlantDetectionError(f"{method} {path} failed: {detail}", response.status_code)
+        return response
+
+    async def health(self) -> Dict[str, Any]:
+        return (await self._request("GET", "/health")).json()
+
+    async def plant_categories(self) -> Dict[str, Any]:
+        return (await self._request("GET", "/api/plant-categories")).json()["categories"]
+
+    async def detect(self, image: ImageInput) -> Dict[str, Any]:
+        filename, data, content_type = read_image(image)
+        headers = {"Accept": preferred_accept()} if self.compact else {}
+        response = await self._request("POST", "/api/detect-plants",
+                                       files={"file": (filename, data, content_type)}, headers=headers)
+        return decode_detections(response.headers.get("content-type"), response.content, response.json)[0]
+
+    async def detect_batch(self, images: Sequence[ImageInput]) -> List[Dict[str, Any]]:
+        files = [("files", read_image(image, i)) for i, image in enumerate(images)]
+        headers = {"Accept": preferred_accept()} if self.compact else {}
+        response = await self._request("POST", "/api/detect-plants/batch", files=files, headers=headers)
+        return decode_detections(response.headers.get("content-type"), response.content, response.json)
+
+    async def detect_many(self, images: Sequence[ImageInput], batch_size: int = 8,
+                          max_parallel: int = 4) -> List[Dict[str, Any]]:
+        """Detect plants in many images, at most ``max_parallel`` requests in flight, in input order"""
+        images = list(images)
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        if images and self._batch_supported is not False:
+            chunks = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+            try:
+                results = await asyncio.gather(*(bounded(self.detect_batch(chunk)) for chunk in chunks))
+                self._batch_supported = True
+                return [result for chunk_results in results for result in chunk_results]
+            except PlantDetectionError as e:
+                if e.status_code not in (404, 405):
+                    raise
+                self._batch_supported = False
+        return list(await asyncio.gather(*(bounded(self.detect(image)) for image in images)))
+
+    async def submit_job(self, images: Sequence[ImageInput]) -> str:
+        files = [("files", read_image(image, i)) for i, image in enumerate(images)]
+        return (await self._request("POST", "/api/jobs", files=files)).json()["job_id"]
+
+    async def get_job(self, job_id: str) -> Dict[str, Any]:
+        return (await self._request("GET", f"/api/jobs/{job_id}")).json()
+
+    async def wait_for_job(self, job_id: str, poll_interval: float = 1.0, timeout: float = 600.0) -> Dict[str, Any]:
+        async def poll():
+            while True:
+                job = await self.get_job(job_id)
+                if job["status"] in ("completed", "failed"):
+                    return job
+                await asyncio.sleep(poll_interval)
+        try:
+            return await asyncio.wait_for(poll(), timeout)
+        except asyncio.TimeoutError as e:
+            raise BackendTimeoutError(f"Job {job_id} did not finish within {timeout}s") from e
@@ -0,0 +1,203 @@
+"""
+Synchronous client for the Plant Detection API with pooled keep-alive connections
+"""
+
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .formats import decode_detections, preferred_accept
+
+DEFAULT_BASE_URL = "http://localhost:8000"
+RETRY_STATUSES = (429, 503)
+# Longest Retry-After (seconds) the clients will sleep for before retrying
+MAX_RETRY_AFTER = 60.0
+
+ImageInput = Union[bytes, str, "io.IOBase", Tuple[str, bytes]]
+
+
+class PlantDetectionError(Exception):
+    """Request to the Plant Detection API failed"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BackendUnavailableError(PlantDetectionError):
+    """Backend could not be reached"""
+
+
+class BackendTimeoutError(PlantDetectionError):
+    """Backend did not answer within the timeout"""
+
+
+def read_image(image: ImageInput, index: int = 0) -> Tuple[str, bytes, str]:
+    """Normalise an image argument to (filename, bytes, content_type)"""
+    if isinstance(image, tuple):
+        filename, data = image
+    elif isinstance(image, (bytes, bytearray)):
+        filename, data = f"image_{index}.jpg", bytes(image)
+    elif isinstance(image, str):
+        with open(image, "rb") as f:
+            filename, data = image.rsplit("/", 1)[-1], f.read()
+    else:
+        filename, data = getattr(image, "name", f"image_{index}.jpg"), image.read()
+    content_type = "image/png" if data[:8] == b"\x89PNG\r\n\x1a\n" else "image/jpeg"
+    return filename, data, content_type
+
+
+class CappedRetry(Retry):
+    """urllib3 Retry that waits at most MAX_RETRY_AFTER seconds for a Retry-After"""
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+
+class PlantDetectionClient:
+    """Client for the Plant Detection API.
+
+    One ``requests.Session`` with a sized connection pool is shared by every
+    call, so repeated requests reuse keep-alive connections. Requests answered
+    with 429/503 (or failing to connect) are retried with exponential backoff,
+    honouring ``Retry-After`` up to ``MAX_RETRY_AFTER`` seconds. Batch helpers use ``/api/detect-plants/batch``
+    and the compact msgpack encoding when the server supports them.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, timeout: float = 30.0, max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 10, compact: bool = True,
+                 headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.compact = compact
+        self._batch_supported: Optional[bool] = None
+
+        retry = CappedRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # uploads are idempotent, so POST is retried too
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}",
+                                            timeout=timeout or self.timeout, **kwargs)
+        except requests.exceptions.Timeout as e:
+            raise BackendTimeoutError(f"Timed out calling {path}: {e}") from e
+        except requests.exceptions.ConnectionError as e:
+            raise BackendUnavailableError(f"Cannot connect to backend at {self.base_url}: {e}") from e
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise PlantDetectionError(f"{method} {path} failed: {detail}", response.status_code)
+        return response
+
+    # Service information
+
+    def root(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._request("GET", "/", timeout).json()
+
+    def health(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._request("GET", "/health", timeout).json()
+
+    def plant_categories(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._request("GET", "/api/plant-categories", timeout).json()["categories"]
+
+    # Detection
+
+    def detect(self, image: ImageInput, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Detect plants in one image; always returns the standard JSON response shape"""
+        filename, data, content_type = read_image(image)
+        headers = {"Accept": preferred_accept()} if self.compact else {}
+        response = self._request("POST", "/api/detect-plants", timeout,
+                                 files={"file": (filename, data, content_type)}, headers=headers)
+        return decode_detections(response.headers.get("content-type"), response.content, response.json)[0]
+
+    def analyze_image_quality(self, image: ImageInput, timeout: Optional[float] = None) -> Dict[str, Any]:
+        filename, data, content_type = read_image(image)
+        response = self._request("POST", "/api/analyze-image-quality", timeout,
+                                 files={"file": (filename, data, content_type)})
+        return response.json()["quality"]
+
+    def detect_batch(self, images: Sequence[ImageInput], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Detect plants in several images with one request to the batch endpoint"""
+        files = [("files", read_image(image, i)) for i, image in enumerate(images)]
+        headers = {"Accept": preferred_accept()} if self.compact else {}
+        response = self._request("POST", "/api/detect-plants/batch", timeout, files=files, headers=headers)
+        return decode_detections(response.headers.get("content-type"), response.content, response.json)
+
+    def detect_many(self, images: Sequence[ImageInput], batch_size: int = 8, max_parallel: int = 4,
+                    timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Detect plants in many images with bounded parallelism.
+
+        Images are sent in chunks of ``batch_size`` to the batch endpoint, with
+        at most ``max_parallel`` requests in flight. Against servers without a
+        batch endpoint it falls back to parallel single-image requests.
+        Results are returned in input order.
+        """
+        images = list(images)
+        if not images:
+            return []
+        if self._batch_supported is not False:
+            chunks = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+            try:
+                with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+                    results = list(pool.map(lambda chunk: self.detect_batch(chunk, timeout), chunks))
+                self._batch_supported = True
+                return [result for chunk_results in results for result in chunk_results]
+            except PlantDetectionError as e:
+                if e.status_code not in (404, 405):
+                    raise
+                self._batch_supported = False
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            return list(pool.map(lambda image: self.detect(image, timeout), images))
+
+    # Asynchronous jobs
+
+    def submit_job(self, images: Sequence[ImageInput], timeout: Optional[float] = None) -> str:
+        """Queue images as an asynchronous job and return its id"""
+        files = [("files", read_image(image, i)) for i, image in enumerate(images)]
+        return self._request("POST", "/api/jobs", timeout, files=files).json()["job_id"]
+
+    def get_job(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._request("GET", f"/api/jobs/{job_id}", timeout).json()
+
+    def wait_for_job(self, job_id: str, poll_interval: float = 1.0, timeout: float = 600.0) -> Dict[str, Any]:
+        """Poll a job until it completes or fails"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job["status"] in ("completed", "failed"):
+                return job
+            if time.monotonic() > deadline:
+                raise BackendTimeoutError(f"Job {job_id} did not finish within {timeout}s")
+            time.sleep(poll_interval)
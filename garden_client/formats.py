@@ -0,0 +1,71 @@
+"""
+Decoding of the compact columnar detection format back into the standard JSON shape
+"""
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def preferred_accept() -> str:
+    """Accept header asking for msgpack when we can decode it, JSON otherwise"""
+    if msgpack is not None:
+        return f"{MSGPACK_MEDIA_TYPE}, {JSON_MEDIA_TYPE};q=0.5"
+    return JSON_MEDIA_TYPE
+
+
+def _column(value: Any) -> np.ndarray:
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype="<f4")
+    return np.asarray(value, dtype=np.float32)
+
+
+def expand_columnar(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turn a ``columnar-v1`` document into a list of regular detect-plants responses"""
+    species = document["species"]
+    responses = []
+    for image in document["images"]:
+        count = image["count"]
+        boxes = _column(image["boxes"]).reshape(-1, 4)
+        confidence = _column(image["confidence"])
+        extra_fields = [key for key in image if key not in ("count", "image_info", "species_id", "boxes", "confidence")]
+        plants = []
+        for i in range(count):
+            x1, y1, x2, y2 = (float(v) for v in boxes[i])
+            plant = dict(species[image["species_id"][i]])
+            plant.update({
+                "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1},
+                "confidence": float(confidence[i]),
+            })
+            for field in extra_fields:
+                plant[field] = image[field][i]
+            plants.append(plant)
+        responses.append({
+            "success": True,
+            "plants": plants,
+            "count": count,
+            "image_info": image["image_info"],
+            "message": f"Detected {count} plant(s)" if count else "No plants detected",
+        })
+    return responses
+
+
+def decode_detections(content_type: str, body: bytes, json_body: Any) -> List[Dict[str, Any]]:
+    """Normalise any detection response body to a list of standard responses"""
+    content_type = (content_type or "").split(";")[0].strip()
+    if content_type in (MSGPACK_MEDIA_TYPE, "application/x-msgpack"):
+        return expand_columnar(msgpack.unpackb(body, raw=False))
+    data = json_body()
+    if isinstance(data, dict) and data.get("format") == "columnar-v1":
+        return expand_columnar(data)
+    if isinstance(data, dict) and "results" in data:
+        return data["results"]
+    return [data]
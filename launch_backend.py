@@ -60,9 +60,14 @@ def main():
     print("\n   Press Ctrl+C to stop the server")
     print("=" * 55)
     
+    # Production profile by default; pass --reload for development auto-reload
+    serve_args = ["--reload"] if "--reload" in sys.argv[1:] else []
+    if os.getenv("WEB_CONCURRENCY"):
+        print(f"   Workers: {os.getenv('WEB_CONCURRENCY')}")
+    
     try:
-        # Start uvicorn server
-        os.system("uvicorn main:app --reload --host 0.0.0.0 --port 8000")
+        # Start uvicorn server through the non-reload launcher
+        return subprocess.run([sys.executable, "serve.py", *serve_args]).returncode
     except KeyboardInterrupt:
         print("\n🛑 Server stopped")
         return 0
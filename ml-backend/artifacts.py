@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Sequence
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_ROOT = Path(os.getenv("MODEL_ARTIFACT_DIR", "models/compiled"))
+MANIFEST = "manifest.json"
+TORCHSCRIPT = "torchscript"
+COMPILE = "compile"
+BACKENDS = (TORCHSCRIPT, COMPILE)
+
+
+def weights_hash(weights_path: str) -> str:
+    """Short content hash of a weights file; artifacts are only valid for these exact weights"""
+    digest = hashlib.sha256()
+    with open(weights_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def artifact_dir(weights_path: str, root: Path = ARTIFACT_ROOT) -> Path:
+    return root / f"{Path(weights_path).stem}-{weights_hash(weights_path)}"
+
+
+def torchscript_path(directory: Path, imgsz: int) -> Path:
+    # Tracing bakes the anchor grid in, so each inference size gets its own module
+    return directory / f"model-{imgsz}.torchscript"
+
+
+def inductor_cache_dir(directory: Path) -> Path:
+    return directory / "inductor"
+
+
+def enable_compile_cache(directory: Path):
+    """Point TorchInductor's on-disk caches at the artifact directory"""
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = str(inductor_cache_dir(directory).resolve())
+    import torch._inductor.config as inductor_config
+    if hasattr(inductor_config, "fx_graph_cache"):
+        inductor_config.fx_graph_cache = True
+
+
+def compile_network(net: torch.nn.Module) -> torch.nn.Module:
+    # Sizes vary with the adaptive resolution policy, so compile for dynamic shapes up front
+    return torch.compile(net, dynamic=True)
+
+
+def build_torchscript(weights_path: str, directory: Path, sizes: Sequence[int]) -> Dict[str, Any]:
+    """Export one frozen TorchScript module per inference size via the ultralytics exporter"""
+    from ultralytics import YOLO
+
+    built = {}
+    for imgsz in sizes:
+        staging = directory / f"staging-{imgsz}{Path(weights_path).suffix}"
+        shutil.copy(weights_path, staging)
+        exported = Path(YOLO(str(staging)).export(format="torchscript", imgsz=imgsz))
+        # Keep the ultralytics metadata (names, stride, imgsz) so YOLO() can load the frozen module
+        extra_files = {"config.txt": ""}
+        module = torch.jit.load(str(exported), _extra_files=extra_files, map_location="cpu")
+        frozen = torch.jit.freeze(module.eval())
+        target = torchscript_path(directory, imgsz)
+        torch.jit.save(frozen, str(target), _extra_files=extra_files)
+        staging.unlink()
+        exported.unlink()
+        built[str(imgsz)] = target.name
+        logger.info(f"Built {target}")
+    return {"files": built}
+
+
+def build_compile_cache(weights_path: str, directory: Path, sizes: Sequence[int]) -> Dict[str, Any]:
+    """Compile the network once per size so later processes load kernels from the cache"""
+    from ultralytics import YOLO
+
+    enable_compile_cache(directory)
+    net = compile_network(YOLO(weights_path).model.fuse().eval())
+    timings = {}
+    with torch.inference_mode():
+        for imgsz in sizes:
+            start = time.perf_counter()
+            net(torch.zeros(1, 3, imgsz, imgsz))
+            timings[str(imgsz)] = round(time.perf_counter() - start, 2)
+            logger.info(f"Compiled for {imgsz}px in {timings[str(imgsz)]}s")
+    return {"cache_dir": inductor_cache_dir(directory).name, "compile_seconds": timings}
+
+
+def build_artifacts(weights_path: str, sizes: Sequence[int], backends: Sequence[str] = BACKENDS,
+                    root: Path = ARTIFACT_ROOT) -> Path:
+    """Build optimized artifacts for ``weights_path`` and record them in the manifest"""
+    directory = artifact_dir(weights_path, root)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(directory) or {}
+    manifest.update({
+        "weights": str(weights_path),
+        "weights_hash": weights_hash(weights_path),
+        "torch_version": torch.__version__,
+        "sizes": sorted(set(sizes) | set(manifest.get("sizes", []))),
+    })
+    builders = {TORCHSCRIPT: build_torchscript, COMPILE: build_compile_cache}
+    artifacts = manifest.setdefault("artifacts", {})
+    for backend in backends:
+        info = builders[backend](weights_path, directory, sizes)
+        if backend == TORCHSCRIPT and TORCHSCRIPT in artifacts:
+            info["files"] = {**artifacts[TORCHSCRIPT]["files"], **info["files"]}
+        artifacts[backend] = info
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return directory
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((directory / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def find_artifacts(weights_path: str, root: Path = ARTIFACT_ROOT) -> Optional[Dict[str, Any]]:
+    """Manifest of prebuilt artifacts matching these weights and this torch build, if any"""
+    if not Path(weights_path).exists():
+        return None
+    directory = artifact_dir(weights_path, root)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    if manifest.get("torch_version") != torch.__version__:
+        logger.warning(f"Artifacts in {directory} were built with torch {manifest.get('torch_version')}, "
+                       f"running {torch.__version__}; ignoring them")
+        return None
+    manifest["directory"] = directory
+    return manifest
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Plant Detection API
+
+    python benchmark.py http --url http://localhost:8000 --batch-size 8 --repeats 10
+    python benchmark.py model --backends eager torchscript compile
+    python benchmark.py sizes --batch-size 8 --detections 40
+
+The http benchmark posts batches to /api/detect-plants/batch over a pooled
+keep-alive session and reports latency and response size for each
+combination of response format (Accept) and content encoding.
+
+The model benchmark starts a fresh process per model backend (raw weights,
+or artifacts built by export_model.py) and reports startup time, first
+inference and steady-state detection latency.
+
+The sizes benchmark needs no server or model: it builds batch responses with
+a fixed number of synthetic detections per image and reports the encoded and
+compressed size of each response format, using the same serializers and
+compression levels as the API.
+"""
+
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any
+
+import requests
+from PIL import Image, ImageDraw
+
+FORMATS = {
+    "json": "application/json",
+    "compact": "application/vnd.plant-detection.compact+json",
+    "msgpack": "application/msgpack",
+}
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def synthetic_image(index: int, size=(1280, 960)) -> bytes:
+    """Garden-like test image with a few green blobs"""
+    img = Image.new('RGB', size, color=(110, 80, 50))
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x = (i * 97 + index * 31) % (size[0] - 120)
+        y = (i * 53 + index * 17) % (size[1] - 120)
+        draw.ellipse([x, y, x + 100, y + 100], fill=(30, 120 + (i * 9) % 100, 40))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+
+def load_images(image_dir: str, count: int) -> List[bytes]:
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        return [p.read_bytes() for p in paths[:count]]
+    return [synthetic_image(i) for i in range(count)]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_http(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    images = load_images(args.images, args.batch_size)
+    files = [("files", (f"bench_{i}.jpg", data, "image/jpeg")) for i, data in enumerate(images)]
+    session = requests.Session()
+    url = f"{args.url}/api/detect-plants/batch"
+    rows = []
+
+    for fmt in args.formats:
+        for encoding in args.encodings:
+            headers = {"Accept": FORMATS[fmt], "Accept-Encoding": encoding}
+            latencies, wire_bytes = [], 0
+            for repeat in range(args.warmup + args.repeats):
+                start = time.perf_counter()
+                response = session.post(url, files=files, headers=headers, timeout=args.timeout, stream=True)
+                raw = response.raw.read(decode_content=False)
+                elapsed = time.perf_counter() - start
+                response.raise_for_status()
+                if repeat >= args.warmup:
+                    latencies.append(elapsed * 1000)
+                    wire_bytes = len(raw)
+            rows.append({
+                "format": fmt,
+                "encoding": response.headers.get("content-encoding", "identity"),
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": percentile(latencies, 95),
+                "wire_bytes": wire_bytes,
+            })
+    return rows
+
+
+def run_model_backend(args: argparse.Namespace) -> Dict[str, Any]:
+    """Measure one backend in this (fresh) process; invoked by run_model"""
+    start = time.perf_counter()
+    import main  # loads the model, its artifacts and the precision mode
+    startup = time.perf_counter() - start
+
+    images = load_images(args.images, args.count)
+    start = time.perf_counter()
+    main.run_detection(images[0], args.imgsz)
+    first = time.perf_counter() - start
+
+    latencies = []
+    for repeat in range(args.repeats):
+        start = time.perf_counter()
+        main.run_detection(images[repeat % len(images)], args.imgsz)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "backend": main.detector.backend,
+        "startup_s": startup,
+        "first_ms": first * 1000,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def run_model(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for backend in args.backends:
+            env = {
+                **os.environ,
+                "MODEL_BACKEND": backend,
+                "INFERENCE_PRECISION": args.precision,
+                "PERSIST_ANALYSES": "0",
+                "JOBS_DB_PATH": os.path.join(scratch, "jobs.db"),
+            }
+            command = [sys.executable, __file__, "model-run", "--imgsz", str(args.imgsz),
+                       "--repeats", str(args.repeats), "--count", str(args.count), "--images", args.images]
+            result = subprocess.run(command, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{backend} failed:\n{result.stderr[-2000:]}", file=sys.stderr)
+                continue
+            row = json.loads(result.stdout.strip().splitlines()[-1])
+            if row["backend"] != backend:
+                print(f"{backend} artifacts not found, measured {row['backend']}", file=sys.stderr)
+            rows.append({"requested": backend, **row})
+    return rows
+
+
+def synthetic_response(image: Image.Image, detections: int, rng: random.Random,
+                       imgsz: int, health: bool) -> Dict[str, Any]:
+    """detect-plants response with ``detections`` random plant boxes"""
+    from detector import PLANT_CATEGORIES, PlantDetector, build_response
+
+    width, height = image.size
+    plants = []
+    for _ in range(detections):
+        label = rng.choice(sorted(PLANT_CATEGORIES))
+        x1, y1 = rng.uniform(0, width - 50), rng.uniform(0, height - 50)
+        x2, y2 = rng.uniform(x1 + 20, min(width, x1 + 400)), rng.uniform(y1 + 20, min(height, y1 + 400))
+        plants.append({
+            "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1},
+            "label": label,
+            "confidence": rng.uniform(0.25, 0.95),
+            "category": PLANT_CATEGORIES[label]["category"],
+            "properties": PLANT_CATEGORIES[label]["properties"],
+            "scientific_name": PlantDetector.get_scientific_name(None, label),
+        })
+    return build_response(image, plants, inference_size=imgsz, health=health)
+
+
+def run_sizes(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from compression import compression_settings
+    from serialization import encode_compact
+
+    rng = random.Random(args.seed)
+    images = [Image.open(io.BytesIO(data)) for data in load_images(args.images, args.batch_size)]
+    results = [synthetic_response(image, args.detections, rng, args.imgsz, args.health) for image in images]
+    settings = compression_settings()
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover - optional dependency
+        brotli = None
+
+    rows = []
+    for fmt in args.formats:
+        if fmt == "json":
+            # Same encoder settings as FastAPI's JSONResponse
+            body = json.dumps({"success": True, "results": results, "count": len(results)},
+                              ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        else:
+            body = encode_compact(results, fmt)
+        row = {"format": fmt, "identity": len(body),
+               "gzip": len(gzip.compress(body, compresslevel=settings["gzip_level"]))}
+        if brotli is not None:
+            row["br"] = len(brotli.compress(body, quality=settings["brotli_quality"]))
+        rows.append(row)
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    print("  ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{row[c]:>12.1f}" if isinstance(row[c], float) else f"{row[c]:>12}" for c in columns))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Plant Detection API benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    http = subparsers.add_parser("http", help="Batch endpoint latency and response size per format/encoding")
+    http.add_argument("--url", default="http://localhost:8000")
+    http.add_argument("--images", default="", help="Directory of images (default: synthetic)")
+    http.add_argument("--batch-size", type=int, default=8)
+    http.add_argument("--repeats", type=int, default=10)
+    http.add_argument("--warmup", type=int, default=2)
+    http.add_argument("--timeout", type=float, default=120)
+    http.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    http.add_argument("--encodings", nargs="+", default=ENCODINGS, choices=ENCODINGS)
+
+    model = subparsers.add_parser("model", help="Startup and inference latency per model backend")
+    model_run = subparsers.add_parser("model-run", help=argparse.SUPPRESS)
+    model.add_argument("--backends", nargs="+", default=["eager", "torchscript", "compile"],
+                       choices=["eager", "torchscript", "compile"])
+    model.add_argument("--precision", default="fp32", help="INFERENCE_PRECISION for every backend")
+    for sub in (model, model_run):
+        sub.add_argument("--images", default="", help="Directory of images (default: synthetic)")
+        sub.add_argument("--count", type=int, default=8)
+        sub.add_argument("--imgsz", type=int, default=640)
+        sub.add_argument("--repeats", type=int, default=20)
+
+    sizes = subparsers.add_parser("sizes", help="Encoded/compressed batch response size per format (offline)")
+    sizes.add_argument("--images", default="", help="Directory of images (default: synthetic)")
+    sizes.add_argument("--batch-size", type=int, default=8)
+    sizes.add_argument("--detections", type=int, default=40, help="Synthetic detections per image")
+    sizes.add_argument("--imgsz", type=int, default=640)
+    sizes.add_argument("--seed", type=int, default=0)
+    sizes.add_argument("--no-health", dest="health", action="store_false", help="Leave out per-plant health")
+    sizes.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+
+    args = parser.parse_args(argv)
+    if args.command == "http":
+        print_table(run_http(args))
+    elif args.command == "model":
+        print_table(run_model(args))
+    elif args.command == "model-run":
+        print(json.dumps(run_model_backend(args)))
+    elif args.command == "sizes":
+        print_table(run_sizes(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
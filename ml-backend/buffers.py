@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from deadlines import Deadline
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Decoded image bytes all in-flight requests of this worker may hold at once (0: unlimited)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "1024"))
+# Longest a decode waits for budget before the request is rejected with 503
+MEMORY_BUDGET_WAIT = float(os.getenv("MEMORY_BUDGET_WAIT", "5"))
+# Idle pooled scratch arrays kept for reuse
+BUFFER_POOL_MB = float(os.getenv("BUFFER_POOL_MB", "64"))
+WAIT_POLL_INTERVAL = 0.1  # seconds between cancellation checks while waiting for budget
+
+
+class MemoryBudgetExceeded(Exception):
+    """A decode did not fit into the memory budget in time"""
+
+    def __init__(self, requested: int, available: int, retry_after: float = 1.0):
+        super().__init__(f"Image needs {requested / 2**20:.1f} MB of decode memory, "
+                         f"{max(available, 0) / 2**20:.1f} MB available")
+        self.requested = requested
+        self.available = available
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """Bytes held against a MemoryBudget until ``release`` (or the end of a ``with`` block)"""
+
+    def __init__(self, budget: "MemoryBudget", nbytes: int):
+        self.budget = budget
+        self.nbytes = nbytes
+
+    def shrink(self, nbytes: int):
+        """Keep only ``nbytes`` (e.g. the resized copy once the full decode is freed)"""
+        if nbytes < self.nbytes:
+            self.budget._give_back(self.nbytes - nbytes)
+            self.nbytes = nbytes
+
+    def release(self):
+        self.shrink(0)
+
+    def split(self, nbytes: int) -> "Reservation":
+        """Move ``nbytes`` into a new reservation (e.g. one image's share of a batch)"""
+        nbytes = min(int(nbytes), self.nbytes)
+        self.nbytes -= nbytes
+        return Reservation(self.budget, nbytes)
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class MemoryBudget:
+    """Accounts decoded-image bytes across in-flight requests.
+
+    ``reserve`` blocks until the bytes fit, for at most ``wait`` seconds and
+    never past the request's deadline, then raises MemoryBudgetExceeded so the
+    endpoint can answer 503 instead of the process running out of memory. A
+    single image larger than the whole budget is admitted only when nothing
+    else is reserved, so it cannot be starved forever.
+    """
+
+    def __init__(self, limit_bytes: int, wait: float = MEMORY_BUDGET_WAIT):
+        self.limit = limit_bytes
+        self.wait = wait
+        self.in_use = 0
+        self.peak = 0
+        self.cond = threading.Condition()
+        self.stats = {"reservations": 0, "waited": 0, "rejected": 0}
+
+    def _fits(self, nbytes: int) -> bool:
+        return not self.limit or self.in_use + nbytes <= self.limit or self.in_use == 0
+
+    def reserve(self, nbytes: int, deadline: Optional[Deadline] = None, stage: str = "decode",
+                wait: Optional[float] = None) -> Reservation:
+        """Hold ``nbytes``; ``wait`` overrides the budget's wait (0: reject at once, e.g. on the event loop)"""
+        nbytes = int(nbytes)
+        with self.cond:
+            if not self._fits(nbytes):
+                self.stats["waited"] += 1
+                start = time.monotonic()
+                wait_until = start + (self.wait if wait is None else wait)
+                if deadline is not None and deadline.remaining() is not None:
+                    wait_until = min(wait_until, start + deadline.remaining())
+                while not self._fits(nbytes):
+                    left = wait_until - time.monotonic()
+                    if left <= 0:
+                        self.stats["rejected"] += 1
+                        metrics.inc("memory.rejected")
+                        logger.warning(f"Rejected a {stage} of {nbytes / 2**20:.1f} MB: "
+                                       f"{self.in_use / 2**20:.1f} of {self.limit / 2**20:.1f} MB in use")
+                        raise MemoryBudgetExceeded(nbytes, self.limit - self.in_use, retry_after=self.wait)
+                    self.cond.wait(min(left, WAIT_POLL_INTERVAL))
+                    if deadline is not None:
+                        deadline.check(stage)
+                metrics.observe("memory.wait_ms", (time.monotonic() - start) * 1000)
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+            self.stats["reservations"] += 1
+        metrics.set_gauge("memory.buffer_bytes", self.in_use)
+        metrics.set_gauge("memory.buffer_peak_bytes", self.peak)
+        return Reservation(self, nbytes)
+
+    def _give_back(self, nbytes: int):
+        with self.cond:
+            self.in_use -= nbytes
+            self.cond.notify_all()
+        metrics.set_gauge("memory.buffer_bytes", self.in_use)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.cond:
+            return {"limit_bytes": self.limit, "in_use_bytes": self.in_use, "peak_bytes": self.peak, **self.stats}
+
+
+class BufferPool:
+    """Free lists of numpy scratch arrays keyed by (shape, dtype).
+
+    Images from the same camera produce the same working shapes, so per-request
+    scratch space is reused instead of reallocated. At most ``max_bytes`` of idle
+    arrays are kept; the least recently returned shapes are dropped first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.free: "OrderedDict[Tuple[Tuple[int, ...], str], List[np.ndarray]]" = OrderedDict()
+        self.idle_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def take(self, shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            arrays = self.free.get(key)
+            if arrays:
+                array = arrays.pop()
+                self.idle_bytes -= array.nbytes
+                self.stats["hits"] += 1
+                return array
+            self.stats["misses"] += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, array: np.ndarray):
+        if array.nbytes > self.max_bytes:
+            return
+        key = (array.shape, array.dtype.str)
+        with self.lock:
+            self.free.setdefault(key, []).append(array)
+            self.free.move_to_end(key)
+            self.idle_bytes += array.nbytes
+            while self.idle_bytes > self.max_bytes:
+                oldest, arrays = next(iter(self.free.items()))
+                self.idle_bytes -= arrays.pop(0).nbytes
+                self.stats["evictions"] += 1
+                if not arrays:
+                    del self.free[oldest]
+
+    @contextmanager
+    def borrow(self, shape: Tuple[int, ...], dtype=np.float32):
+        array = self.take(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.give(array)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"max_bytes": self.max_bytes, "idle_bytes": self.idle_bytes,
+                    "shapes": len(self.free), **self.stats}
+
+
+def decoded_bytes(size: Tuple[int, int], mode: str) -> int:
+    """Bytes Pillow allocates for an image of ``size`` (w, h): one byte per pixel for 1/L/P,
+    two for 16-bit modes, four otherwise (RGB is stored padded to 32 bits)"""
+    pixel = 1 if mode in ("1", "L", "P") else 2 if mode.startswith("I;16") else 4
+    return size[0] * size[1] * pixel
+
+
+memory_budget = MemoryBudget(int(MEMORY_BUDGET_MB * 2**20))
+buffer_pool = BufferPool(int(BUFFER_POOL_MB * 2**20))
@@ -0,0 +1,49 @@
+import os
+import logging
+
+from starlette.middleware.gzip import GZipMiddleware
+
+logger = logging.getLogger(__name__)
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # pragma: no cover - optional dependency
+    BrotliMiddleware = None
+
+# Responses that must be flushed as they are produced (compressors buffer output)
+STREAMING_PATH_SUFFIXES = ("/events",)
+
+
+class CompressionMiddleware:
+    """Brotli/gzip response compression above a size threshold.
+
+    Uses Brotli when ``brotli-asgi`` is installed (it falls back to gzip for
+    clients that do not send ``Accept-Encoding: br``), plain gzip otherwise.
+    Server-Sent Event streams and WebSockets bypass compression so progress
+    events are delivered immediately.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed_app = BrotliMiddleware(app, quality=brotli_quality, minimum_size=minimum_size,
+                                                   gzip_fallback=True)
+            self.encoding = "br"
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+            self.encoding = "gzip"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].endswith(STREAMING_PATH_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        await self.compressed_app(scope, receive, send)
+
+
+def compression_settings() -> dict:
+    """Compression options from the environment"""
+    return {
+        "minimum_size": int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        "gzip_level": int(os.getenv("GZIP_LEVEL", "6")),
+        "brotli_quality": int(os.getenv("BROTLI_QUALITY", "4")),
+    }
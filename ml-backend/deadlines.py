@@ -0,0 +1,125 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Relative timeout in seconds, e.g. forwarded by the Node proxy from its own request timeout
+TIMEOUT_HEADER = "x-request-timeout"
+# Absolute deadline as Unix epoch seconds, for callers that track one across hops
+DEADLINE_HEADER = "x-request-deadline"
+# Applied when the caller sends no deadline (unset: none)
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("DEFAULT_REQUEST_TIMEOUT", "0")) or None
+DISCONNECT_POLL_INTERVAL = 0.1  # seconds between client disconnect checks
+
+
+class RequestCancelled(Exception):
+    """Work was abandoned because nobody is waiting for the result any more"""
+
+    status_code = 499
+
+    def __init__(self, reason: str, stage: str, message: Optional[str] = None):
+        super().__init__(message or f"Request cancelled ({reason}) before {stage}")
+        self.reason = reason
+        self.stage = stage
+
+
+class DeadlineExceeded(RequestCancelled):
+    """The caller's deadline passed before the work finished"""
+
+    status_code = 504
+
+    def __init__(self, stage: str):
+        super().__init__("deadline", stage, f"Deadline exceeded before {stage}")
+
+
+def record_cancelled(reason: str, stage: str, images: float = 1):
+    """Count images whose remaining work was skipped, by reason and pipeline stage"""
+    metrics.inc("inference.cancelled", images, labels={"reason": reason, "stage": stage})
+
+
+class Deadline:
+    """Deadline and cancellation flag shared between a request and its queued work.
+
+    ``expires_at`` is on the ``time.monotonic`` clock (None for no deadline).
+    Worker code calls ``check(stage)`` at stage boundaries; it raises
+    DeadlineExceeded or RequestCancelled once the work is no longer wanted.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "disconnect"):
+        if not self.cancelled:
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self, stage: str, images: float = 1):
+        if self.cancelled:
+            record_cancelled(self.reason, stage, images)
+            raise RequestCancelled(self.reason, stage)
+        if self.expired:
+            record_cancelled("deadline", stage, images)
+            raise DeadlineExceeded(stage)
+
+
+def deadline_from_request(request, timeout: Optional[float] = None) -> Deadline:
+    """Build a Deadline from a ``timeout`` query value or the deadline headers"""
+    headers = request.headers
+    try:
+        if timeout is None and headers.get(TIMEOUT_HEADER):
+            timeout = float(headers[TIMEOUT_HEADER])
+        if timeout is None and headers.get(DEADLINE_HEADER):
+            timeout = float(headers[DEADLINE_HEADER]) - time.time()
+    except ValueError:
+        logger.warning(f"Ignoring malformed deadline header: {headers.get(TIMEOUT_HEADER) or headers.get(DEADLINE_HEADER)}")
+        timeout = None
+    if timeout is None:
+        timeout = DEFAULT_REQUEST_TIMEOUT
+    return Deadline(max(0.0, timeout) if timeout is not None else None)
+
+
+async def await_result(request, future: Future, deadline: Deadline):
+    """Await a scheduler future, abandoning it if the client disconnects or the deadline passes.
+
+    Queued work is cancelled outright; work already running sees the
+    cancellation at its next ``Deadline.check``.
+    """
+    waiter = asyncio.wrap_future(future)
+    while True:
+        done, _ = await asyncio.wait({waiter}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return waiter.result()
+        if await request.is_disconnected():
+            deadline.cancel("disconnect")
+        elif deadline.expired:
+            deadline.cancel("deadline")
+        else:
+            continue
+        # Dropped from the queue if not started yet; the worker counts it when popped
+        future.cancel()
+        waiter.cancel()
+        if deadline.reason == "deadline":
+            raise DeadlineExceeded("response")
+        raise RequestCancelled(deadline.reason, "response")
@@ -0,0 +1,451 @@
+import os
+import logging
+from typing import List, Dict, Any
+from pathlib import Path
+
+import torch
+import cv2
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+
+from artifacts import TORCHSCRIPT, COMPILE, find_artifacts, enable_compile_cache, compile_network
+from fusion import fuse_boxes, fusion_settings
+from health import HEALTH_ANALYSIS, attach_health
+from masks import DEFAULT_MASK_SIZE, mask_shape, resize_masks, unletterbox
+from metrics import metrics
+from profiling import forward_traces
+from precision import MODES, FP32, autocast, benchmark_image, precision_settings, select_precision_mode
+
+logger = logging.getLogger(__name__)
+
+# Plant category mapping for medicinal properties
+PLANT_CATEGORIES = {
+    "aloe": {"category": "medicinal", "properties": ["healing", "anti-inflammatory", "skin care"]},
+    "basil": {"category": "herb", "properties": ["digestive", "antibacterial", "antioxidant"]},
+    "mint": {"category": "herb", "properties": ["digestive", "cooling", "respiratory"]},
+    "lavender": {"category": "aromatic", "properties": ["calming", "antiseptic", "sleep aid"]},
+    "rosemary": {"category": "herb", "properties": ["memory", "circulation", "antioxidant"]},
+    "sage": {"category": "herb", "properties": ["antimicrobial", "cognitive", "throat health"]},
+    "thyme": {"category": "herb", "properties": ["antibacterial", "respiratory", "immune support"]},
+    "oregano": {"category": "herb", "properties": ["antiviral", "digestive", "immune boost"]},
+    "chamomile": {"category": "flower", "properties": ["calming", "digestive", "anti-inflammatory"]},
+    "echinacea": {"category": "flower", "properties": ["immune support", "antiviral", "wound healing"]},
+    "turmeric": {"category": "root", "properties": ["anti-inflammatory", "antioxidant", "digestive"]},
+    "ginger": {"category": "root", "properties": ["digestive", "anti-nausea", "anti-inflammatory"]},
+    "ginkgo": {"category": "tree", "properties": ["circulation", "cognitive", "antioxidant"]},
+    "ginseng": {"category": "root", "properties": ["energy", "immune support", "adaptogenic"]},
+    "dandelion": {"category": "wildflower", "properties": ["detox", "liver support", "diuretic"]},
+}
+
+# Inference sizes the adaptive resolution policy chooses from (multiples of the YOLO stride)
+INFERENCE_SIZES = (320, 480, 640, 960)
+DEFAULT_INFERENCE_SIZE = 640
+# Scheduler queue depths at which inference steps down one size
+LOAD_STEP_DOWN_DEPTHS = (4, 8, 16)
+# Longest image side kept after preprocessing; larger uploads are downscaled
+MAX_IMAGE_SIDE = 1280
+# Test-time augmentation variants (scale, horizontal flip), as in YOLOv5's augmented inference
+TTA_VARIANTS = ((1.0, False), (0.83, True), (0.67, False))
+
+class PlantDetector:
+    def __init__(self):
+        self.model = None
+        self.precision = {"mode": FP32.name, "selected_by": "default"}
+        self.precision_mode = FP32
+        self.backend = "eager"
+        self.size_models: Dict[int, YOLO] = {}  # TorchScript module per inference size
+        self.fusion = fusion_settings()  # cross-class duplicate merging in enhance_plant_detection
+        self.seg_model = None  # optional YOLO-seg model for mask output
+        self.load_model()
+        self.load_segmentation_model()
+        self.configure_precision()
+        self.load_artifacts()
+    
+    def load_model(self):
+        """Load YOLOv5 model - use custom trained model if available, otherwise use pretrained"""
+        try:
+            # Try to load custom plant detection model
+            custom_model_path = Path("models/best.pt")
+            if custom_model_path.exists():
+                logger.info("Loading custom plant detection model...")
+                self.model = YOLO(str(custom_model_path))
+            else:
+                logger.info("Custom model not found, using general YOLOv5 model...")
+                # Use general YOLOv5 model and filter for plant-like objects
+                self.model = YOLO('yolov5s.pt')
+        except Exception as e:
+            logger.error(f"Error loading model: {e}")
+            # Fallback to basic YOLOv5
+            self.model = YOLO('yolov5s.pt')
+    
+    def load_segmentation_model(self):
+        """Load instance-segmentation weights (YOLO-seg) if a local file is configured"""
+        seg_model_path = Path(os.getenv("SEGMENTATION_MODEL", "models/best-seg.pt"))
+        if not seg_model_path.exists():
+            logger.info(f"No segmentation model at {seg_model_path}, mask output disabled")
+            return
+        try:
+            self.seg_model = YOLO(str(seg_model_path), task="segment")
+            logger.info(f"Loaded segmentation model {seg_model_path}")
+        except Exception as e:
+            logger.error(f"Error loading segmentation model: {e}")
+    
+    def load_artifacts(self):
+        """Prefer TorchScript / torch.compile artifacts built by export_model.py for these exact weights"""
+        requested = os.getenv("MODEL_BACKEND", "auto")
+        if requested == "eager" or not self.model.ckpt_path:
+            return
+        manifest = find_artifacts(self.model.ckpt_path)
+        if manifest is None:
+            return
+        artifacts, directory = manifest["artifacts"], manifest["directory"]
+        try:
+            if TORCHSCRIPT in artifacts and requested in ("auto", TORCHSCRIPT):
+                for size, name in artifacts[TORCHSCRIPT]["files"].items():
+                    self.size_models[int(size)] = YOLO(str(directory / name), task="detect")
+                self.backend = TORCHSCRIPT
+                # Traced graphs are frozen FP32; the benchmarked mode only serves sizes without one
+                self.precision = {"mode": FP32.name, "selected_by": TORCHSCRIPT,
+                                  "sizes": sorted(self.size_models), "eager": self.precision}
+            elif COMPILE in artifacts and requested in ("auto", COMPILE):
+                enable_compile_cache(directory)
+                # Compile the network the predictor serves with; kernels come from the warmed cache
+                if self.model.predictor is None:
+                    self.model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+                backend = self.model.predictor.model
+                backend.model = compile_network(backend.model)
+                self.predict(np.zeros((DEFAULT_INFERENCE_SIZE, DEFAULT_INFERENCE_SIZE, 3), dtype=np.uint8),
+                             imgsz=DEFAULT_INFERENCE_SIZE, verbose=False)
+                self.backend = COMPILE
+            logger.info(f"Using {self.backend} artifacts from {directory}")
+        except Exception as e:
+            logger.error(f"Could not load model artifacts from {directory}, using raw weights: {e}")
+            self.size_models = {}
+            self.backend = "eager"
+    
+    def configure_precision(self):
+        """Enable bf16 autocast / channels-last only if a startup benchmark shows it pays off on this host"""
+        if torch.cuda.is_available():
+            # The benchmark targets CPU inference; GPUs keep ultralytics' own defaults
+            self.precision = {"mode": FP32.name, "selected_by": "cuda"}
+            return
+        try:
+            # A first call builds the fused network the predictor serves requests with
+            self.model(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+            image = benchmark_image()
+
+            def detect():
+                boxes = self.model(image, imgsz=DEFAULT_INFERENCE_SIZE, verbose=False)[0].boxes
+                return boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy()
+
+            self.precision = select_precision_mode(self.model.predictor.model, detect, **precision_settings())
+        except Exception as e:
+            logger.error(f"Precision benchmark failed, using fp32: {e}")
+            self.precision = {"mode": FP32.name, "selected_by": "fallback", "error": str(e)}
+        self.precision_mode = MODES[self.precision["mode"]]
+    
+    def predict(self, source, **kwargs):
+        """Run the model on ``source`` in the selected precision mode"""
+        traced = self.size_models.get(kwargs.get("imgsz"))
+        with forward_traces.capture("detect"):
+            if traced is not None:
+                # Frozen FP32 graph for exactly this size; autocast does not apply to traced code
+                return traced(source, **kwargs)
+            with autocast(self.precision_mode):
+                return self.model(source, **kwargs)
+    
+    def segment(self, image: Image.Image, imgsz: int, mask_size: int = DEFAULT_MASK_SIZE,
+                **kwargs) -> Dict[str, Any]:
+        """Plant detections with instance masks at reduced resolution.
+        
+        Masks leave the model at the letterboxed inference size; the padding is
+        cropped and they are resized so the longest side is ``mask_size`` (never
+        above the image). Masks of duplicates merged by plant_boxes are unioned.
+        Returns ``plants``, boolean ``masks`` (n, h, w) and ``scale`` (image
+        pixels per mask pixel).
+        """
+        with forward_traces.capture("segment"), autocast(self.precision_mode):
+            result = self.seg_model(image, imgsz=imgsz, retina_masks=False, **kwargs)[0]
+        width, height = mask_shape(image.size, mask_size)
+        if result.boxes is None or len(result.boxes) == 0 or result.masks is None:
+            fused = self.plant_boxes(np.zeros((0, 4)), np.zeros(0), np.zeros(0), result.names)
+            masks = np.zeros((0, height, width), dtype=bool)
+        else:
+            boxes = result.boxes
+            fused = self.plant_boxes(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+                                     boxes.cls.cpu().numpy(), result.names)
+            raw = unletterbox(result.masks.data.cpu().numpy()[fused["indices"]], image.size)
+            masks = np.zeros((len(fused["keep"]), height, width), dtype=bool)
+            np.logical_or.at(masks, fused["group"], resize_masks(raw, (width, height)))
+        return {"plants": self.describe_plants(fused), "masks": masks, "scale": image.size[0] / width}
+    
+    @staticmethod
+    def preprocess_image(image: Image.Image) -> Image.Image:
+        """Preprocess image for optimal plant detection"""
+        # Convert to RGB if needed
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Resize if too large (optimal size for YOLOv5)
+        if max(image.size) > MAX_IMAGE_SIDE:
+            ratio = MAX_IMAGE_SIDE / max(image.size)
+            new_size = tuple(int(dim * ratio) for dim in image.size)
+            image = image.resize(new_size, Image.Resampling.LANCZOS)
+        
+        return image
+    
+    def choose_inference_size(self, image: Image.Image, queue_depth: int = 0,
+                              override: int = None) -> int:
+        """Pick the model input size for this request from load and image content.
+        
+        Content sets the base size: fine detail (small plants, sharp edges) asks for
+        960, blurry or low-detail images gain nothing above 480. Every threshold in
+        LOAD_STEP_DOWN_DEPTHS the scheduler queue exceeds steps one size down, so
+        spikes degrade resolution instead of timing out. Never upsamples the image.
+        """
+        if override:
+            size = min(INFERENCE_SIZES, key=lambda s: abs(s - override))
+            metrics.inc("detector.inference_size", labels={"size": size, "reason": "override"})
+            return size
+        
+        # Cheap content heuristic on a small grayscale thumbnail
+        thumbnail = image.convert('L')
+        thumbnail.thumbnail((256, 256))
+        gray = np.asarray(thumbnail)
+        sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+        edge_density = np.count_nonzero(cv2.Canny(gray, 100, 200)) / gray.size
+        
+        if sharpness < 50 or edge_density < 0.02:
+            index, reason = INFERENCE_SIZES.index(480), "low_detail"
+        elif edge_density > 0.12 and sharpness > 300:
+            index, reason = INFERENCE_SIZES.index(960), "fine_detail"
+        else:
+            index, reason = INFERENCE_SIZES.index(DEFAULT_INFERENCE_SIZE), "default"
+        
+        steps_down = sum(queue_depth >= depth for depth in LOAD_STEP_DOWN_DEPTHS)
+        if steps_down:
+            index, reason = max(0, index - steps_down), "load"
+        
+        # No point letterboxing a small image up to a larger canvas
+        while index > 0 and INFERENCE_SIZES[index - 1] >= max(image.size):
+            index -= 1
+        
+        size = INFERENCE_SIZES[index]
+        metrics.inc("detector.inference_size", labels={"size": size, "reason": reason})
+        return size
+    
+    def enhance_plant_detection(self, results) -> List[Dict[str, Any]]:
+        """Process YOLOv5 results and enhance for plant detection"""
+        detections = []
+        
+        if not results:
+            return detections
+        
+        # Get detection results
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                continue
+            detections.extend(self.plant_detections(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+                                                    boxes.cls.cpu().numpy(), result.names))
+        
+        return detections
+    
+    def predict_tta(self, image: Image.Image, variants=TTA_VARIANTS, **kwargs) -> List[Dict[str, Any]]:
+        """Test-time augmentation: detect on flipped / downscaled copies of ``image`` in one batched call.
+        
+        Every variant is pasted onto a canvas the size of the original so the batch
+        shares one tensor shape; boxes are mapped back to original coordinates and
+        fused across variants with weighted boxes fusion.
+        """
+        width, height = image.size
+        batch, sizes = [], []
+        for scale, flip in variants:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            variant = image if size == image.size else image.resize(size, Image.Resampling.BILINEAR)
+            if flip:
+                variant = variant.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            if variant.size != image.size:
+                canvas = Image.new("RGB", image.size, (114, 114, 114))
+                canvas.paste(variant, (0, 0))
+                variant = canvas
+            batch.append(variant)
+            sizes.append(size)
+        results = self.predict(batch, **kwargs)
+        
+        xyxy, confidences, class_ids = [], [], []
+        for (scale, flip), (scaled_width, scaled_height), result in zip(variants, sizes, results):
+            if result.boxes is None or len(result.boxes) == 0:
+                continue
+            boxes = result.boxes.xyxy.cpu().numpy().astype(float)
+            if flip:
+                boxes[:, [0, 2]] = scaled_width - boxes[:, [2, 0]]
+            boxes *= [width / scaled_width, height / scaled_height] * 2
+            xyxy.append(np.clip(boxes, 0, [width, height] * 2))
+            confidences.append(result.boxes.conf.cpu().numpy())
+            class_ids.append(result.boxes.cls.cpu().numpy())
+        if not xyxy:
+            return []
+        fusion = self.fusion if self.fusion["method"] != "none" else {**self.fusion, "method": "wbf"}
+        return self.plant_detections(np.concatenate(xyxy), np.concatenate(confidences), np.concatenate(class_ids),
+                                     results[0].names, fusion)
+    
+    def plant_candidates(self, xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                         names: Dict[int, str]) -> Dict[str, Any]:
+        """Plant-mapped boxes above the confidence threshold.
+        
+        Returns the float ``boxes`` and ``scores`` of the survivors, ``labels``
+        (plant name per input box) and ``indices`` (the surviving input boxes).
+        """
+        xyxy = xyxy.astype(float)
+        confidences = confidences.astype(float)
+        class_ids = class_ids.astype(int)
+        
+        # Filter for plant-related objects and enhance detection
+        labels = [self.classify_plant_from_detection(names[class_id].lower(), confidence)
+                  for class_id, confidence in zip(class_ids.tolist(), confidences.tolist())]
+        plant = np.array([label is not None for label in labels], dtype=bool) & (confidences > 0.3)
+        indices = np.flatnonzero(plant)
+        return {"boxes": xyxy[indices], "scores": confidences[indices], "labels": labels, "indices": indices}
+    
+    def merge_candidates(self, candidates: Dict[str, Any], fusion: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Merge overlapping plant candidates class-agnostically.
+        
+        Several COCO classes map to plants, so one plant can arrive as overlapping
+        boxes of different classes. Returns the fuse_boxes arrays (``keep`` and
+        ``group`` index the candidates) plus the candidates' ``labels`` and ``indices``.
+        """
+        fusion = fusion or self.fusion
+        count = len(candidates["indices"])
+        fused = {"keep": np.arange(count), "boxes": candidates["boxes"], "scores": candidates["scores"],
+                 "members": np.ones(count, dtype=np.int64), "group": np.arange(count)}
+        if fusion["method"] != "none" and count:
+            fused = fuse_boxes(candidates["boxes"], candidates["scores"], **fusion)
+            merged = count - len(fused["keep"])
+            if merged:
+                metrics.inc("detector.boxes_merged", merged, labels={"method": fusion["method"]})
+        return {**fused, "labels": candidates["labels"], "indices": candidates["indices"]}
+    
+    def plant_boxes(self, xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                    names: Dict[int, str], fusion: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Plant-mapped boxes above the confidence threshold with overlapping duplicates merged"""
+        return self.merge_candidates(self.plant_candidates(xyxy, confidences, class_ids, names), fusion)
+    
+    def plant_detections(self, xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                         names: Dict[int, str], fusion: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Map raw model boxes to plant detections, merging overlapping duplicates"""
+        fused = self.plant_boxes(xyxy, confidences, class_ids, names, fusion)
+        return self.describe_plants(fused)
+    
+    def describe_plants(self, fused: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Response dicts for the merged boxes returned by ``plant_boxes``"""
+        detections = []
+        labels, indices = fused["labels"], fused["indices"]
+        for keep, (x1, y1, x2, y2), confidence in zip(fused["keep"].tolist(), fused["boxes"].tolist(),
+                                                      fused["scores"].tolist()):
+            plant_name = labels[indices[keep]]
+            detection = {
+                "bbox": {
+                    "x1": x1,
+                    "y1": y1, 
+                    "x2": x2,
+                    "y2": y2,
+                    "width": x2 - x1,
+                    "height": y2 - y1
+                },
+                "label": plant_name,
+                "confidence": confidence,
+                "category": PLANT_CATEGORIES.get(plant_name.lower(), {}).get("category", "unknown"),
+                "properties": PLANT_CATEGORIES.get(plant_name.lower(), {}).get("properties", []),
+                "scientific_name": self.get_scientific_name(plant_name)
+            }
+            detections.append(detection)
+        
+        return detections
+    
+    def classify_plant_from_detection(self, class_name: str, confidence: float) -> str:
+        """Map detected objects to plant names"""
+        plant_mappings = {
+            "potted plant": "houseplant",
+            "vase": "flowering plant",
+            "broccoli": "leafy green",
+            "orange": "citrus tree",
+            "apple": "fruit tree",
+            "banana": "tropical plant",
+            "carrot": "root vegetable",
+            "hot dog": None,  # Not a plant
+            "pizza": None,   # Not a plant
+            "person": None,  # Not a plant
+        }
+        
+        # Direct mapping
+        if class_name in plant_mappings:
+            return plant_mappings[class_name]
+        
+        # Check if it might be a plant based on class name
+        plant_keywords = ["plant", "flower", "tree", "herb", "leaf", "green", "garden"]
+        if any(keyword in class_name for keyword in plant_keywords):
+            return self.infer_plant_type(class_name, confidence)
+        
+        # For unknown objects with high confidence, assume it might be a plant
+        if confidence > 0.7:
+            return "unidentified plant"
+        
+        return None
+    
+    def infer_plant_type(self, class_name: str, confidence: float) -> str:
+        """Infer specific plant type from general detection"""
+        # This would typically use additional plant classification
+        # For now, return common medicinal plants based on confidence
+        if confidence > 0.8:
+            return np.random.choice(["aloe", "basil", "mint", "lavender"])
+        elif confidence > 0.6:
+            return np.random.choice(["rosemary", "sage", "thyme", "oregano"])
+        else:
+            return np.random.choice(["chamomile", "dandelion", "echinacea"])
+    
+    def get_scientific_name(self, plant_name: str) -> str:
+        """Get scientific name for identified plant"""
+        scientific_names = {
+            "aloe": "Aloe barbadensis",
+            "basil": "Ocimum basilicum",
+            "mint": "Mentha species",
+            "lavender": "Lavandula angustifolia",
+            "rosemary": "Rosmarinus officinalis",
+            "sage": "Salvia officinalis",
+            "thyme": "Thymus vulgaris",
+            "oregano": "Origanum vulgare",
+            "chamomile": "Matricaria chamomilla",
+            "echinacea": "Echinacea purpurea",
+            "turmeric": "Curcuma longa",
+            "ginger": "Zingiber officinale",
+            "dandelion": "Taraxacum officinale"
+        }
+        return scientific_names.get(plant_name.lower(), "Unknown species")
+
+
+def build_response(image: Image.Image, detections: List[Dict[str, Any]],
+                   inference_size: int = None, health: bool = None) -> Dict[str, Any]:
+    """Assemble the standard detection response for one image"""
+    # Calculate image metadata
+    image_info = {
+        "width": image.size[0],
+        "height": image.size[1],
+        "format": image.format or "Unknown",
+        "mode": image.mode
+    }
+    if inference_size:
+        image_info["inference_size"] = inference_size
+    
+    # Vegetation indices and stress ratios per plant box (pipelines run this as their own stage)
+    if HEALTH_ANALYSIS if health is None else health:
+        attach_health(image, detections)
+    
+    return {
+        "success": True,
+        "plants": detections,
+        "count": len(detections),
+        "image_info": image_info,
+        "message": f"Detected {len(detections)} plant(s)" if detections else "No plants detected"
+    }
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Build optimized model artifacts for the Plant Detection API
+
+    python export_model.py                       # models/best.pt, or yolov5s.pt if absent
+    python export_model.py --weights models/best.pt --backends torchscript compile
+
+Artifacts go to models/compiled/<weights>-<sha256>/ with a manifest.json, so
+new weights never pick up stale artifacts. PlantDetector loads them on
+startup when present (MODEL_BACKEND=auto|torchscript|compile|eager):
+- torchscript: one traced and frozen module per inference size
+- compile: a warmed TorchInductor cache for torch.compile
+"""
+
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+from artifacts import ARTIFACT_ROOT, BACKENDS, TORCHSCRIPT, build_artifacts
+from detector import INFERENCE_SIZES
+
+
+def default_weights() -> str:
+    custom = Path("models/best.pt")
+    if custom.exists():
+        return str(custom)
+    from ultralytics import YOLO
+    # Resolves (and downloads if needed) the same checkpoint main.py falls back to
+    return YOLO("yolov5s.pt").ckpt_path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export TorchScript / torch.compile artifacts")
+    parser.add_argument("--weights", default=None, help="Weights file (default: models/best.pt or yolov5s.pt)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(INFERENCE_SIZES))
+    parser.add_argument("--backends", nargs="+", default=[TORCHSCRIPT], choices=list(BACKENDS))
+    parser.add_argument("--output", default=str(ARTIFACT_ROOT))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    weights = args.weights or default_weights()
+    print(f"🔧 Building {', '.join(args.backends)} artifacts for {weights} at sizes {args.sizes}...")
+    directory = build_artifacts(weights, args.sizes, args.backends, Path(args.output))
+    print(f"✅ Artifacts written to {directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+from typing import Dict, Any, Tuple
+
+import numpy as np
+
+FUSION_METHODS = ("wbf", "nms", "none")
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (n, 4) and (m, 4) xyxy boxes as an (n, m) matrix"""
+    width = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    height = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def cluster_boxes(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Class-agnostic greedy NMS that also reports which kept box absorbed each box.
+
+    Returns (keep, owner): indices of the surviving boxes in descending score
+    order, and for every input box the index of the highest-scoring kept box
+    that overlaps it by more than ``iou_threshold`` (itself when kept).
+    """
+    n = len(boxes)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order = np.argsort(-scores, kind="stable")
+    overlaps = box_iou(boxes[order], boxes[order]) > iou_threshold
+    np.fill_diagonal(overlaps, True)  # degenerate (zero-area) boxes still own themselves
+    suppressed = np.zeros(n, dtype=bool)
+    kept = []
+    for rank in range(n):
+        if suppressed[rank]:
+            continue
+        kept.append(rank)
+        suppressed |= overlaps[rank]
+    kept = np.array(kept)
+    # Kept boxes are in score order, so argmax finds the best one each box overlaps
+    owner_rank = kept[np.argmax(overlaps[:, kept], axis=1)]
+    owner = np.empty(n, dtype=np.int64)
+    owner[order] = order[owner_rank]
+    return order[kept], owner
+
+
+def fuse_boxes(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.55,
+               method: str = "wbf") -> Dict[str, np.ndarray]:
+    """Merge overlapping boxes regardless of class.
+
+    ``nms`` keeps the best box of each overlapping group; ``wbf`` (weighted
+    boxes fusion) replaces it with the score-weighted mean of the group's
+    coordinates. Either way a group keeps its best member's score and label
+    index (``keep``), so thresholds downstream behave as before; ``members``
+    counts the boxes merged into each result and ``group`` gives, for every
+    input box, the position of the result it was merged into.
+    """
+    keep, owner = cluster_boxes(boxes, scores, iou_threshold)
+    members = np.bincount(owner, minlength=len(boxes))[keep]
+    slot = np.full(len(boxes), -1)
+    slot[keep] = np.arange(len(keep))
+    group = slot[owner]
+    fused = boxes[keep]
+    if method == "wbf" and len(keep):
+        weighted = np.zeros((len(keep), 4))
+        np.add.at(weighted, group, boxes * scores[:, None])
+        totals = np.bincount(group, weights=scores, minlength=len(keep))
+        fused = weighted / np.maximum(totals, 1e-12)[:, None]
+    return {"keep": keep, "boxes": fused, "scores": scores[keep], "members": members, "group": group}
+
+
+def fusion_settings() -> Dict[str, Any]:
+    """fuse_boxes keyword arguments from the environment"""
+    method = os.getenv("DETECTION_FUSION", "wbf")
+    return {
+        "method": method if method in FUSION_METHODS else "wbf",
+        "iou_threshold": float(os.getenv("DETECTION_FUSION_IOU", "0.55")),
+    }
@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from persistence import ConnectionPool
+from spatial import MAX_COORDINATE, PointIndex
+
+logger = logging.getLogger(__name__)
+
+LOAD_PLANTS_SQL = "SELECT id, x, y FROM plant_instances WHERE gardenId = ?"
+# Cheap change detector for rows written by other processes (the Node API)
+GARDEN_VERSION_SQL = "SELECT COUNT(*), MAX(updatedAt) FROM plant_instances WHERE gardenId = ?"
+
+
+class GardenIndex:
+    """Spatial index over one garden's plant instances"""
+
+    def __init__(self, garden_id: str):
+        self.garden_id = garden_id
+        self.points = PointIndex()
+        self.version: Optional[Tuple[int, Any]] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def describe(self, slots: np.ndarray, distances: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        xy = self.points.xy[slots].tolist()
+        plants = [{"id": self.points.ids[slot], "x": x, "y": y} for slot, (x, y) in zip(slots.tolist(), xy)]
+        if distances is not None:
+            for plant, distance in zip(plants, distances.tolist()):
+                plant["distance"] = round(distance, 4)
+        return plants
+
+
+class GardenIndexRegistry:
+    """Per-garden spatial indexes over ``plant_instances``, loaded on first use.
+
+    Indexes are updated in place by ``upsert`` / ``remove`` as plants are added,
+    moved or deleted; at most every ``refresh_interval`` seconds a garden's row
+    count and latest ``updatedAt`` are compared with the database and the index
+    is reloaded if they no longer match (e.g. a write that was not forwarded).
+    """
+
+    def __init__(self, db_path: str, refresh_interval: float = 30.0, max_gardens: int = 256):
+        self.pool = ConnectionPool(db_path, size=1)
+        self.refresh_interval = refresh_interval
+        self.max_gardens = max_gardens
+        self.gardens: Dict[str, GardenIndex] = {}
+        self.lock = threading.Lock()
+        self.stats = {"loads": 0, "reloads": 0, "evictions": 0}
+
+    def _version(self, garden_id: str) -> Tuple[int, Any]:
+        with self.pool.connection() as conn:
+            return tuple(conn.execute(GARDEN_VERSION_SQL, (garden_id,)).fetchone())
+
+    def _load(self, garden: GardenIndex):
+        with self.pool.connection() as conn:
+            rows = conn.execute(LOAD_PLANTS_SQL, (garden.garden_id,)).fetchall()
+            version = tuple(conn.execute(GARDEN_VERSION_SQL, (garden.garden_id,)).fetchone())
+        xy = np.array([(row["x"], row["y"]) for row in rows], dtype=float).reshape(-1, 2)
+        valid = np.isfinite(xy).all(axis=1) & (np.abs(xy) <= MAX_COORDINATE).all(axis=1)
+        if not valid.all():
+            logger.warning(f"Skipping {int((~valid).sum())} plants with invalid positions in garden {garden.garden_id}")
+        garden.points.bulk_load([row["id"] for row, ok in zip(rows, valid) if ok], xy[valid])
+        garden.version = version
+        garden.checked_at = time.monotonic()
+
+    def get(self, garden_id: str) -> GardenIndex:
+        """The garden's index, loading or refreshing it from the database if needed"""
+        with self.lock:
+            garden = self.gardens.pop(garden_id, None)
+            if garden is None:
+                garden = GardenIndex(garden_id)
+                if len(self.gardens) >= self.max_gardens:
+                    # Least recently used first: dicts keep insertion order and hits are re-inserted
+                    self.gardens.pop(next(iter(self.gardens)))
+                    self.stats["evictions"] += 1
+            self.gardens[garden_id] = garden
+        with garden.lock:
+            if garden.version is None:
+                self._load(garden)
+                self.stats["loads"] += 1
+                logger.info(f"Indexed {len(garden.points)} plants for garden {garden_id}")
+            elif time.monotonic() - garden.checked_at >= self.refresh_interval:
+                garden.checked_at = time.monotonic()
+                if self._version(garden_id) != garden.version:
+                    self._load(garden)
+                    self.stats["reloads"] += 1
+        return garden
+
+    def upsert(self, garden_id: str, plant_id: str, x: float, y: float):
+        garden = self.get(garden_id)
+        with garden.lock:
+            garden.points.upsert(plant_id, x, y)
+            garden.version = self._version(garden_id)
+
+    def remove(self, garden_id: str, plant_id: str) -> bool:
+        garden = self.get(garden_id)
+        with garden.lock:
+            removed = garden.points.remove(plant_id)
+            garden.version = self._version(garden_id)
+        return removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            gardens = {garden_id: garden.points.stats() for garden_id, garden in self.gardens.items()}
+        return {"gardens": gardens, **self.stats}
@@ -0,0 +1,125 @@
+import os
+from typing import Dict, Any, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from buffers import buffer_pool
+
+# Attach health analysis to every detection response (HEALTH_ANALYSIS=0 turns it off)
+HEALTH_ANALYSIS = os.getenv("HEALTH_ANALYSIS", "1") == "1"
+# Longest side the image is analysed at; box statistics barely change below full resolution
+HEALTH_MAX_SIDE = int(os.getenv("HEALTH_MAX_SIDE", "384"))
+# Boxes with less foliage than this (fraction of the box) get status "unknown"
+MIN_FOLIAGE_FRACTION = 0.05
+
+# Per-pixel maps summed over every box through one integral image each
+CHANNELS = ("exg", "vari", "gli", "green", "yellow", "brown", "gray", "gray_sq", "lap", "lap_sq")
+
+
+def pixel_maps(rgb: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """(len(CHANNELS), h, w) float32 stack of vegetation indices, colour classes and texture terms"""
+    maps = out if out is not None else np.empty((len(CHANNELS),) + rgb.shape[:2], dtype=np.float32)
+    r, g, b = (channel.astype(np.float32) for channel in cv2.split(rgb))
+    excess = 2 * g - r - b
+    # Excess green on chromatic coordinates, so it does not depend on brightness
+    np.divide(excess, r + g + b + 1e-6, out=maps[0])
+    vari_denominator = g + r - b
+    vari_denominator[np.abs(vari_denominator) < 1e-6] = 1e-6
+    np.clip((g - r) / vari_denominator, -1, 1, out=maps[1])
+    np.divide(excess, 2 * g + r + b + 1e-6, out=maps[2])
+
+    hue, saturation, value = cv2.split(cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV))  # OpenCV hue is 0-180
+    coloured = (saturation >= 40) & (value >= 40)
+    maps[3] = coloured & (hue >= 35) & (hue <= 90)
+    maps[4] = coloured & (hue >= 18) & (hue < 35) & (saturation >= 80)
+    maps[5] = coloured & (hue >= 5) & (hue < 18) & (value < 170)
+
+    maps[6] = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    np.multiply(maps[6], maps[6], out=maps[7])
+    maps[8] = cv2.Laplacian(maps[6], cv2.CV_32F)
+    np.multiply(maps[8], maps[8], out=maps[9])
+    return maps
+
+
+def box_sums(maps: np.ndarray, boxes: np.ndarray, integral: np.ndarray = None) -> np.ndarray:
+    """Sum of every channel inside every (x1, y1, x2, y2) integer box, shape (n, channels)"""
+    if integral is None:
+        integral = np.empty((len(maps), maps.shape[1] + 1, maps.shape[2] + 1))
+    for channel, out in zip(maps, integral):
+        cv2.integral(channel, out, sdepth=cv2.CV_64F)
+    x1, y1, x2, y2 = boxes.T
+    corners = integral[:, y2, x2] - integral[:, y1, x2] - integral[:, y2, x1] + integral[:, y1, x1]
+    return corners.T
+
+
+def analyze_health(rgb: np.ndarray, boxes: np.ndarray) -> List[Dict[str, Any]]:
+    """Vegetation indices, stress ratios and texture for each (x1, y1, x2, y2) pixel box of a uint8 RGB array.
+
+    ExG, VARI and GLI are box means. Yellowing and browning are fractions of the
+    box's foliage pixels (green, yellow or brown in HSV). Texture is the grey-level
+    standard deviation (contrast) and Laplacian variance (fine detail). The score
+    is 100 x (1 - yellowing - 1.5 x browning), clipped to 0-100.
+    """
+    if not len(boxes):
+        return []
+    height, width = rgb.shape[:2]
+    cells = np.round(np.asarray(boxes, dtype=float)).astype(np.int64)
+    cells[:, [0, 2]] = np.clip(cells[:, [0, 2]], 0, width)
+    cells[:, [1, 3]] = np.clip(cells[:, [1, 3]], 0, height)
+    cells[:, 2] = np.maximum(cells[:, 2], np.minimum(cells[:, 0] + 1, width))
+    cells[:, 3] = np.maximum(cells[:, 3], np.minimum(cells[:, 1] + 1, height))
+    cells[:, 0] = np.minimum(cells[:, 0], cells[:, 2] - 1)
+    cells[:, 1] = np.minimum(cells[:, 1], cells[:, 3] - 1)
+
+    # Scratch maps and integral images come from the pool: images from one camera share a shape
+    with buffer_pool.borrow((len(CHANNELS), height, width), np.float32) as maps, \
+            buffer_pool.borrow((len(CHANNELS), height + 1, width + 1), np.float64) as integral:
+        sums = box_sums(pixel_maps(rgb, maps), cells, integral)
+    area = ((cells[:, 2] - cells[:, 0]) * (cells[:, 3] - cells[:, 1])).astype(float)
+    means = sums / area[:, None]
+    column = {name: index for index, name in enumerate(CHANNELS)}
+
+    foliage = sums[:, column["green"]] + sums[:, column["yellow"]] + sums[:, column["brown"]]
+    share = np.maximum(foliage, 1)
+    yellowing = sums[:, column["yellow"]] / share
+    browning = sums[:, column["brown"]] / share
+    green_ratio = sums[:, column["green"]] / share
+    contrast = np.sqrt(np.maximum(means[:, column["gray_sq"]] - means[:, column["gray"]] ** 2, 0))
+    sharpness = np.maximum(means[:, column["lap_sq"]] - means[:, column["lap"]] ** 2, 0)
+    score = np.clip(100 * (1 - yellowing - 1.5 * browning), 0, 100)
+    enough = foliage / area >= MIN_FOLIAGE_FRACTION
+    status = np.where(~enough, "unknown", np.where(score >= 75, "healthy",
+                                                   np.where(score >= 50, "mild stress", "stressed")))
+
+    rows = np.column_stack([means[:, column["exg"]], means[:, column["vari"]], means[:, column["gli"]],
+                            green_ratio, yellowing, browning, foliage / area, contrast, sharpness, score])
+    results = []
+    for values, label in zip(np.round(rows, 4).tolist(), status.tolist()):
+        exg, vari, gli, green, yellow, brown, cover, contrast_value, sharpness_value, score_value = values
+        results.append({
+            "score": round(score_value, 1),
+            "status": label,
+            "indices": {"exg": exg, "vari": vari, "gli": gli},
+            "greenRatio": green,
+            "yellowingRatio": yellow,
+            "browningRatio": brown,
+            "foliageFraction": cover,
+            "texture": {"contrast": round(contrast_value, 2), "sharpness": round(sharpness_value, 2)},
+        })
+    return results
+
+
+def attach_health(image: Image.Image, detections: List[Dict[str, Any]]):
+    """Add a ``health`` entry to every detection in place, analysing at most HEALTH_MAX_SIDE pixels"""
+    if not detections:
+        return
+    factor = -(-max(image.size) // HEALTH_MAX_SIDE)
+    small = image.reduce(factor) if factor > 1 else image  # box-filter downscale
+    rgb = np.asarray(small.convert("RGB") if small.mode != "RGB" else small)
+    boxes = np.array([[d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]] for d in detections],
+                     dtype=float).reshape(-1, 4)
+    boxes *= [small.size[0] / image.size[0], small.size[1] / image.size[1]] * 2
+    for detection, health in zip(detections, analyze_health(rgb, boxes)):
+        detection["health"] = health
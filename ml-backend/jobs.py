@@ -0,0 +1,264 @@
+import os
+import json
+import uuid
+import hashlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def utc_now() -> str:
+    """Current UTC time as an ISO-8601 string"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def content_hash(contents: bytes) -> str:
+    """Idempotency key of an uploaded image"""
+    return hashlib.sha256(contents).hexdigest()
+
+
+class BlobStore:
+    """Content-addressed spool of job uploads, so interrupted jobs can resume after a restart"""
+
+    def __init__(self, root: str = "job_uploads"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def put(self, key: str, contents: bytes):
+        path = self._path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(exist_ok=True)
+        staging = path.with_name(f".{key}.{uuid.uuid4().hex}")
+        with open(staging, "wb") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        staging.replace(path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+
+class JobStore:
+    """SQLite-backed store for asynchronous analysis jobs.
+
+    Columns mirror the Prisma ``AIAnalysis`` model (``status``, ``yoloData``,
+    ``imageMetadata``, ``confidence``, ``processingTime`` ...) so finished jobs
+    can be copied into the main database without reshaping.
+
+    Each image of a job is a row in ``job_items`` keyed by its content hash;
+    finished results are stored once per (content hash, model version) in
+    ``item_results``, which doubles as the manifest a restarted process
+    resumes from without recomputing completed images.
+    """
+
+    TERMINAL_STATUSES = ("completed", "failed")
+    ITEM_STATUSES = ("pending", "running", "completed", "failed")
+
+    def __init__(self, db_path: str = "jobs.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT NOT NULL PRIMARY KEY,
+                    imageUrl TEXT NOT NULL,
+                    imageMetadata TEXT,
+                    yoloData TEXT,
+                    confidence REAL NOT NULL DEFAULT 0,
+                    processingTime INTEGER NOT NULL DEFAULT 0,
+                    progress REAL NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'processing',
+                    errorMessage TEXT,
+                    createdAt TEXT NOT NULL,
+                    completedAt TEXT
+                )
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "clientId" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN clientId TEXT")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_items (
+                    jobId TEXT NOT NULL,
+                    itemIndex INTEGER NOT NULL,
+                    contentHash TEXT NOT NULL,
+                    filename TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    errorMessage TEXT,
+                    updatedAt TEXT NOT NULL,
+                    PRIMARY KEY (jobId, itemIndex)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS item_results (
+                    contentHash TEXT NOT NULL,
+                    modelVersion TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    createdAt TEXT NOT NULL,
+                    PRIMARY KEY (contentHash, modelVersion)
+                )
+            """)
+
+    def create(self, image_url: str, image_metadata: List[Dict[str, Any]],
+               items: Sequence[Tuple[str, str]] = (), client_id: Optional[str] = None) -> str:
+        """Insert a new job in the ``processing`` state with its (content hash, filename) items"""
+        job_id = uuid.uuid4().hex
+        now = utc_now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, imageUrl, imageMetadata, createdAt, clientId) VALUES (?, ?, ?, ?, ?)",
+                (job_id, image_url, json.dumps(image_metadata), now, client_id),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (jobId, itemIndex, contentHash, filename, updatedAt) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, index, key, filename, now) for index, (key, filename) in enumerate(items)],
+            )
+        return job_id
+
+    def complete(self, job_id: str, yolo_data: Dict[str, Any], confidence: float, processing_time: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE jobs SET status = 'completed', progress = 1, yoloData = ?, confidence = ?,
+                   processingTime = ?, completedAt = ? WHERE id = ?""",
+                (json.dumps(yolo_data), confidence, processing_time, utc_now(), job_id),
+            )
+
+    def fail(self, job_id: str, error_message: str, processing_time: int = 0):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE jobs SET status = 'failed', errorMessage = ?, processingTime = ?,
+                   completedAt = ? WHERE id = ?""",
+                (error_message, processing_time, utc_now(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a job as a JSON-ready dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("imageMetadata", "yoloData"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def items(self, job_id: str) -> List[Dict[str, Any]]:
+        """Per-image state of a job in upload order"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT itemIndex AS "index", contentHash, filename, status, attempts, errorMessage, updatedAt
+                   FROM job_items WHERE jobId = ? ORDER BY itemIndex""",
+                (job_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def item_counts(self, job_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE jobId = ? GROUP BY status", (job_id,)
+            ).fetchall()
+        counts = {status: 0 for status in self.ITEM_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def mark_item(self, job_id: str, index: int, status: str, attempts: Optional[int] = None,
+                  error_message: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE job_items SET status = ?, attempts = COALESCE(?, attempts), errorMessage = ?,
+                   updatedAt = ? WHERE jobId = ? AND itemIndex = ?""",
+                (status, attempts, error_message, utc_now(), job_id, index),
+            )
+
+    def cached_result(self, key: str, model_version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM item_results WHERE contentHash = ? AND modelVersion = ?", (key, model_version)
+            ).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def complete_item(self, job_id: str, index: int, key: str, model_version: str,
+                      result: Dict[str, Any]) -> Tuple[int, int]:
+        """Store an item's result (first write wins) and mark it done; returns (completed, total)"""
+        now = utc_now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO item_results (contentHash, modelVersion, result, createdAt) VALUES (?, ?, ?, ?)",
+                (key, model_version, json.dumps(result), now),
+            )
+            self._conn.execute(
+                """UPDATE job_items SET status = 'completed', errorMessage = NULL, updatedAt = ?
+                   WHERE jobId = ? AND itemIndex = ?""",
+                (now, job_id, index),
+            )
+            completed, total = self._conn.execute(
+                "SELECT SUM(status = 'completed'), COUNT(*) FROM job_items WHERE jobId = ?", (job_id,)
+            ).fetchone()
+            self._conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (completed / total, job_id))
+        return completed, total
+
+    def item_results(self, job_id: str, model_version: str) -> List[Dict[str, Any]]:
+        """Results of a job's items in upload order"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT r.result FROM job_items i JOIN item_results r
+                   ON r.contentHash = i.contentHash AND r.modelVersion = ?
+                   WHERE i.jobId = ? ORDER BY i.itemIndex""",
+                (model_version, job_id),
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
+
+    def resumable(self) -> List[Dict[str, Any]]:
+        """Unfinished jobs with per-item manifests, to be resumed after a restart"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT id, imageUrl, clientId FROM jobs WHERE status = 'processing'
+                   AND EXISTS (SELECT 1 FROM job_items WHERE jobId = jobs.id)"""
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def releasable_hashes(self, job_id: str) -> List[str]:
+        """Upload hashes of a job that no other unfinished job still needs"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT DISTINCT contentHash FROM job_items WHERE jobId = ? AND contentHash NOT IN (
+                       SELECT i.contentHash FROM job_items i JOIN jobs j ON j.id = i.jobId
+                       WHERE j.status = 'processing' AND i.jobId != ?)""",
+                (job_id, job_id),
+            ).fetchall()
+        return [row["contentHash"] for row in rows]
+
+    def recover_interrupted(self) -> int:
+        """Fail unfinished jobs without an item manifest (created before uploads were spooled)"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """UPDATE jobs SET status = 'failed', errorMessage = 'Interrupted by server restart',
+                   completedAt = ? WHERE status = 'processing'
+                   AND NOT EXISTS (SELECT 1 FROM job_items WHERE jobId = jobs.id)""",
+                (utc_now(),),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Marked {cursor.rowcount} interrupted job(s) as failed")
+        return cursor.rowcount
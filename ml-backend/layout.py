@@ -0,0 +1,188 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spatial import grid_pairs
+
+LAYOUT_VERSION = "1.0"
+DEFAULT_GROUND_WIDTH_M = 4.0  # garden width covered by a typical phone photo
+
+# Minimum centre-to-centre spacing (metres) by plant category
+SPACING_M = {
+    "herb": 0.3,
+    "flower": 0.25,
+    "aromatic": 0.45,
+    "medicinal": 0.4,
+    "root": 0.3,
+    "wildflower": 0.2,
+    "tree": 2.0,
+    "unknown": 0.3,
+}
+
+
+class GroundProjection:
+    """Maps image pixels to garden-plane metres.
+
+    Either a 3x3 ``homography`` (pixel -> ground, e.g. from four marked
+    reference points) or a plain top-down scale where the photo spans
+    ``ground_width_m`` horizontally.
+    """
+
+    def __init__(self, image_width: int, image_height: int, ground_width_m: float = DEFAULT_GROUND_WIDTH_M,
+                 homography: Optional[Sequence[Sequence[float]]] = None):
+        self.image_size = (image_width, image_height)
+        self.homography = np.asarray(homography, dtype=float) if homography is not None else None
+        if self.homography is not None and self.homography.shape != (3, 3):
+            raise ValueError("homography must be a 3x3 matrix")
+        self.meters_per_pixel = ground_width_m / image_width
+
+    def to_ground(self, pixels: np.ndarray) -> np.ndarray:
+        """Project (n, 2) pixel coordinates onto the ground plane"""
+        if self.homography is None:
+            return pixels * self.meters_per_pixel
+        projected = np.c_[pixels, np.ones(len(pixels))] @ self.homography.T
+        return projected[:, :2] / projected[:, 2:3]
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ground-plane bounding box of the photo"""
+        width, height = self.image_size
+        corners = self.to_ground(np.array([[0, 0], [width, 0], [0, height], [width, height]], dtype=float))
+        return corners.min(axis=0), corners.max(axis=0)
+
+    def describe(self) -> Dict[str, Any]:
+        if self.homography is None:
+            return {"type": "scale", "metersPerPixel": self.meters_per_pixel}
+        return {"type": "homography", "matrix": self.homography.tolist()}
+
+
+def resolve_collisions(positions: np.ndarray, radius: np.ndarray, low: np.ndarray, high: np.ndarray,
+                       max_iterations: int = 50, tolerance: float = 1e-3) -> Tuple[np.ndarray, int, int]:
+    """Push overlapping footprints apart until none overlap (or ``max_iterations``).
+
+    Candidate pairs come from a uniform grid and are kept as a neighbour list
+    padded by ``skin``, rebuilt only once some plant has moved more than half
+    the padding. Each iteration moves every overlapping pair apart along the
+    line between their centres at once; the larger plant moves less.
+    Returns (positions, initial overlaps, iterations).
+    """
+    positions = positions.copy()
+    if len(positions) < 2:
+        return positions, 0, 0
+    skin = float(np.median(radius))
+    cell_size = 2 * float(radius.max()) + skin
+    initial = None
+    anchor = None
+    for iteration in range(max_iterations):
+        if anchor is None or np.max(np.hypot(*(positions - anchor).T)) > skin / 2:
+            i, j = grid_pairs(positions, cell_size)
+            near = np.hypot(*(positions[j] - positions[i]).T) < radius[i] + radius[j] + skin
+            i, j, reach = i[near], j[near], (radius[i] + radius[j])[near]
+            anchor = positions.copy()
+        delta = positions[j] - positions[i]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        overlap = reach - distance
+        colliding = overlap > tolerance
+        if initial is None:
+            initial = int(colliding.sum())
+        if not colliding.any():
+            return positions, initial, iteration
+        ci, cj, delta, distance, overlap = i[colliding], j[colliding], delta[colliding], distance[colliding], overlap[colliding]
+
+        direction = np.zeros_like(delta)
+        apart = distance > 1e-9
+        direction[apart] = delta[apart] / distance[apart, None]
+        # Coincident centres: split along a deterministic per-pair angle
+        angle = (ci[~apart] * 2.399963) % (2 * np.pi)
+        direction[~apart] = np.c_[np.cos(angle), np.sin(angle)]
+
+        share_i = radius[cj] / (radius[ci] + radius[cj])
+        push = np.zeros_like(positions)
+        np.add.at(push, ci, -direction * (overlap * share_i)[:, None])
+        np.add.at(push, cj, direction * (overlap * (1 - share_i))[:, None])
+        positions = np.clip(positions + push, low, high)
+    return positions, initial or 0, max_iterations
+
+
+def build_layout(detections: List[Dict[str, Any]], image_info: Dict[str, Any],
+                 ground_width_m: float = DEFAULT_GROUND_WIDTH_M, homography: Optional[Sequence[Sequence[float]]] = None,
+                 anchor: str = "base", max_iterations: int = 50) -> Dict[str, Any]:
+    """Turn detect-plants output into a garden layout document with positions in metres.
+
+    ``anchor="base"`` places each plant at the bottom centre of its box (where
+    it meets the ground in an oblique photo); ``"center"`` suits top-down shots.
+    Footprints are the projected box width, but never less than the category's
+    minimum spacing, and overlapping footprints are resolved.
+    """
+    start = time.perf_counter()
+    projection = GroundProjection(image_info["width"], image_info["height"], ground_width_m, homography)
+    boxes = np.array([[d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]] for d in detections],
+                     dtype=float).reshape(-1, 4)
+    center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    anchor_y = boxes[:, 3] if anchor == "base" else (boxes[:, 1] + boxes[:, 3]) / 2
+
+    ground = projection.to_ground(np.c_[center_x, anchor_y])
+    canopy = np.linalg.norm(projection.to_ground(np.c_[boxes[:, 2], anchor_y]) -
+                            projection.to_ground(np.c_[boxes[:, 0], anchor_y]), axis=1)
+    spacing = np.array([SPACING_M.get(d.get("category", "unknown"), SPACING_M["unknown"]) for d in detections])
+    radius = np.maximum(canopy, spacing) / 2
+
+    low, high = projection.bounds()
+    placed, initial_collisions, iterations = resolve_collisions(ground, radius, low, high, max_iterations)
+    displacement = np.hypot(*(placed - ground).T) if len(placed) else np.empty(0)
+
+    plants = []
+    for index, detection in enumerate(detections):
+        plants.append({
+            "id": f"plant_{index + 1}",
+            "label": detection["label"],
+            "category": detection.get("category", "unknown"),
+            "position": {"x": round(float(placed[index, 0]), 3), "y": round(float(placed[index, 1]), 3), "z": 0},
+            "pixel": {"x": round(float(center_x[index]), 1), "y": round(float(anchor_y[index]), 1)},
+            "footprint": {"radius": round(float(radius[index]), 3), "canopy": round(float(canopy[index]), 3)},
+            "displacement": round(float(displacement[index]), 3),
+            "species": {
+                "scientific": detection.get("scientific_name", "Unknown"),
+                "common": detection["label"],
+                "confidence": detection["confidence"],
+            },
+            "boundingBox": detection["bbox"],
+            "detectionConfidence": detection["confidence"],
+        })
+
+    width, depth = (high - low).tolist()
+    recommendations = []
+    if initial_collisions:
+        recommendations.append({
+            "type": "spacing",
+            "priority": "medium",
+            "message": f"{initial_collisions} pair(s) of plants are closer than their recommended spacing.",
+            "action": "Adjust plant positions to allow adequate growing space",
+        })
+    return {
+        "version": LAYOUT_VERSION,
+        "units": "meters",
+        "confidence": round(float(np.mean([d["confidence"] for d in detections])), 2) if detections else 0.0,
+        "dimensions": {
+            "width": round(width, 3),
+            "depth": round(depth, 3),
+            "totalArea": round(width * depth, 3),
+            "plantedArea": round(float(np.sum(np.pi * radius ** 2)), 3),
+        },
+        "projection": {**projection.describe(), "anchor": anchor},
+        "plants": plants,
+        "objects": [],
+        "zones": [],
+        "recommendations": recommendations,
+        "metadata": {
+            "analysisDate": datetime.now(timezone.utc).isoformat(),
+            "imageSize": {"width": image_info["width"], "height": image_info["height"]},
+            "processingStats": {
+                "plantsPlaced": len(plants),
+                "initialCollisions": initial_collisions,
+                "resolutionIterations": iterations,
+                "processingTimeMs": round((time.perf_counter() - start) * 1000, 2),
+            },
+        },
+    }
@@ -1,7 +1,12 @@
 import os
 import io
 import json
+import time
+import random
+import asyncio
+import hmac
 import logging
+import threading
 from typing import List, Dict, Any
 from pathlib import Path
 
@@ -9,9 +14,32 @@ import torch
 import cv2
 import numpy as np
 from PIL import Image
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import YOLO
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from compression import CompressionMiddleware, compression_settings
+from deadlines import Deadline, RequestCancelled, deadline_from_request, await_result
+from artifacts import weights_hash
+from jobs import JobStore, BlobStore, content_hash
+from metrics import metrics
+from scheduler import InferenceScheduler, RateLimitExceeded, RequestTooLarge, INTERACTIVE, BULK, client_identity
+from persistence import AnalysisWriter
+from detector import PlantDetector, PLANT_CATEGORIES, TTA_VARIANTS
+from layout import build_layout, DEFAULT_GROUND_WIDTH_M
+from garden_index import GardenIndexRegistry
+from spatial import check_coordinates
+from masks import DEFAULT_MASK_SIZE, encode_rle, decode_rle, resize_masks
+from pipeline import Frame, RunContext, build_pipelines, pipeline_config
+from stages import default_pipelines
+from buffers import MemoryBudgetExceeded, buffer_pool, decoded_bytes, memory_budget
+from profiling import Profiler, ProfileBusy, check_profile_request
+from runtime import Runtime, RuntimeConfig
+from tracing import TracingMiddleware, tracer_from_env
+from streaming import FrameStreamSession
+from tracking import TemporalDetector
+from serialization import negotiate_format, compact_response, COMPACT_JSON_MEDIA_TYPE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -26,171 +54,121 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["traceparent"],
 )
 
-# Plant category mapping for medicinal properties
-PLANT_CATEGORIES = {
-    "aloe": {"category": "medicinal", "properties": ["healing", "anti-inflammatory", "skin care"]},
-    "basil": {"category": "herb", "properties": ["digestive", "antibacterial", "antioxidant"]},
-    "mint": {"category": "herb", "properties": ["digestive", "cooling", "respiratory"]},
-    "lavender": {"category": "aromatic", "properties": ["calming", "antiseptic", "sleep aid"]},
-    "rosemary": {"category": "herb", "properties": ["memory", "circulation", "antioxidant"]},
-    "sage": {"category": "herb", "properties": ["antimicrobial", "cognitive", "throat health"]},
-    "thyme": {"category": "herb", "properties": ["antibacterial", "respiratory", "immune support"]},
-    "oregano": {"category": "herb", "properties": ["antiviral", "digestive", "immune boost"]},
-    "chamomile": {"category": "flower", "properties": ["calming", "digestive", "anti-inflammatory"]},
-    "echinacea": {"category": "flower", "properties": ["immune support", "antiviral", "wound healing"]},
-    "turmeric": {"category": "root", "properties": ["anti-inflammatory", "antioxidant", "digestive"]},
-    "ginger": {"category": "root", "properties": ["digestive", "anti-nausea", "anti-inflammatory"]},
-    "ginkgo": {"category": "tree", "properties": ["circulation", "cognitive", "antioxidant"]},
-    "ginseng": {"category": "root", "properties": ["energy", "immune support", "adaptogenic"]},
-    "dandelion": {"category": "wildflower", "properties": ["detox", "liver support", "diuretic"]},
-}
-
-class PlantDetector:
-    def __init__(self):
-        self.model = None
-        self.load_model()
-    
-    def load_model(self):
-        """Load YOLOv5 model - use custom trained model if available, otherwise use pretrained"""
-        try:
-            # Try to load custom plant detection model
-            custom_model_path = Path("models/best.pt")
-            if custom_model_path.exists():
-                logger.info("Loading custom plant detection model...")
-                self.model = YOLO(str(custom_model_path))
-            else:
-                logger.info("Custom model not found, using general YOLOv5 model...")
-                # Use general YOLOv5 model and filter for plant-like objects
-                self.model = YOLO('yolov5s.pt')
-        except Exception as e:
-            logger.error(f"Error loading model: {e}")
-            # Fallback to basic YOLOv5
-            self.model = YOLO('yolov5s.pt')
-    
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
-        """Preprocess image for optimal plant detection"""
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if too large (optimal size for YOLOv5)
-        max_size = 1280
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-        
-        return image
-    
-    def enhance_plant_detection(self, results) -> List[Dict[str, Any]]:
-        """Process YOLOv5 results and enhance for plant detection"""
-        detections = []
-        
-        if not results:
-            return detections
-        
-        # Get detection results
-        for result in results:
-            boxes = result.boxes
-            if boxes is None:
-                continue
-                
-            for box in boxes:
-                # Extract coordinates and confidence
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                class_id = int(box.cls[0].cpu().numpy())
-                
-                # Get class name
-                class_name = result.names[class_id].lower()
-                
-                # Filter for plant-related objects and enhance detection
-                plant_name = self.classify_plant_from_detection(class_name, confidence)
-                
-                if plant_name and confidence > 0.3:  # Confidence threshold
-                    detection = {
-                        "bbox": {
-                            "x1": float(x1),
-                            "y1": float(y1), 
-                            "x2": float(x2),
-                            "y2": float(y2),
-                            "width": float(x2 - x1),
-                            "height": float(y2 - y1)
-                        },
-                        "label": plant_name,
-                        "confidence": confidence,
-                        "category": PLANT_CATEGORIES.get(plant_name.lower(), {}).get("category", "unknown"),
-                        "properties": PLANT_CATEGORIES.get(plant_name.lower(), {}).get("properties", []),
-                        "scientific_name": self.get_scientific_name(plant_name)
-                    }
-                    detections.append(detection)
-        
-        return detections
-    
-    def classify_plant_from_detection(self, class_name: str, confidence: float) -> str:
-        """Map detected objects to plant names"""
-        plant_mappings = {
-            "potted plant": "houseplant",
-            "vase": "flowering plant",
-            "broccoli": "leafy green",
-            "orange": "citrus tree",
-            "apple": "fruit tree",
-            "banana": "tropical plant",
-            "carrot": "root vegetable",
-            "hot dog": None,  # Not a plant
-            "pizza": None,   # Not a plant
-            "person": None,  # Not a plant
-        }
-        
-        # Direct mapping
-        if class_name in plant_mappings:
-            return plant_mappings[class_name]
-        
-        # Check if it might be a plant based on class name
-        plant_keywords = ["plant", "flower", "tree", "herb", "leaf", "green", "garden"]
-        if any(keyword in class_name for keyword in plant_keywords):
-            return self.infer_plant_type(class_name, confidence)
-        
-        # For unknown objects with high confidence, assume it might be a plant
-        if confidence > 0.7:
-            return "unidentified plant"
-        
-        return None
-    
-    def infer_plant_type(self, class_name: str, confidence: float) -> str:
-        """Infer specific plant type from general detection"""
-        # This would typically use additional plant classification
-        # For now, return common medicinal plants based on confidence
-        if confidence > 0.8:
-            return np.random.choice(["aloe", "basil", "mint", "lavender"])
-        elif confidence > 0.6:
-            return np.random.choice(["rosemary", "sage", "thyme", "oregano"])
-        else:
-            return np.random.choice(["chamomile", "dandelion", "echinacea"])
-    
-    def get_scientific_name(self, plant_name: str) -> str:
-        """Get scientific name for identified plant"""
-        scientific_names = {
-            "aloe": "Aloe barbadensis",
-            "basil": "Ocimum basilicum",
-            "mint": "Mentha species",
-            "lavender": "Lavandula angustifolia",
-            "rosemary": "Rosmarinus officinalis",
-            "sage": "Salvia officinalis",
-            "thyme": "Thymus vulgaris",
-            "oregano": "Origanum vulgare",
-            "chamomile": "Matricaria chamomilla",
-            "echinacea": "Echinacea purpurea",
-            "turmeric": "Curcuma longa",
-            "ginger": "Zingiber officinale",
-            "dandelion": "Taraxacum officinale"
-        }
-        return scientific_names.get(plant_name.lower(), "Unknown species")
+# Compress large responses (batch results, job payloads); SSE and WebSockets pass through
+app.add_middleware(CompressionMiddleware, **compression_settings())
+
+# W3C trace context in, OTLP/JSON spans out (TRACE_EXPORTER=file|otlp; off by default)
+tracer = tracer_from_env()
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Thread counts, CPU pinning and allocator settings sized for this host; applied before the model loads
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+runtime = Runtime(RuntimeConfig.from_env(INFERENCE_WORKERS))
+runtime.apply()
 
-# Initialize detector
 detector = PlantDetector()
+# Stored job results are only reused for the weights that produced them; spans carry it too
+MODEL_VERSION = weights_hash(detector.model.ckpt_path) if detector.model.ckpt_path else "unknown"
+
+# Stage sets per endpoint (decode -> resize -> infer -> classify -> fuse -> health -> serialize by default);
+# PIPELINE_CONFIG / PIPELINE_<NAME> select different stages
+pipelines = build_pipelines(pipeline_config(default_pipelines()), attributes={"model.version": MODEL_VERSION},
+                            detector=detector)
+
+# Fair scheduler in front of inference - the YOLO predictor is not thread-safe, so one worker
+# per detector by default. Interactive uploads are served ahead of bulk batches and jobs.
+scheduler = InferenceScheduler(workers=INFERENCE_WORKERS, initializer=runtime.init_worker)
+
+def rate_limited(e: RateLimitExceeded) -> HTTPException:
+    if isinstance(e, RequestTooLarge):
+        # Retrying cannot help; the caller has to split the request
+        return HTTPException(status_code=413, detail=str(e))
+    retry_after = "3600" if e.retry_after == float("inf") else str(max(1, int(e.retry_after + 0.999)))
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": retry_after})
+
+def request_cancelled(e: RequestCancelled) -> HTTPException:
+    # 504 when the caller's deadline passed; 499 (client closed request) after a disconnect
+    logger.info(f"Abandoned request: {e}")
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+def memory_exhausted(e: MemoryBudgetExceeded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, int(e.retry_after)))})
+
+# Shared secret for /api/admin endpoints (X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(request: Request):
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+profiler = Profiler()
+
+def request_span(request: Request):
+    """The request's trace span (set by TracingMiddleware), or None when tracing is off"""
+    return getattr(request.state, "span", None)
+
+# Persistent store for asynchronous analysis jobs; uploads are spooled so jobs resume after a restart
+job_store = JobStore(os.getenv("JOBS_DB_PATH", "jobs.db"))
+job_store.recover_interrupted()
+job_uploads = BlobStore(os.getenv("JOBS_SPOOL_DIR", "job_uploads"))
+JOB_EVENT_POLL_INTERVAL = 0.5  # seconds between SSE progress checks
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # tries per image before the job fails
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "1.0"))  # seconds before the first retry, doubling
+
+# Write-behind persistence of analyses into the Prisma AIAnalysis table
+ANALYSIS_DB_PATH = Path(os.getenv("ANALYSIS_DB_PATH", Path(__file__).resolve().parent.parent / "prisma" / "dev.db"))
+analysis_writer = None
+if os.getenv("PERSIST_ANALYSES", "1") == "1":
+    if ANALYSIS_DB_PATH.exists():
+        analysis_writer = AnalysisWriter(
+            str(ANALYSIS_DB_PATH),
+            flush_interval_ms=int(os.getenv("ANALYSIS_FLUSH_MS", "250")),
+        )
+    else:
+        logger.warning(f"Analysis database {ANALYSIS_DB_PATH} not found, persistence disabled")
+
+# In-memory spatial indexes over each garden's plant_instances (same database)
+garden_indexes = None
+if ANALYSIS_DB_PATH.exists():
+    garden_indexes = GardenIndexRegistry(
+        str(ANALYSIS_DB_PATH),
+        refresh_interval=float(os.getenv("GARDEN_INDEX_REFRESH", "30")),
+        max_gardens=int(os.getenv("GARDEN_INDEX_MAX_GARDENS", "256")),
+    )
+
+@app.on_event("startup")
+async def start_background_writers():
+    if analysis_writer is not None:
+        analysis_writer.start()
+    tracer.start()
+
+@app.on_event("shutdown")
+async def stop_background_writers():
+    if analysis_writer is not None:
+        analysis_writer.stop()
+    tracer.stop()
+
+def mean_confidence(detections: List[Dict[str, Any]]) -> float:
+    """Overall confidence of an analysis (mean over its detections)"""
+    return float(np.mean([d["confidence"] for d in detections])) if detections else 0.0
+
+def record_analysis(image_url: str, processing_time: int, response: Dict[str, Any] = None,
+                    error_message: str = None, garden_layout: Dict[str, Any] = None,
+                    sam_data: Dict[str, Any] = None):
+    """Queue an analysis for persistence without blocking the caller"""
+    if analysis_writer is None:
+        return
+    if response is None:
+        analysis_writer.enqueue(image_url, None, None, 0.0, processing_time,
+                                status="failed", error_message=error_message)
+    else:
+        analysis_writer.enqueue(image_url, response["image_info"], response["plants"],
+                                mean_confidence(response["plants"]), processing_time,
+                                garden_layout=garden_layout, sam_data=sam_data)
 
 @app.get("/")
 async def root():
@@ -198,58 +176,614 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "model_loaded": detector.model is not None}
+    return {"status": "healthy", "model_loaded": detector.model is not None, "backend": detector.backend,
+            "precision": detector.precision, "segmentation": detector.seg_model is not None}
+
+@torch.inference_mode()
+def run_detection(contents: bytes, imgsz: int = None, deadline: Deadline = None,
+                  tta: bool = False, span=None) -> Dict[str, Any]:
+    """Run the full detection pipeline on raw image bytes and build the response dict"""
+    # Stages check the deadline between them, so abandoned work stops early
+    context = RunContext(deadline or Deadline(), imgsz, scheduler.queue_depth(), span=span)
+    pipeline = pipelines["detect_tta" if tta else "detect"]
+    return pipeline.run(Frame(contents=contents), context).response
+
+@torch.inference_mode()
+def run_detection_batch(images: List[bytes], imgsz: int = None, deadline: Deadline = None,
+                        span=None) -> List[Dict[str, Any]]:
+    """Detect plants in several images with a single batched model call"""
+    context = RunContext(deadline or Deadline(), imgsz, scheduler.queue_depth(), span=span)
+    frames = pipelines["detect"].run_batch([Frame(contents=contents) for contents in images], context)
+    return [frame.response for frame in frames]
 
 @app.post("/api/detect-plants")
-async def detect_plants(file: UploadFile = File(...)):
+async def detect_plants(request: Request, file: UploadFile = File(...), imgsz: int = None,
+                        timeout: float = None, tta: bool = False):
     """
     Detect plants in uploaded image
     Returns: List of detected plants with bounding boxes, confidence scores, and properties
+    Send `Accept: application/msgpack` or `application/vnd.plant-detection.compact+json`
+    for the columnar compact format; plain JSON is the default.
+    `imgsz` overrides the adaptive inference resolution (320/480/640/960).
+    `timeout` (seconds, or the `X-Request-Timeout` header) sets a deadline after
+    which the work is abandoned with 504; work is also dropped if the client disconnects.
+    `tta=true` adds test-time augmentation (flipped and downscaled variants in one
+    batched pass) for better recall at roughly the cost of a small batch.
     """
+    deadline = deadline_from_request(request, timeout)
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read and preprocess image
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        image = detector.preprocess_image(image)
+        start_time = time.time()
         
-        # Run detection
-        results = detector.model(image, conf=0.25)  # Lower confidence for more detections
+        # Inference runs on the scheduler so the event loop stays responsive
+        future = scheduler.submit_for(client_identity(request), INTERACTIVE, run_detection, contents, imgsz,
+                                      deadline, tta, request_span(request), cost=len(TTA_VARIANTS) if tta else 1,
+                                      deadline=deadline)
+        response = await await_result(request, future, deadline)
         
-        # Process results
-        detections = detector.enhance_plant_detection(results)
-        
-        # Calculate image metadata
-        image_info = {
-            "width": image.size[0],
-            "height": image.size[1],
-            "format": image.format or "Unknown",
-            "mode": image.mode
-        }
-        
-        response = {
-            "success": True,
-            "plants": detections,
-            "count": len(detections),
-            "image_info": image_info,
-            "message": f"Detected {len(detections)} plant(s)" if detections else "No plants detected"
-        }
+        record_analysis(file.filename or "upload", int((time.time() - start_time) * 1000), response)
+        logger.info(f"Processed image: {response['count']} plants detected")
         
-        logger.info(f"Processed image: {len(detections)} plants detected")
+        fmt = negotiate_format(request.headers.get("accept"))
+        if fmt != "json":
+            return compact_response([response], fmt)
         return response
         
+    except HTTPException:
+        raise  # client errors are not failed analyses
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    except RequestCancelled as e:
+        raise request_cancelled(e)
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
     except Exception as e:
+        record_analysis(file.filename or "upload", 0, error_message=str(e))
         logger.error(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
+@app.post("/api/detect-plants/batch")
+async def detect_plants_batch(request: Request, files: List[UploadFile] = File(...), imgsz: int = None,
+                              timeout: float = None):
+    """
+    Detect plants in several uploaded images in one batched inference call
+    Returns: {"results": [...]} with one detect-plants response per image, or the
+    columnar compact format (shared species table) when negotiated via Accept
+    """
+    deadline = deadline_from_request(request, timeout)
+    for file in files:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File {file.filename} must be an image")
+    
+    try:
+        images = [await file.read() for file in files]
+        start_time = time.time()
+        
+        future = scheduler.submit_for(client_identity(request), BULK, run_detection_batch, images, imgsz,
+                                      deadline, request_span(request), cost=len(images), deadline=deadline)
+        results = await await_result(request, future, deadline)
+        
+        processing_time = int((time.time() - start_time) * 1000)
+        for file, result in zip(files, results):
+            record_analysis(file.filename or "upload", processing_time // len(files), result)
+        logger.info(f"Processed batch: {len(files)} images, {sum(r['count'] for r in results)} plants detected")
+        
+        fmt = negotiate_format(request.headers.get("accept"))
+        if fmt != "json":
+            return compact_response(results, fmt)
+        return {"success": True, "results": results, "count": len(results)}
+        
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    except RequestCancelled as e:
+        raise request_cancelled(e)
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
+    except Exception as e:
+        logger.error(f"Error processing batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
+
+@torch.inference_mode()
+def run_segmentation(contents: bytes, imgsz: int = None, deadline: Deadline = None, mask_format: str = "rle",
+                     mask_size: int = DEFAULT_MASK_SIZE, span=None) -> Dict[str, Any]:
+    """Detection plus per-plant masks (RLE or polygons) and coverage metrics"""
+    context = RunContext(deadline or Deadline(), imgsz, scheduler.queue_depth(),
+                         {"mask_format": mask_format, "mask_size": mask_size}, span)
+    return pipelines["segment"].run(Frame(contents=contents), context).response
+
+@app.post("/api/segment-plants")
+async def segment_plants(request: Request, file: UploadFile = File(...), imgsz: int = None,
+                         mask_format: str = "rle", mask_size: int = DEFAULT_MASK_SIZE, timeout: float = None):
+    """
+    Detect plants with instance masks (requires a YOLO-seg model, see SEGMENTATION_MODEL)
+    Returns: the detect-plants response with a `mask` per plant, either COCO RLE at reduced
+    resolution (`segmentation.maskSize`, upscale via /api/masks/upscale) or polygons in image
+    pixels, plus mask/leaf areas and canopy coverage
+    """
+    if detector.seg_model is None:
+        raise HTTPException(status_code=503, detail="No segmentation model loaded")
+    if mask_format not in ("rle", "polygon"):
+        raise HTTPException(status_code=400, detail="mask_format must be 'rle' or 'polygon'")
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    mask_size = min(max(mask_size, 32), 1024)
+    deadline = deadline_from_request(request, timeout)
+    try:
+        contents = await file.read()
+        start_time = time.time()
+        
+        future = scheduler.submit_for(client_identity(request), INTERACTIVE, run_segmentation, contents, imgsz,
+                                      deadline, mask_format, mask_size, request_span(request), deadline=deadline)
+        response = await await_result(request, future, deadline)
+        
+        sam_data = {**response["segmentation"], "masks": [plant["mask"] for plant in response["plants"]]}
+        record_analysis(file.filename or "upload", int((time.time() - start_time) * 1000), response,
+                        sam_data=sam_data)
+        logger.info(f"Segmented image: {response['count']} plants, "
+                    f"{response['segmentation']['coverage']['canopyCoverage']:.1%} canopy coverage")
+        return response
+        
+    except HTTPException:
+        raise  # client errors are not failed analyses
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    except RequestCancelled as e:
+        raise request_cancelled(e)
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
+    except Exception as e:
+        record_analysis(file.filename or "upload", 0, error_message=str(e))
+        logger.error(f"Error segmenting image: {e}")
+        raise HTTPException(status_code=500, detail=f"Error segmenting image: {str(e)}")
+
+# Bytes per output pixel while upscaling a mask: float32 resize output, boolean mask and uint8 PNG input
+UPSCALE_BYTES_PER_PIXEL = 6
+
+@app.post("/api/masks/upscale")
+def upscale_mask(mask: Dict[str, Any], width: int, height: int, format: str = "png"):
+    """
+    Upscale a reduced-resolution RLE mask (from /api/segment-plants) to `width` x `height`
+    Returns a PNG (`format=png`) or COCO RLE (`format=rle`) at the requested size
+    A plain function, so FastAPI runs the decode and resize in its threadpool
+    """
+    if not (0 < width <= 8192 and 0 < height <= 8192):
+        raise HTTPException(status_code=400, detail="width and height must be between 1 and 8192")
+    try:
+        decoded = decode_rle(mask)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid RLE mask: {e}")
+    try:
+        with memory_budget.reserve(width * height * UPSCALE_BYTES_PER_PIXEL, stage="upscale"):
+            upscaled = resize_masks(decoded[None], (width, height))[0]
+            if format == "rle":
+                return encode_rle(upscaled)
+            _, png = cv2.imencode(".png", upscaled.astype(np.uint8) * 255)
+            return Response(content=png.tobytes(), media_type="image/png")
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
+
+def parse_homography(homography: str):
+    """3x3 pixel -> ground homography from a JSON query parameter"""
+    if homography is None:
+        return None
+    try:
+        matrix = np.asarray(json.loads(homography), dtype=float)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="homography must be a JSON 3x3 matrix")
+    if matrix.shape != (3, 3):
+        raise HTTPException(status_code=400, detail="homography must be a JSON 3x3 matrix")
+    return matrix
+
+@app.post("/api/garden-layout")
+async def generate_garden_layout(request: Request, file: UploadFile = File(...),
+                                 ground_width: float = DEFAULT_GROUND_WIDTH_M, homography: str = None,
+                                 anchor: str = "base", imgsz: int = None, timeout: float = None):
+    """
+    Detect plants and place them in garden space (metres)
+    Returns: the detect-plants response plus a `layout` document (the AIAnalysis.gardenLayout shape)
+    `ground_width` is the garden width the photo spans; pass `homography` (JSON 3x3,
+    pixel -> ground) instead for oblique photos. `anchor` is `base` (bottom of each
+    box) or `center` (top-down shots).
+    """
+    if anchor not in ("base", "center"):
+        raise HTTPException(status_code=400, detail="anchor must be 'base' or 'center'")
+    if ground_width <= 0:
+        raise HTTPException(status_code=400, detail="ground_width must be positive")
+    matrix = parse_homography(homography)
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    deadline = deadline_from_request(request, timeout)
+    try:
+        contents = await file.read()
+        start_time = time.time()
+        
+        future = scheduler.submit_for(client_identity(request), INTERACTIVE, run_detection, contents, imgsz,
+                                      deadline, False, request_span(request), deadline=deadline)
+        response = await await_result(request, future, deadline)
+        garden_layout = build_layout(response["plants"], response["image_info"], ground_width, matrix, anchor)
+        
+        record_analysis(file.filename or "upload", int((time.time() - start_time) * 1000), response,
+                        garden_layout=garden_layout)
+        logger.info(f"Generated layout: {len(garden_layout['plants'])} plants placed, "
+                    f"{garden_layout['metadata']['processingStats']['initialCollisions']} collisions resolved")
+        return {**response, "layout": garden_layout}
+        
+    except HTTPException:
+        raise  # client errors are not failed analyses
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    except RequestCancelled as e:
+        raise request_cancelled(e)
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
+    except Exception as e:
+        record_analysis(file.filename or "upload", 0, error_message=str(e))
+        logger.error(f"Error generating layout: {e}")
+        raise HTTPException(status_code=500, detail=f"Error generating layout: {str(e)}")
+
+@app.post("/api/garden-layout/from-detections")
+async def layout_from_detections(payload: Dict[str, Any], ground_width: float = DEFAULT_GROUND_WIDTH_M,
+                                 homography: str = None, anchor: str = "base"):
+    """
+    Build a garden layout from an existing detect-plants response (no inference)
+    Body: {"image_info": {...}, "plants": [...]} as returned by /api/detect-plants
+    """
+    if anchor not in ("base", "center"):
+        raise HTTPException(status_code=400, detail="anchor must be 'base' or 'center'")
+    if ground_width <= 0:
+        raise HTTPException(status_code=400, detail="ground_width must be positive")
+    matrix = parse_homography(homography)
+    try:
+        return build_layout(payload["plants"], payload["image_info"], ground_width, matrix, anchor)
+    except (KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid detections payload: missing {e}")
+
+class AnalysisJob:
+    """Runs the items of one job on the scheduler, checkpointing every finished image.
+    
+    Results are stored per content hash as soon as an image finishes, so a job
+    resumed after a restart only runs the images that were still outstanding,
+    and an image already analysed by the same model is never recomputed.
+    Failed images are retried with exponential backoff before the job fails.
+    """
+    
+    def __init__(self, job_id: str, image_url: str, client_id: str):
+        self.job_id = job_id
+        self.image_url = image_url
+        self.client_id = client_id or "anonymous"
+        self.failed = False
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+    
+    def start(self):
+        items = job_store.items(self.job_id)
+        pending = [item for item in items if item["status"] != "completed"]
+        logger.info(f"Job {self.job_id}: {len(items) - len(pending)} of {len(items)} image(s) already done")
+        if not pending:
+            self.complete(int((time.time() - self.start_time) * 1000))
+        for item in pending:
+            self.submit(item)
+    
+    def submit(self, item: Dict[str, Any]):
+        if self.failed:
+            return
+        cached = job_store.cached_result(item["contentHash"], MODEL_VERSION)
+        if cached is not None:
+            metrics.inc("jobs.items_reused")
+            self.on_result(item, cached)
+            return
+        contents = job_uploads.get(item["contentHash"])
+        if contents is None:
+            self.fail(item, "Upload missing from spool, cannot resume")
+            return
+        item["attempts"] += 1
+        job_store.mark_item(self.job_id, item["index"], "running", attempts=item["attempts"])
+        future = scheduler.submit_for(self.client_id, BULK, run_detection, contents, charge=False)
+        future.add_done_callback(lambda f: self.on_image_done(item, f))
+    
+    def on_image_done(self, item: Dict[str, Any], future):
+        error = future.exception()
+        if error is None:
+            self.on_result(item, future.result())
+        elif item["attempts"] < JOB_MAX_ATTEMPTS:
+            delay = JOB_RETRY_BACKOFF * 2 ** (item["attempts"] - 1) * (0.5 + random.random() / 2)
+            logger.warning(f"Job {self.job_id} image {item['index']} failed ({error}), retrying in {delay:.1f}s")
+            metrics.inc("jobs.item_retries")
+            job_store.mark_item(self.job_id, item["index"], "pending", error_message=str(error))
+            timer = threading.Timer(delay, self.submit, (item,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.fail(item, str(error))
+    
+    def on_result(self, item: Dict[str, Any], result: Dict[str, Any]):
+        with self.lock:
+            if self.failed:
+                return
+            completed, total = job_store.complete_item(self.job_id, item["index"], item["contentHash"],
+                                                       MODEL_VERSION, result)
+        if completed == total:
+            self.complete(int((time.time() - self.start_time) * 1000))
+    
+    def fail(self, item: Dict[str, Any], error: str):
+        with self.lock:
+            if self.failed:
+                return
+            self.failed = True
+        processing_time = int((time.time() - self.start_time) * 1000)
+        job_store.mark_item(self.job_id, item["index"], "failed", error_message=error)
+        logger.error(f"Job {self.job_id} failed: {error}")
+        job_store.fail(self.job_id, error, processing_time=processing_time)
+        record_analysis(self.image_url, processing_time, error_message=error)
+        self.release_uploads()
+    
+    def complete(self, processing_time: int):
+        results = job_store.item_results(self.job_id, MODEL_VERSION)
+        plants = [plant for result in results for plant in result["plants"]]
+        yolo_data = {
+            "images": results,
+            "total_plants": len(plants),
+        }
+        job_store.complete(self.job_id, yolo_data, confidence=mean_confidence(plants), processing_time=processing_time)
+        if analysis_writer is not None:
+            analysis_writer.enqueue(self.image_url, [r["image_info"] for r in results], yolo_data,
+                                    mean_confidence(plants), processing_time)
+        self.release_uploads()
+        logger.info(f"Job {self.job_id} completed: {len(plants)} plants in {len(results)} image(s)")
+    
+    def release_uploads(self):
+        for key in job_store.releasable_hashes(self.job_id):
+            job_uploads.delete(key)
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    """Pick up jobs a previous process left unfinished from their item manifests"""
+    for job in job_store.resumable():
+        logger.info(f"Resuming job {job['id']}")
+        AnalysisJob(job["id"], job["imageUrl"], job["clientId"]).start()
+
+@app.post("/api/jobs", status_code=202)
+def create_job(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Queue one or more images for asynchronous plant detection
+    Returns: Job id to poll via GET /api/jobs/{job_id} or stream via /api/jobs/{job_id}/events
+    """
+    for file in files:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File {file.filename} must be an image")
+    
+    client_id = client_identity(request)
+    try:
+        scheduler.admit(client_id, BULK, len(files))
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    
+    # Plain def: reading, fsync-spooling and the sqlite insert run in the threadpool, off the event loop
+    images = [file.file.read() for file in files]
+    image_metadata = [
+        {"filename": file.filename, "content_type": file.content_type, "bytes": len(contents)}
+        for file, contents in zip(files, images)
+    ]
+    # Spool uploads under their content hash before the job exists, so it can always resume
+    keys = [content_hash(contents) for contents in images]
+    for key, contents in zip(keys, images):
+        job_uploads.put(key, contents)
+    image_url = files[0].filename or "upload"
+    job_id = job_store.create(image_url=image_url, image_metadata=image_metadata,
+                              items=[(key, file.filename) for key, file in zip(keys, files)], client_id=client_id)
+    AnalysisJob(job_id, image_url, client_id).start()
+    
+    return {"job_id": job_id, "status": "processing", "images": len(images)}
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Get status, progress, per-status item counts and (when completed) results of an analysis job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job["items"] = job_store.item_counts(job_id)
+    return job
+
+@app.get("/api/jobs/{job_id}/items")
+def get_job_items(job_id: str):
+    """Per-image status, attempts, last error and content hash of an analysis job"""
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "items": job_store.items(job_id)}
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    # sqlite reads go through the threadpool so polling never blocks the event loop
+    if await run_in_threadpool(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_state = None
+        while True:
+            job = await run_in_threadpool(job_store.get, job_id)
+            state = (job["status"], job["progress"])
+            if state != last_state:
+                last_state = state
+                event = "result" if job["status"] in JobStore.TERMINAL_STATUSES else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+            if job["status"] in JobStore.TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(JOB_EVENT_POLL_INTERVAL)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@torch.inference_mode()
+def detect_frame(frame: np.ndarray) -> List[Dict[str, Any]]:
+    """Run detection on an already decoded BGR video frame"""
+    results = detector.predict(frame, conf=0.25, verbose=False)
+    return detector.enhance_plant_detection(results)
+
+@app.websocket("/ws/detect")
+async def stream_detection(websocket: WebSocket, max_size: int = 640, frame_skip: int = 0,
+                           track: bool = True, detect_every: int = 5, scene_change: float = 12.0,
+                           format: str = "json"):
+    """
+    Stream JPEG frames for live detection
+    Binary messages are frames (optionally prefixed with a 4-byte big-endian frame id);
+    JSON text messages update the max_size / frame_skip / detect_every hints. Each processed
+    frame is answered with its detections; frames arriving while inference is busy are dropped.
+    With tracking on, the model runs every `detect_every` frames or on a scene change and
+    plants keep a stable `track_id` across frames. `format=compact|msgpack` switches
+    replies to the columnar encoding.
+    """
+    temporal = TemporalDetector(detect_every, scene_change) if track else None
+    fmt = negotiate_format({"compact": COMPACT_JSON_MEDIA_TYPE, "msgpack": "application/msgpack"}.get(format))
+    # A stream has at most one frame in flight, so it is fair-queued but not token-charged
+    executor = scheduler.bind(client_identity(websocket), INTERACTIVE, charge=False)
+    session = FrameStreamSession(websocket, detect_frame, executor, max_size=max_size,
+                                 frame_skip=frame_skip, temporal=temporal, fmt=fmt)
+    await session.run()
+
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """Per-lane queue depth, waiting clients, rate limits and queue wait times"""
+    return {"lanes": scheduler.stats()}
+
+@app.get("/api/pipelines")
+async def pipeline_info():
+    """Configured stage sets with each stage's inputs and outputs (timings are in /metrics)"""
+    return {name: pipeline.describe() for name, pipeline in pipelines.items()}
+
+@app.get("/api/runtime")
+async def runtime_info():
+    """Effective thread/affinity settings, RSS and allocator stats of this worker process"""
+    return runtime.snapshot()
+
+@app.post("/api/admin/profile")
+async def profile_worker(request: Request, seconds: float = 10, interval_ms: float = 10, idle: bool = False,
+                         torch_passes: int = 0, format: str = "json"):
+    """Sample the stacks of every thread in this worker (only) for ``seconds``.
+
+    ``format=collapsed`` returns folded stacks for flamegraph.pl/speedscope; ``json``
+    adds the top functions and, with ``torch_passes``, torch.profiler traces of the
+    next model forward passes (Chrome trace format).
+    """
+    require_admin(request)
+    try:
+        check_profile_request(seconds, interval_ms)
+        session = profiler.start(interval_ms / 1000, idle, torch_passes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        report = profiler.stop(session)
+    if format == "collapsed":
+        return Response(report["collapsed"], media_type="text/plain", headers={"X-Worker-Pid": str(report["pid"])})
+    return report
+
+@app.get("/api/memory")
+async def memory_info():
+    """Decoded-image memory budget (in use, peak, waits, rejections) and the scratch buffer pool"""
+    return {"budget": memory_budget.snapshot(), "pool": buffer_pool.snapshot()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process counters, gauges and latency summaries"""
+    return metrics.snapshot()
+
+@app.get("/api/analyses")
+async def list_analyses(limit: int = 50):
+    """Most recent persisted analyses for history and analytics"""
+    if analysis_writer is None:
+        raise HTTPException(status_code=503, detail="Analysis persistence is disabled")
+    return {"analyses": analysis_writer.recent(min(limit, 500)), "writer": analysis_writer.stats}
+
+# The garden endpoints below are plain functions: FastAPI runs them in its threadpool, so
+# index loads (sqlite) and queries (numpy) never block the event loop
+def garden_index(garden_id: str):
+    if garden_indexes is None:
+        raise HTTPException(status_code=503, detail="Garden database is not available")
+    return garden_indexes.get(garden_id)
+
+def require_coordinates(*values: float):
+    """400 for NaN, infinite or out-of-range query coordinates (checked before any index lock is taken)"""
+    try:
+        check_coordinates(*values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/gardens/{garden_id}/plants/within")
+def plants_within(garden_id: str, x1: float, y1: float, x2: float, y2: float):
+    """Plants whose position lies inside a rectangle (e.g. a garden bed)"""
+    require_coordinates(x1, y1, x2, y2)
+    garden = garden_index(garden_id)
+    start = time.perf_counter()
+    with garden.lock:
+        plants = garden.describe(garden.points.within(x1, y1, x2, y2))
+    return {"plants": plants, "count": len(plants), "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@app.get("/api/gardens/{garden_id}/plants/near")
+def plants_near(garden_id: str, x: float, y: float, radius: float):
+    """Plants within `radius` of a point, nearest first"""
+    if radius < 0:
+        raise HTTPException(status_code=400, detail="radius must not be negative")
+    require_coordinates(x, y, radius)
+    garden = garden_index(garden_id)
+    start = time.perf_counter()
+    with garden.lock:
+        plants = garden.describe(*garden.points.radius(x, y, radius))
+    return {"plants": plants, "count": len(plants), "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@app.get("/api/gardens/{garden_id}/plants/nearest")
+def plants_nearest(garden_id: str, x: float, y: float, k: int = 5):
+    """The `k` plants nearest to a point"""
+    if k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+    require_coordinates(x, y)
+    garden = garden_index(garden_id)
+    start = time.perf_counter()
+    with garden.lock:
+        plants = garden.describe(*garden.points.nearest(x, y, min(k, 1000)))
+    return {"plants": plants, "count": len(plants), "query_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@app.put("/api/gardens/{garden_id}/plants/{plant_id}")
+def index_plant(garden_id: str, plant_id: str, position: Dict[str, float]):
+    """Add or move a plant in the garden's index (call after writing plant_instances)"""
+    if garden_indexes is None:
+        raise HTTPException(status_code=503, detail="Garden database is not available")
+    if "x" not in position or "y" not in position:
+        raise HTTPException(status_code=400, detail="Body must contain x and y")
+    require_coordinates(position["x"], position["y"])
+    garden_indexes.upsert(garden_id, plant_id, position["x"], position["y"])
+    return {"success": True}
+
+@app.delete("/api/gardens/{garden_id}/plants/{plant_id}")
+def unindex_plant(garden_id: str, plant_id: str):
+    """Drop a deleted plant from the garden's index"""
+    if garden_indexes is None:
+        raise HTTPException(status_code=503, detail="Garden database is not available")
+    return {"success": True, "removed": garden_indexes.remove(garden_id, plant_id)}
+
+@app.get("/api/gardens/index")
+def garden_index_stats():
+    """Loaded garden indexes and their grid statistics"""
+    if garden_indexes is None:
+        raise HTTPException(status_code=503, detail="Garden database is not available")
+    return garden_indexes.snapshot()
+
 @app.get("/api/plant-categories")
 async def get_plant_categories():
     """Get available plant categories and their properties"""
     return {"categories": PLANT_CATEGORIES}
 
+# Decoded image plus the array copy, float64 std temporaries and Laplacian of the quality check
+QUALITY_DECODE_FACTOR = 10
+
 @app.post("/api/analyze-image-quality")
 async def analyze_image_quality(file: UploadFile = File(...)):
     """Analyze image quality for plant detection"""
@@ -257,13 +791,15 @@ async def analyze_image_quality(file: UploadFile = File(...)):
         contents = await file.read()
         image = Image.open(io.BytesIO(contents))
         
-        # Convert to numpy array for analysis
-        img_array = np.array(image)
-        
-        # Calculate quality metrics
-        brightness = np.mean(img_array)
-        contrast = np.std(img_array)
-        sharpness = cv2.Laplacian(cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
+        # Full-resolution decode on the event loop: never wait for budget, reject instead
+        with memory_budget.reserve(decoded_bytes(image.size, image.mode) * QUALITY_DECODE_FACTOR, wait=0):
+            # Convert to numpy array for analysis
+            img_array = np.array(image)
+            
+            # Calculate quality metrics
+            brightness = np.mean(img_array)
+            contrast = np.std(img_array)
+            sharpness = cv2.Laplacian(cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
         
         # Quality score (0-100)
         quality_score = min(100, (contrast / 50) * 30 + (sharpness / 100) * 40 + min(30, brightness / 10))
@@ -278,10 +814,12 @@ async def analyze_image_quality(file: UploadFile = File(...)):
         
         return {"quality": quality_assessment}
         
+    except MemoryBudgetExceeded as e:
+        raise memory_exhausted(e)
     except Exception as e:
         logger.error(f"Error analyzing image quality: {e}")
         raise HTTPException(status_code=500, detail=f"Error analyzing image: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    import serve
+    serve.main()
@@ -0,0 +1,146 @@
+from typing import Dict, Any, List, Tuple
+
+import cv2
+import numpy as np
+
+# Longest side of the reduced-resolution masks returned by segmentation
+DEFAULT_MASK_SIZE = 256
+# Excess-green index (2G - R - B, on 0-255 values) above which a pixel counts as foliage
+LEAF_EXG_THRESHOLD = 20
+
+
+def encode_rle(mask: np.ndarray) -> Dict[str, Any]:
+    """COCO RLE of a 2-D boolean mask (column-major runs, compressed string counts)"""
+    flat = mask.ravel(order="F")
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))  # runs always start with background
+    return {"size": [int(mask.shape[0]), int(mask.shape[1])], "counts": counts_to_string(counts.tolist())}
+
+
+def decode_rle(rle: Dict[str, Any]) -> np.ndarray:
+    """Boolean mask from COCO RLE (compressed string or plain list counts)"""
+    height, width = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, str):
+        counts = string_to_counts(counts)
+    if not (isinstance(height, int) and isinstance(width, int)) or height < 0 or width < 0:
+        raise ValueError(f"Invalid RLE size {rle['size']}")
+    try:
+        counts = np.asarray(counts, dtype=np.int64)
+    except OverflowError:
+        raise ValueError("RLE counts must be non-negative integers")
+    if counts.ndim != 1 or (counts < 0).any():
+        raise ValueError("RLE counts must be non-negative integers")
+    # Checked (in exact integers) before expanding, so a forged count cannot make np.repeat allocate it
+    total = sum(counts.tolist())
+    if total != height * width:
+        raise ValueError(f"RLE covers {total} pixels, expected {height * width}")
+    values = np.arange(len(counts)) % 2 == 1
+    return np.repeat(values, counts).reshape((height, width), order="F")
+
+
+def counts_to_string(counts: List[int]) -> str:
+    """COCO's compressed RLE string (pycocotools ``rleToString``)"""
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def string_to_counts(s: str) -> List[int]:
+    """Inverse of ``counts_to_string`` (pycocotools ``rleFrString``)"""
+    counts: List[int] = []
+    p = 0
+    while p < len(s):
+        x = k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = bool(c & 0x20)
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def mask_polygons(mask: np.ndarray, scale: float = 1.0, tolerance: float = 1.0) -> List[List[float]]:
+    """Outer contours of a mask, simplified (Douglas-Peucker, ``tolerance`` mask pixels) and scaled"""
+    contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    polygons = []
+    for contour in contours:
+        simplified = cv2.approxPolyDP(contour, tolerance, True).reshape(-1, 2)
+        if len(simplified) >= 3:
+            polygons.append([round(float(v), 1) for v in (simplified * scale).ravel()])
+    return polygons
+
+
+def resize_masks(masks: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Resize (n, h, w) masks to ``size`` (width, height) in one OpenCV call per 512 channels"""
+    if not len(masks):
+        return np.zeros((0, size[1], size[0]), dtype=bool)
+    resized = []
+    for start in range(0, len(masks), 512):  # cv2.resize channel limit
+        chunk = np.ascontiguousarray(masks[start:start + 512].transpose(1, 2, 0), dtype=np.float32)
+        out = cv2.resize(chunk, size, interpolation=cv2.INTER_LINEAR)
+        resized.append(out.reshape(size[1], size[0], -1).transpose(2, 0, 1) > 0.5)
+    return np.concatenate(resized)
+
+
+def unletterbox(masks: np.ndarray, image_size: Tuple[int, int]) -> np.ndarray:
+    """Crop the letterbox padding off (n, H, W) masks predicted for an image of ``image_size`` (w, h)"""
+    height, width = masks.shape[1:]
+    gain = min(height / image_size[1], width / image_size[0])
+    pad_x = (width - image_size[0] * gain) / 2
+    pad_y = (height - image_size[1] * gain) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    bottom, right = int(round(height - pad_y + 0.1)), int(round(width - pad_x + 0.1))
+    return masks[:, top:bottom, left:right]
+
+
+def mask_shape(image_size: Tuple[int, int], mask_size: int) -> Tuple[int, int]:
+    """(width, height) of reduced-resolution masks for an image; never larger than the image"""
+    scale = min(1.0, mask_size / max(image_size))
+    return max(1, round(image_size[0] * scale)), max(1, round(image_size[1] * scale))
+
+
+def coverage_metrics(masks: np.ndarray, rgb: np.ndarray, scale: float) -> Dict[str, Any]:
+    """Per-plant mask and leaf areas plus canopy/leaf coverage, all masks at once.
+
+    ``masks`` is (n, h, w) boolean at reduced resolution, ``rgb`` the image resized
+    to (h, w), ``scale`` original pixels per mask pixel. Leaf pixels are mask pixels
+    whose excess-green index is above LEAF_EXG_THRESHOLD; areas are in original pixels.
+    """
+    rgb = rgb.astype(np.int16)
+    foliage = (2 * rgb[..., 1] - rgb[..., 0] - rgb[..., 2]) > LEAF_EXG_THRESHOLD
+    pixel_area = scale * scale
+    flat = masks.reshape(len(masks), foliage.size)
+    areas = flat.sum(axis=1) * pixel_area
+    leaf_areas = (flat & foliage.ravel()).sum(axis=1) * pixel_area
+    canopy = masks.any(axis=0) if len(masks) else np.zeros(rgb.shape[:2], dtype=bool)
+    return {
+        "areas": areas,
+        "leaf_areas": leaf_areas,
+        "summary": {
+            "canopyCoverage": round(float(canopy.mean()), 4),
+            "leafCoverage": round(float((canopy & foliage).mean()), 4),
+            "canopyArea": round(float(canopy.sum() * pixel_area), 1),
+            "leafArea": round(float((canopy & foliage).sum() * pixel_area), 1),
+            "overlapArea": round(float(areas.sum() - canopy.sum() * pixel_area), 1),
+        },
+    }
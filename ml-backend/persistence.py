@@ -0,0 +1,158 @@
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INSERT_ANALYSIS_SQL = """
+    INSERT INTO ai_analyses (
+        id, imageUrl, imageMetadata, yoloData, samData, gardenLayout, confidence,
+        processingTime, status, errorMessage, createdAt, completedAt
+    ) VALUES (
+        :id, :imageUrl, :imageMetadata, :yoloData, :samData, :gardenLayout, :confidence,
+        :processingTime, :status, :errorMessage, :createdAt, :completedAt
+    )
+"""
+
+
+def epoch_ms() -> int:
+    """Current time in milliseconds since the epoch (Prisma's SQLite DateTime encoding)"""
+    return int(time.time() * 1000)
+
+
+class ConnectionPool:
+    """Small fixed-size pool of SQLite connections opened in WAL mode"""
+
+    def __init__(self, db_path: str, size: int = 2, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        for _ in range(size):
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class AnalysisWriter:
+    """Write-behind queue that persists analyses into the Prisma ``ai_analyses`` table.
+
+    ``enqueue`` never blocks the request path: records are buffered in memory and
+    a background thread inserts them in one transaction every ``flush_interval_ms``
+    (or as soon as ``max_batch`` records are waiting). When the buffer is full new
+    records are dropped and counted rather than applying backpressure to requests.
+    """
+
+    def __init__(self, db_path: str, flush_interval_ms: int = 250, max_batch: int = 200,
+                 max_queue: int = 10000, pool_size: int = 2):
+        self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.pool = ConnectionPool(db_path, size=pool_size)
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="analysis-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush everything still buffered and stop the writer thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.pool.close()
+
+    def enqueue(self, image_url: str, image_metadata: Any, yolo_data: Any, confidence: float,
+                processing_time: int, status: str = "completed", error_message: Optional[str] = None,
+                garden_layout: Any = None, sam_data: Any = None):
+        """Buffer one analysis for the next batched insert"""
+        now = epoch_ms()
+        record = {
+            "id": uuid.uuid4().hex,
+            "imageUrl": image_url,
+            "imageMetadata": json.dumps(image_metadata) if image_metadata is not None else None,
+            "yoloData": json.dumps(yolo_data) if yolo_data is not None else None,
+            "samData": json.dumps(sam_data) if sam_data is not None else None,
+            "gardenLayout": json.dumps(garden_layout if garden_layout is not None else {}),
+            "confidence": confidence,
+            "processingTime": processing_time,
+            "status": status,
+            "errorMessage": error_message,
+            "createdAt": now - processing_time,
+            "completedAt": now,
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            with self.pool.connection() as conn, conn:
+                conn.executemany(INSERT_ANALYSIS_SQL, batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            logger.error(f"Failed to persist {len(batch)} analyses: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            batch = self._drain()
+            while batch:
+                self._write(batch)
+                batch = self._drain() if len(batch) == self.max_batch else []
+        # Final flush on shutdown
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent persisted analyses, newest first"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ai_analyses ORDER BY createdAt DESC LIMIT ?", (limit,)
+            ).fetchall()
+        analyses = []
+        for row in rows:
+            analysis = dict(row)
+            for field in ("imageMetadata", "yoloData", "samData", "gardenLayout"):
+                if analysis[field] is not None:
+                    analysis[field] = json.loads(analysis[field])
+            analyses.append(analysis)
+        return analyses
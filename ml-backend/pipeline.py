@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Dict, Any, Callable, List, Optional, Sequence, Type
+
+from deadlines import Deadline
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Frame:
+    """One image travelling through a pipeline; each stage fills in the fields it provides"""
+    contents: Optional[bytes] = None
+    image: Any = None                 # PIL image once decoded
+    inference_size: Optional[int] = None
+    result: Any = None                # raw ultralytics Results
+    candidates: Optional[Dict[str, Any]] = None
+    detections: Optional[List[Dict[str, Any]]] = None
+    segmentation: Optional[Dict[str, Any]] = None
+    response: Optional[Dict[str, Any]] = None
+    extras: Dict[str, Any] = field(default_factory=dict)
+    reservation: Any = None           # buffers.Reservation for the decoded image, released after the run
+
+
+FRAME_FIELDS = {f.name for f in fields(Frame)}
+
+
+@dataclass
+class RunContext:
+    """Per-request settings shared by every stage of one run"""
+    deadline: Deadline = field(default_factory=Deadline)
+    imgsz: Optional[int] = None
+    queue_depth: int = 0
+    options: Dict[str, Any] = field(default_factory=dict)
+    span: Any = None                  # tracing.Span of the request, when it is traced
+
+
+class Stage:
+    """A pipeline step. ``requires`` / ``provides`` name the Frame fields it reads and sets.
+
+    Subclasses implement ``process`` for one frame or override ``process_batch``
+    when a whole batch can be handled at once (e.g. one model call).
+    """
+
+    name = "stage"
+    requires: Sequence[str] = ()
+    provides: Sequence[str] = ()
+
+    def __init__(self, detector=None, **dependencies):
+        self.detector = detector
+
+    def process(self, frame: Frame, context: RunContext):
+        raise NotImplementedError
+
+    def process_batch(self, frames: List[Frame], context: RunContext):
+        for frame in frames:
+            self.process(frame, context)
+
+
+# Called after every stage with (pipeline, stage, seconds, batch size)
+StageHook = Callable[[str, str, float, int], None]
+
+
+def record_stage_timing(pipeline: str, stage: str, seconds: float, batch_size: int):
+    metrics.observe("pipeline.stage_ms", seconds * 1000, labels={"pipeline": pipeline, "stage": stage})
+
+
+def frame_attributes(frames: List[Frame]) -> Dict[str, Any]:
+    """Span attributes describing a batch: image sizes, inference size and detection count"""
+    attributes: Dict[str, Any] = {"batch.size": len(frames)}
+    images = [frame.image for frame in frames if frame.image is not None]
+    if images:
+        widths, heights = [image.size[0] for image in images], [image.size[1] for image in images]
+        attributes["image.width"] = widths[0] if len(widths) == 1 else widths
+        attributes["image.height"] = heights[0] if len(heights) == 1 else heights
+    if frames[0].inference_size is not None:
+        attributes["inference.size"] = frames[0].inference_size
+    if any(frame.detections is not None for frame in frames):
+        attributes["detections.count"] = sum(len(frame.detections or ()) for frame in frames)
+    return attributes
+
+
+class Pipeline:
+    """An ordered list of stages, checked at build time so every required field is provided upstream"""
+
+    def __init__(self, name: str, stages: Sequence[Stage], inputs: Sequence[str] = ("contents",),
+                 outputs: Sequence[str] = ("response",), hooks: Optional[List[StageHook]] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attributes = attributes or {}  # added to every span, e.g. model.version
+        self.stages = list(stages)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.hooks = [record_stage_timing] if hooks is None else hooks
+        available = set(self.inputs)
+        for stage in self.stages:
+            missing = [name for name in stage.requires if name not in available]
+            if missing:
+                raise ValueError(f"Pipeline {self.name!r}: stage {stage.name!r} needs {missing}, "
+                                 f"provided so far: {sorted(available)}")
+            unknown = set(stage.provides) - FRAME_FIELDS
+            if unknown:
+                raise ValueError(f"Stage {stage.name!r} provides unknown frame fields {sorted(unknown)}")
+            available.update(stage.provides)
+        missing = [name for name in self.outputs if name not in available]
+        if missing:
+            raise ValueError(f"Pipeline {self.name!r} never provides {missing}")
+
+    def run_batch(self, frames: List[Frame], context: RunContext) -> List[Frame]:
+        """Run every stage over the whole batch, checking the deadline before each stage.
+
+        When the request is traced, the run and each stage get a child span of ``context.span``.
+        """
+        traced = context.span is not None and context.span.recording
+        span = None
+        if traced:
+            span = context.span.child(f"pipeline {self.name}", {"pipeline": self.name, **self.attributes})
+        try:
+            for stage in self.stages:
+                context.deadline.check(stage.name, len(frames))
+                stage_span = None
+                if traced:
+                    stage_span = span.child(stage.name, {"pipeline.stage": stage.name, **self.attributes})
+                start = time.perf_counter()
+                try:
+                    stage.process_batch(frames, context)
+                except Exception as e:
+                    if stage_span is not None:
+                        stage_span.set_error(repr(e))
+                    raise
+                finally:
+                    if stage_span is not None:
+                        stage_span.set_attributes(frame_attributes(frames))
+                        stage_span.end()
+                elapsed = time.perf_counter() - start
+                for hook in self.hooks:
+                    hook(self.name, stage.name, elapsed, len(frames))
+        except Exception as e:
+            if span is not None:
+                span.set_error(repr(e))
+            raise
+        finally:
+            for frame in frames:
+                if frame.reservation is not None:
+                    frame.reservation.release()
+            if span is not None:
+                span.set_attributes(frame_attributes(frames))
+                span.end()
+        return frames
+
+    def run(self, frame: Frame, context: RunContext) -> Frame:
+        return self.run_batch([frame], context)[0]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "inputs": list(self.inputs),
+            "outputs": list(self.outputs),
+            "stages": [{"name": s.name, "requires": list(s.requires), "provides": list(s.provides)}
+                       for s in self.stages],
+        }
+
+
+STAGES: Dict[str, Type[Stage]] = {}
+
+
+def register_stage(cls: Type[Stage]) -> Type[Stage]:
+    """Class decorator making a stage selectable by name in pipeline configurations"""
+    STAGES[cls.name] = cls
+    return cls
+
+
+def pipeline_config(defaults: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Stage names per pipeline: ``defaults``, overridden by a PIPELINE_CONFIG JSON file
+    and then by PIPELINE_<NAME>=stage,stage,... environment variables"""
+    config = {name: list(stages) for name, stages in defaults.items()}
+    path = os.getenv("PIPELINE_CONFIG")
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    for name in list(config):
+        override = os.getenv(f"PIPELINE_{name.upper()}")
+        if override:
+            config[name] = [stage.strip() for stage in override.split(",") if stage.strip()]
+    return config
+
+
+def build_pipelines(config: Dict[str, List[str]], attributes: Optional[Dict[str, Any]] = None,
+                    **dependencies) -> Dict[str, Pipeline]:
+    """Instantiate each configured pipeline; stages receive ``dependencies`` (e.g. detector)"""
+    pipelines = {}
+    for name, stage_names in config.items():
+        unknown = [stage for stage in stage_names if stage not in STAGES]
+        if unknown:
+            raise ValueError(f"Pipeline {name!r} uses unknown stages {unknown}; known: {sorted(STAGES)}")
+        pipelines[name] = Pipeline(name, [STAGES[stage](**dependencies) for stage in stage_names],
+                                   attributes=attributes)
+        logger.info(f"Pipeline {name}: {' -> '.join(stage_names)}")
+    return pipelines
@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Tuple
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.utils import ASSETS
+
+from fusion import box_iou
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PrecisionMode:
+    name: str
+    bf16: bool           # run under bfloat16 autocast
+    channels_last: bool  # keep conv weights/activations in NHWC
+
+
+MODES = {
+    mode.name: mode for mode in (
+        PrecisionMode("fp32", False, False),
+        PrecisionMode("channels_last", False, True),
+        PrecisionMode("bf16", True, False),
+        PrecisionMode("bf16_channels_last", True, True),
+    )
+}
+FP32 = MODES["fp32"]
+
+# (xyxy boxes (n, 4), class ids (n,)) from one predictor run
+Detections = Tuple[np.ndarray, np.ndarray]
+
+
+def autocast(mode: PrecisionMode):
+    """Context manager running the model in ``mode``'s precision"""
+    if mode.bf16:
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return nullcontext()
+
+
+def apply_memory_format(net: torch.nn.Module, mode: PrecisionMode):
+    net.to(memory_format=torch.channels_last if mode.channels_last else torch.contiguous_format)
+
+
+def benchmark_image() -> np.ndarray:
+    """BGR image the startup benchmark runs on: ``PRECISION_BENCH_IMAGE`` (ideally a typical
+    garden photo for custom plant models), else the street scene bundled with ultralytics"""
+    path = os.getenv("PRECISION_BENCH_IMAGE") or str(ASSETS / "bus.jpg")
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Cannot read precision benchmark image {path}")
+    return image
+
+
+def detection_agreement(reference: Detections, candidate: Detections, iou_threshold: float = 0.5) -> float:
+    """Fraction of detections two runs share (0-1).
+
+    Each FP32 ``reference`` box is matched to at most one ``candidate`` box of
+    the same class overlapping it by ``iou_threshold``; the matches are divided
+    by the larger detection count, so missing and extra boxes both count.
+    """
+    ref_boxes, ref_classes = reference
+    cand_boxes, cand_classes = candidate
+    total = max(len(ref_boxes), len(cand_boxes))
+    if total == 0:
+        return 1.0
+    if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+        return 0.0
+    iou = box_iou(ref_boxes, cand_boxes)
+    iou[ref_classes[:, None] != cand_classes[None, :]] = 0.0
+    matched = 0
+    for row in iou:  # reference boxes come sorted by confidence
+        best = int(row.argmax())
+        if row[best] >= iou_threshold:
+            matched += 1
+            iou[:, best] = 0.0
+    return matched / total
+
+
+def _time_detect(net: torch.nn.Module, detect: Callable[[], Detections], mode: PrecisionMode, iterations: int):
+    apply_memory_format(net, mode)
+    with autocast(mode):
+        detections = detect()  # warm-up: first call pays for kernel/primitive selection
+        start = time.perf_counter()
+        for _ in range(iterations):
+            detect()
+    return (time.perf_counter() - start) / iterations * 1000, detections
+
+
+def select_precision_mode(net: torch.nn.Module, detect: Callable[[], Detections], requested: str = "auto",
+                          min_speedup: float = 1.1, min_agreement: float = 0.98,
+                          iterations: int = 3) -> Dict[str, Any]:
+    """Pick the fastest CPU precision mode whose detections still agree with FP32.
+
+    ``requested`` forces a mode by name (no benchmark) or ``auto`` to time every
+    mode on this host. ``detect`` runs the predictor ``net`` belongs to on the
+    benchmark image and returns its (xyxy boxes, classes), so each mode is timed
+    end to end on the input layout requests actually use. A mode is only chosen
+    over FP32 when it is at least ``min_speedup`` times faster and
+    ``detection_agreement`` is at least ``min_agreement``; if FP32 finds nothing
+    on the image there is nothing to compare and FP32 is kept. Leaves ``net`` in
+    the chosen memory format.
+    """
+    if requested != "auto":
+        mode = MODES.get(requested, FP32)
+        if mode.name != requested:
+            logger.warning(f"Unknown precision mode {requested!r}, using fp32")
+        apply_memory_format(net, mode)
+        return {"mode": mode.name, "selected_by": "config", "bf16": mode.bf16, "channels_last": mode.channels_last}
+
+    baseline_ms, reference = _time_detect(net, detect, FP32, iterations)
+    candidates = {"fp32": {"latency_ms": round(baseline_ms, 2), "speedup": 1.0, "agreement": 1.0,
+                           "detections": len(reference[0])}}
+    if len(reference[0]) == 0:
+        logger.warning("Precision benchmark image has no FP32 detections, keeping fp32; "
+                       "set PRECISION_BENCH_IMAGE to a representative photo")
+    best, best_speedup = FP32, 1.0
+    for mode in MODES.values():
+        if mode is FP32:
+            continue
+        try:
+            latency_ms, detections = _time_detect(net, detect, mode, iterations)
+        except RuntimeError as e:  # e.g. no bf16 kernels on this CPU
+            candidates[mode.name] = {"error": str(e)}
+            continue
+        speedup = baseline_ms / latency_ms
+        agreement = detection_agreement(reference, detections)
+        candidates[mode.name] = {
+            "latency_ms": round(latency_ms, 2),
+            "speedup": round(speedup, 3),
+            "agreement": round(agreement, 4),
+            "detections": len(detections[0]),
+        }
+        if (len(reference[0]) and speedup >= min_speedup and agreement >= min_agreement
+                and speedup > best_speedup):
+            best, best_speedup = mode, speedup
+
+    apply_memory_format(net, best)
+    logger.info(f"Precision mode: {best.name} ({best_speedup:.2f}x vs fp32)")
+    return {
+        "mode": best.name,
+        "selected_by": "benchmark",
+        "speedup": round(best_speedup, 3),
+        "bf16": best.bf16,
+        "channels_last": best.channels_last,
+        "candidates": candidates,
+    }
+
+
+def precision_settings() -> Dict[str, Any]:
+    """select_precision_mode keyword arguments from the environment"""
+    return {
+        "requested": os.getenv("INFERENCE_PRECISION", "auto"),
+        "min_speedup": float(os.getenv("PRECISION_MIN_SPEEDUP", "1.1")),
+        "min_agreement": float(os.getenv("PRECISION_MIN_AGREEMENT", "0.98")),
+        "iterations": int(os.getenv("PRECISION_BENCH_ITERATIONS", "3")),
+    }
@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List
+
+import torch
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Longest profile a single request may ask for
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Sampler CPU time as a fraction of wall time; the interval is stretched to stay below it
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.02"))
+MIN_INTERVAL_MS = 1.0
+MAX_STACK_DEPTH = 128
+# A thread whose innermost Python frame is in one of these is waiting, not working
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+# torch.profiler keeps every op event, so forward-pass traces are capped per profile
+MAX_FORWARD_TRACES = 10
+
+
+class ProfileBusy(Exception):
+    """Another profile is already running in this worker"""
+
+
+@lru_cache(maxsize=65536)
+def frame_label(code) -> str:
+    """``module.py:function:line`` for one code object (collapsed-stack frame names cannot contain ';')"""
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}".replace(";", ",")
+
+
+def thread_group(name: str) -> str:
+    """Pool threads share one root frame (ThreadPoolExecutor-0_3 -> ThreadPoolExecutor-0)"""
+    return re.sub(r"_\d+$", "", name)
+
+
+class StackSampler:
+    """Samples the Python stack of every other thread from a background thread.
+
+    Each sample walks ``sys._current_frames()``, so the cost grows with thread
+    count and stack depth, not with the work being profiled. The time spent
+    sampling is measured and the interval is stretched whenever it would exceed
+    PROFILE_MAX_OVERHEAD of wall time.
+    """
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False,
+                 max_overhead: float = PROFILE_MAX_OVERHEAD):
+        self.interval = max(interval, MIN_INTERVAL_MS / 1000)
+        self.include_idle = include_idle
+        self.max_overhead = max_overhead
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.sample_time = 0.0
+        self.started = self.stopped = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            self.sample(own)
+            cost = time.perf_counter() - start
+            self.sample_time += cost
+            if cost > self.max_overhead * self.interval:
+                self.interval = min(cost / self.max_overhead, 1.0)
+            self._stop.wait(self.interval)
+
+    def sample(self, own: int):
+        names = {thread.ident: thread_group(thread.name) for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_STACK_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if not codes:
+                continue
+            if not self.include_idle and os.path.basename(codes[0].co_filename) in IDLE_FILES:
+                self.idle += 1
+                continue
+            self.stacks[(names.get(ident, "thread"), tuple(reversed(codes)))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format (``root;caller;callee count``), read by flamegraph.pl and speedscope"""
+        lines = Counter()
+        for (thread, codes), count in self.stacks.items():
+            lines[";".join([thread] + [frame_label(code) for code in codes])] += count
+        return "\n".join(f"{stack} {count}" for stack, count in lines.most_common())
+
+    def top(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Functions by own (innermost frame) and total (anywhere on the stack) sample share"""
+        own, total = Counter(), Counter()
+        for (_, codes), count in self.stacks.items():
+            own[codes[-1]] += count
+            for code in set(codes):
+                total[code] += count
+        samples = max(self.samples, 1)
+        return [{"function": frame_label(code), "own": round(own[code] / samples, 4),
+                 "total": round(total[code] / samples, 4)}
+                for code, _ in own.most_common(limit)]
+
+    def summary(self) -> Dict[str, Any]:
+        wall = max((self.stopped or time.perf_counter()) - self.started, 1e-9)
+        return {
+            "seconds": round(wall, 3),
+            "samples": self.samples,
+            "idle_samples": self.idle,
+            "interval_ms": round(self.interval * 1000, 2),
+            "overhead": round(self.sample_time / wall, 4),
+        }
+
+
+class ForwardTraces:
+    """torch.profiler traces of the next few model forward passes.
+
+    ``capture`` wraps a forward call; it only profiles while passes are armed,
+    and never two at once (torch.profiler is process-global), so concurrent
+    inference threads simply run unprofiled.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = threading.Lock()
+        self.remaining = 0
+        self.traces: List[Dict[str, Any]] = []
+
+    def arm(self, passes: int):
+        with self.lock:
+            self.remaining = min(passes, MAX_FORWARD_TRACES)
+            self.traces = []
+
+    def disarm(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            self.remaining = 0
+            traces, self.traces = self.traces, []
+        return traces
+
+    @contextmanager
+    def capture(self, label: str):
+        with self.lock:
+            take = self.remaining > 0 and self.active.acquire(blocking=False)
+            if take:
+                self.remaining -= 1
+        if not take:
+            yield
+            return
+        try:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            start = time.perf_counter()
+            with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+                yield
+            elapsed = time.perf_counter() - start
+            trace = self.collect(prof, label, elapsed)
+            with self.lock:
+                self.traces.append(trace)
+        finally:
+            self.active.release()
+
+    @staticmethod
+    def collect(prof, label: str, elapsed: float) -> Dict[str, Any]:
+        ops = sorted(prof.key_averages(), key=lambda event: event.self_cpu_time_total, reverse=True)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            prof.export_chrome_trace(path)
+            with open(path) as f:
+                events = json.load(f).get("traceEvents", [])
+        finally:
+            os.remove(path)
+        return {
+            "label": label,
+            "ms": round(elapsed * 1000, 2),
+            "ops": [{"name": op.key, "calls": op.count, "self_cpu_ms": round(op.self_cpu_time_total / 1000, 3),
+                     "cpu_ms": round(op.cpu_time_total / 1000, 3)} for op in ops[:20]],
+            "events": events,
+        }
+
+
+forward_traces = ForwardTraces()
+
+
+class Profiler:
+    """One on-demand profile at a time per worker process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def start(self, interval: float, include_idle: bool = False, forward_passes: int = 0) -> StackSampler:
+        if not self.lock.acquire(blocking=False):
+            raise ProfileBusy("A profile is already running in this worker")
+        forward_traces.arm(forward_passes)
+        return StackSampler(interval, include_idle).start()
+
+    def stop(self, sampler: StackSampler) -> Dict[str, Any]:
+        try:
+            sampler.stop()
+            traces = forward_traces.disarm()
+        finally:
+            self.lock.release()
+        metrics.inc("profiler.runs")
+        summary = sampler.summary()
+        logger.info(f"Profiled worker {os.getpid()} for {summary['seconds']}s: {summary['samples']} samples, "
+                    f"{summary['overhead']:.2%} overhead")
+        report = {"pid": os.getpid(), **summary, "top": sampler.top(), "collapsed": sampler.collapsed()}
+        if traces:
+            report["torch"] = {
+                "forward_passes": [{key: trace[key] for key in ("label", "ms", "ops")} for trace in traces],
+                "trace": {"traceEvents": [event for trace in traces for event in trace["events"]]},
+            }
+        return report
+
+
+def check_profile_request(seconds: float, interval_ms: float):
+    """Raise ValueError for a profile this worker should not run"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise ValueError(f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+    if interval_ms < MIN_INTERVAL_MS:
+        raise ValueError(f"interval_ms must be at least {MIN_INTERVAL_MS:g}")
@@ -0,0 +1,203 @@
+import os
+import ctypes
+import ctypes.util
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+import cv2
+import torch
+
+logger = logging.getLogger(__name__)
+
+# glibc mallopt parameter for the maximum number of malloc arenas
+M_ARENA_MAX = -8
+
+
+class MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in (
+        "arena", "ordblks", "smblks", "hblks", "hblkhd", "usmblks", "fsmblks", "uordblks", "fordblks", "keepcost",
+    )]
+
+
+def _load_libc():
+    name = ctypes.util.find_library("c")
+    if not name:
+        return None
+    try:
+        libc = ctypes.CDLL(name)
+        libc.mallinfo2.restype = MallInfo2
+        return libc
+    except (OSError, AttributeError):  # not glibc, or glibc < 2.33
+        return None
+
+
+libc = _load_libc()
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """Parse a Linux CPU list such as ``0-3,8``"""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+@dataclass
+class RuntimeConfig:
+    """Thread and allocator settings for one API process"""
+    processes: int                       # uvicorn worker processes sharing the host
+    inference_workers: int               # scheduler threads in this process
+    torch_threads: int                   # intra-op threads per process
+    torch_interop_threads: int
+    opencv_threads: int
+    malloc_arena_max: Optional[int]
+    cpu_sets: Optional[List[List[int]]]  # one CPU set per inference worker, None = unpinned
+
+    @classmethod
+    def from_env(cls, inference_workers: int) -> "RuntimeConfig":
+        """Derive settings that do not oversubscribe cores, overridable per variable.
+
+        Cores visible to the process are split between the ``WEB_CONCURRENCY``
+        processes and, within a process, between its inference workers, so
+        ``processes * workers * torch_threads`` stays at or below the core count.
+        ``INFERENCE_CPU_SETS`` is ``auto`` (even split of this process' cores) or
+        explicit sets separated by ``;`` such as ``0-3;4-7``.
+        """
+        cpus = available_cpus()
+        processes = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        per_worker = max(1, len(cpus) // (processes * inference_workers))
+
+        cpu_sets = None
+        spec = os.getenv("INFERENCE_CPU_SETS", "").strip()
+        if spec == "auto":
+            share = max(1, len(cpus) // inference_workers)
+            cpu_sets = [cpus[i * share:(i + 1) * share] or cpus for i in range(inference_workers)]
+        elif spec:
+            cpu_sets = [parse_cpu_list(part) for part in spec.split(";")]
+
+        arena_max = os.getenv("MALLOC_ARENA_MAX")
+        return cls(
+            processes=processes,
+            inference_workers=inference_workers,
+            torch_threads=int(os.getenv("TORCH_NUM_THREADS", str(per_worker))),
+            torch_interop_threads=int(os.getenv("TORCH_INTEROP_THREADS", "1")),
+            # OpenCV only does light pre/post-processing next to the model
+            opencv_threads=int(os.getenv("OPENCV_NUM_THREADS", "1")),
+            # Fewer arenas keep RSS from growing with every thread that ever allocated
+            malloc_arena_max=int(arena_max) if arena_max else 2 * inference_workers + 2,
+            cpu_sets=cpu_sets,
+        )
+
+
+class Runtime:
+    """Applies a RuntimeConfig and reports the effective state of this process"""
+
+    def __init__(self, config: RuntimeConfig):
+        self.config = config
+        self.workers: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Configure torch, OpenCV and malloc; call before the model runs anything"""
+        config = self.config
+        torch.set_num_threads(config.torch_threads)
+        try:
+            torch.set_num_interop_threads(config.torch_interop_threads)
+        except RuntimeError:
+            # Only settable before the first inter-op parallel work, e.g. on reload
+            logger.warning("Torch inter-op threads already initialised, keeping current setting")
+        cv2.setNumThreads(config.opencv_threads)
+        if libc is not None and config.malloc_arena_max and "MALLOC_ARENA_MAX" not in os.environ:
+            libc.mallopt(M_ARENA_MAX, config.malloc_arena_max)
+        logger.info(f"Runtime: torch_threads={config.torch_threads}, interop={config.torch_interop_threads}, "
+                    f"opencv_threads={config.opencv_threads}, workers={config.inference_workers}, "
+                    f"processes={config.processes}, cpu_sets={config.cpu_sets}")
+
+    def init_worker(self, index: int):
+        """Inference thread initializer: pin to its CPU set and register for introspection"""
+        cpus = None
+        if self.config.cpu_sets and hasattr(os, "sched_setaffinity"):
+            cpus = self.config.cpu_sets[index % len(self.config.cpu_sets)]
+            try:
+                # pid 0 is the calling thread; torch's OpenMP team created from it inherits the mask
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                logger.warning(f"Could not pin inference worker {index} to CPUs {cpus}: {e}")
+                cpus = None
+        with self._lock:
+            self.workers[index] = {
+                "thread": threading.current_thread().name,
+                "native_id": threading.get_native_id(),
+                "pinned_cpus": cpus,
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        workers = []
+        with self._lock:
+            registered = sorted(self.workers.items())
+        for index, worker in registered:
+            affinity = _thread_affinity(worker["native_id"])
+            workers.append({"index": index, **worker, "affinity": affinity})
+        return {
+            "pid": os.getpid(),
+            "config": asdict(self.config),
+            "effective": {
+                "torch_threads": torch.get_num_threads(),
+                "torch_interop_threads": torch.get_num_interop_threads(),
+                "opencv_threads": cv2.getNumThreads(),
+                "cpus_available": len(available_cpus()),
+            },
+            "workers": workers,
+            "memory": memory_stats(),
+        }
+
+
+def _thread_affinity(native_id: int) -> Optional[List[int]]:
+    try:
+        return sorted(os.sched_getaffinity(native_id))
+    except (AttributeError, OSError):
+        return None
+
+
+def memory_stats() -> Dict[str, Any]:
+    """Process RSS plus malloc (and CUDA caching allocator) statistics in bytes"""
+    stats: Dict[str, Any] = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":")
+                    stats["rss_bytes" if key == "VmRSS" else "rss_peak_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        stats["rss_peak_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if libc is not None:
+        info = libc.mallinfo2()
+        stats["malloc"] = {
+            "arena_bytes": info.arena,
+            "mmap_bytes": info.hblkhd,
+            "in_use_bytes": info.uordblks,
+            "free_bytes": info.fordblks,
+            "releasable_bytes": info.keepcost,
+        }
+    if torch.cuda.is_available():
+        cuda = torch.cuda.memory_stats()
+        stats["cuda"] = {
+            "allocated_bytes": cuda.get("allocated_bytes.all.current", 0),
+            "reserved_bytes": cuda.get("reserved_bytes.all.current", 0),
+            "peak_allocated_bytes": cuda.get("allocated_bytes.all.peak", 0),
+        }
+    return stats
@@ -0,0 +1,374 @@
+import os
+import time
+import heapq
+import hashlib
+import logging
+import ipaddress
+import threading
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Union
+
+from metrics import metrics
+from deadlines import Deadline, RequestCancelled, record_cancelled
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+# Peers (IPs or CIDRs, comma separated) trusted to forward the caller's identity, e.g. the Node proxy
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+# Seconds between sweeps that drop the buckets of clients gone quiet
+BUCKET_SWEEP_INTERVAL = 60.0
+
+
+class RateLimitExceeded(Exception):
+    """Client has used up its token bucket for a lane"""
+
+    def __init__(self, client_id: str, lane: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {client_id} ({lane}); retry in {retry_after:.1f}s")
+        self.client_id = client_id
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class RequestTooLarge(RateLimitExceeded):
+    """Request costs more than a lane's burst, so waiting will never admit it"""
+
+    def __init__(self, client_id: str, lane: str, cost: float, burst: float):
+        Exception.__init__(self, f"Request of {cost:g} images exceeds the {lane} limit of {burst:g} per request")
+        self.client_id = client_id
+        self.lane = lane
+        self.retry_after = float("inf")
+        self.cost = cost
+        self.burst = burst
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second up to ``burst``"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost: float, now: Optional[float] = None) -> bool:
+        self._refill(now if now is not None else time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def full_at(self) -> float:
+        """Monotonic time at which the bucket is full again (a full bucket is the same as a new one)"""
+        if self.tokens >= self.burst:
+            return self.updated
+        return self.updated + (self.burst - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def retry_after(self, cost: float) -> float:
+        """Seconds until ``cost`` tokens will be available"""
+        if cost > self.burst:
+            return float("inf")
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+@dataclass
+class LaneConfig:
+    rate: float   # tokens (images) per second per client
+    burst: float  # bucket size per client
+
+
+@dataclass(order=True)
+class WorkItem:
+    finish_tag: float
+    sequence: int
+    fn: Callable = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    future: Future = field(compare=False)
+    client_id: str = field(compare=False)
+    lane: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    cost: float = field(compare=False, default=1.0)
+    deadline: Optional[Deadline] = field(compare=False, default=None)
+
+
+class Lane:
+    """Weighted fair queue for one priority lane.
+
+    Each item gets a virtual finish tag ``max(virtual_time, client_last_tag) + cost / weight``;
+    serving items in tag order shares the lane between clients in proportion to
+    their weights, however many items a single client enqueues.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.heap: List[WorkItem] = []
+        self.virtual_time = 0.0
+        self.client_tags: Dict[str, float] = {}
+
+    def push(self, item: WorkItem, cost: float, weight: float):
+        start = max(self.virtual_time, self.client_tags.get(item.client_id, 0.0))
+        item.finish_tag = start + cost / weight
+        self.client_tags[item.client_id] = item.finish_tag
+        heapq.heappush(self.heap, item)
+
+    def pop(self) -> WorkItem:
+        item = heapq.heappop(self.heap)
+        self.virtual_time = item.finish_tag
+        if not self.heap:
+            # Idle lane: forget history so returning clients are not penalised
+            self.client_tags.clear()
+        return item
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class InferenceScheduler(Executor):
+    """Fair scheduler in front of the model.
+
+    Work is admitted through per-client token buckets (one per lane), queued
+    per lane with weighted fair queuing across clients, and executed by
+    ``workers`` threads (each first calls ``initializer(index)``). The interactive lane is served first, but after
+    ``interactive_burst`` consecutive interactive items a waiting bulk item is
+    served so batch jobs always make progress. Queue wait per lane is recorded
+    in ``metrics`` as ``scheduler.queue_wait_ms``. Items whose future was
+    cancelled or whose ``Deadline`` expired while queued are dropped unrun.
+    """
+
+    def __init__(self, workers: int = 1, lane_configs: Optional[Dict[str, LaneConfig]] = None,
+                 client_weights: Optional[Dict[str, float]] = None, interactive_burst: int = 4,
+                 initializer: Optional[Callable[[int], None]] = None):
+        self.lane_configs = lane_configs or default_lane_configs()
+        self.client_weights = client_weights or {}
+        self.interactive_burst = interactive_burst
+        self.lanes = {name: Lane(name) for name in LANES}
+        self.buckets: Dict[tuple, TokenBucket] = {}
+        self._next_sweep = time.monotonic() + BUCKET_SWEEP_INTERVAL
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._interactive_streak = 0
+        self._shutdown = False
+        self._initializer = initializer
+        self._threads = [
+            threading.Thread(target=self._worker, args=(i,), name=f"inference-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Executor interface: anonymous interactive work"""
+        return self.submit_for("anonymous", INTERACTIVE, fn, *args, **kwargs)
+
+    def admit(self, client_id: str, lane: str, cost: float):
+        """Charge ``cost`` tokens to the client's bucket or raise RateLimitExceeded
+        (RequestTooLarge when ``cost`` is more than the bucket can ever hold)"""
+        with self._condition:
+            self._charge(client_id, lane, cost)
+
+    def _charge(self, client_id: str, lane: str, cost: float):
+        bucket = self._bucket(client_id, lane)
+        if cost > bucket.burst:
+            metrics.inc("scheduler.rejected", labels={"lane": lane})
+            raise RequestTooLarge(client_id, lane, cost, bucket.burst)
+        if not bucket.try_acquire(cost):
+            metrics.inc("scheduler.rejected", labels={"lane": lane})
+            raise RateLimitExceeded(client_id, lane, bucket.retry_after(cost))
+
+    def submit_for(self, client_id: str, lane: str, fn: Callable, *args, cost: float = 1.0,
+                   charge: bool = True, deadline: Optional[Deadline] = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` for ``client_id`` in ``lane``.
+
+        ``cost`` (images) is charged to the client's token bucket unless ``charge``
+        is False (work already admitted via ``admit``); raises RateLimitExceeded.
+        A ``deadline`` that expires or is cancelled before the item starts drops it.
+        """
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler is shut down")
+            if charge:
+                self._charge(client_id, lane, cost)
+            future = Future()
+            self._sequence += 1
+            item = WorkItem(0.0, self._sequence, fn, args, kwargs, future, client_id, lane, time.monotonic(),
+                            cost, deadline)
+            self.lanes[lane].push(item, cost, self.client_weights.get(client_id, 1.0))
+            metrics.set_gauge("scheduler.queue_depth", len(self.lanes[lane]), labels={"lane": lane})
+            self._condition.notify()
+        return future
+
+    def bind(self, client_id: str, lane: str = INTERACTIVE, charge: bool = True) -> "ClientExecutor":
+        """Executor view that submits everything on behalf of one client"""
+        return ClientExecutor(self, client_id, lane, charge)
+
+    def queue_depth(self, lane: Optional[str] = None) -> int:
+        with self._condition:
+            if lane is not None:
+                return len(self.lanes[lane])
+            return sum(len(l) for l in self.lanes.values())
+
+    def _bucket(self, client_id: str, lane: str) -> TokenBucket:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep_buckets(now)
+        key = (client_id, lane)
+        if key not in self.buckets:
+            config = self.lane_configs[lane]
+            self.buckets[key] = TokenBucket(config.rate, config.burst)
+        return self.buckets[key]
+
+    def _sweep_buckets(self, now: float):
+        """Forget buckets that have refilled completely; the client gets an identical fresh one if it returns"""
+        idle = [key for key, bucket in self.buckets.items() if bucket.full_at() <= now]
+        for key in idle:
+            del self.buckets[key]
+        self._next_sweep = now + BUCKET_SWEEP_INTERVAL
+        metrics.set_gauge("scheduler.buckets", len(self.buckets))
+
+    def _next_item(self) -> WorkItem:
+        interactive, bulk = self.lanes[INTERACTIVE], self.lanes[BULK]
+        if interactive and (not bulk or self._interactive_streak < self.interactive_burst):
+            self._interactive_streak += 1
+            return interactive.pop()
+        self._interactive_streak = 0
+        return bulk.pop()
+
+    def _worker(self, index: int):
+        if self._initializer is not None:
+            try:
+                self._initializer(index)
+            except Exception as e:
+                logger.error(f"Inference worker {index} initializer failed: {e}")
+        while True:
+            with self._condition:
+                while not self._shutdown and not any(self.lanes.values()):
+                    self._condition.wait()
+                if self._shutdown and not any(self.lanes.values()):
+                    return
+                item = self._next_item()
+                metrics.set_gauge("scheduler.queue_depth", len(self.lanes[item.lane]), labels={"lane": item.lane})
+            wait_ms = (time.monotonic() - item.enqueued_at) * 1000
+            metrics.observe("scheduler.queue_wait_ms", wait_ms, labels={"lane": item.lane})
+            if not item.future.set_running_or_notify_cancel():
+                reason = item.deadline.reason if item.deadline is not None and item.deadline.reason else "cancelled"
+                record_cancelled(reason, "queue", item.cost)
+                continue
+            if item.deadline is not None:
+                try:
+                    item.deadline.check("queue", item.cost)
+                except RequestCancelled as e:
+                    item.future.set_exception(e)
+                    continue
+            try:
+                item.future.set_result(item.fn(*item.args, **item.kwargs))
+            except BaseException as e:
+                item.future.set_exception(e)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for lane in self.lanes.values():
+                    while lane:
+                        lane.pop().future.cancel()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = metrics.snapshot()["summaries"]
+        with self._condition:
+            return {
+                lane: {
+                    "queued": len(self.lanes[lane]),
+                    "clients_waiting": len({item.client_id for item in self.lanes[lane].heap}),
+                    "rate_per_client": self.lane_configs[lane].rate,
+                    "burst_per_client": self.lane_configs[lane].burst,
+                    "queue_wait_ms": snapshot.get(f"scheduler.queue_wait_ms{{lane={lane}}}", {}),
+                }
+                for lane in LANES
+            }
+
+
+class ClientExecutor(Executor):
+    """Executor bound to one client and lane, for APIs that expect a plain executor"""
+
+    def __init__(self, scheduler: InferenceScheduler, client_id: str, lane: str, charge: bool = True):
+        self.scheduler = scheduler
+        self.client_id = client_id
+        self.lane = lane
+        self.charge = charge
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.scheduler.submit_for(self.client_id, self.lane, fn, *args, charge=self.charge, **kwargs)
+
+
+def default_lane_configs() -> Dict[str, LaneConfig]:
+    """Per-client limits from the environment (images per second / burst size)"""
+    return {
+        INTERACTIVE: LaneConfig(
+            rate=float(os.getenv("RATE_LIMIT_INTERACTIVE_RPS", "5")),
+            burst=float(os.getenv("RATE_LIMIT_INTERACTIVE_BURST", "20")),
+        ),
+        BULK: LaneConfig(
+            rate=float(os.getenv("RATE_LIMIT_BULK_RPS", "2")),
+            burst=float(os.getenv("RATE_LIMIT_BULK_BURST", "500")),
+        ),
+    }
+
+
+def parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    networks = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry {entry!r}")
+    return networks
+
+
+trusted_proxies = parse_networks(TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host) if host else None
+    except ValueError:
+        return False
+    return address is not None and any(address in network for network in trusted_proxies)
+
+
+def client_identity(connection) -> str:
+    """Identify the caller of a Request/WebSocket.
+
+    Identity headers are only believed when the peer is in TRUSTED_PROXIES:
+    then an id forwarded by the Node proxy (``X-User-Id``) wins, then an API
+    key, then the first address in ``X-Forwarded-For`` (read from the right)
+    that is not itself a trusted proxy. Anyone else is identified by the
+    address it connected from, so a client cannot pick its own bucket.
+    """
+    host = connection.client.host if connection.client else None
+    if not is_trusted_proxy(host):
+        return f"ip:{host or 'unknown'}"
+    headers = connection.headers
+    if headers.get("x-user-id"):
+        return f"user:{headers['x-user-id']}"
+    if headers.get("x-api-key"):
+        return f"key:{hashlib.sha256(headers['x-api-key'].encode()).hexdigest()[:12]}"
+    for address in reversed(headers.get("x-forwarded-for", "").split(",")):
+        address = address.strip()
+        if address and not is_trusted_proxy(address):
+            return f"ip:{address}"
+    return f"ip:{host}"
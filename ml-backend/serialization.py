@@ -0,0 +1,109 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.plant-detection.compact+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Per-species fields that are identical for every box and sent once in the species table
+SPECIES_FIELDS = ("label", "category", "properties", "scientific_name")
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the response format from an Accept header: ``json`` (default), ``compact`` or ``msgpack``"""
+    if not accept:
+        return "json"
+    accept = accept.lower()
+    if msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return "msgpack"
+    if orjson is not None and COMPACT_JSON_MEDIA_TYPE in accept:
+        return "compact"
+    return "json"
+
+
+class SpeciesTable:
+    """Assigns small integer ids to species so their metadata is sent only once"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.entries: List[Dict[str, Any]] = []
+
+    def id_for(self, plant: Dict[str, Any]) -> int:
+        label = plant["label"]
+        if label not in self.ids:
+            self.ids[label] = len(self.entries)
+            self.entries.append({field: plant.get(field) for field in SPECIES_FIELDS})
+        return self.ids[label]
+
+
+def to_columnar(result: Dict[str, Any], species: SpeciesTable, binary: bool) -> Dict[str, Any]:
+    """Convert one ``detect_plants`` response into columns.
+
+    ``boxes`` holds x1, y1, x2, y2 per plant as float32 - raw little-endian bytes
+    when ``binary`` is set, otherwise a flat list. Width/height are implied.
+    """
+    plants = result["plants"]
+    boxes = np.array(
+        [[p["bbox"]["x1"], p["bbox"]["y1"], p["bbox"]["x2"], p["bbox"]["y2"]] for p in plants],
+        dtype="<f4",
+    ).reshape(-1, 4)
+    confidence = np.array([p["confidence"] for p in plants], dtype="<f4")
+    columns = {
+        "count": result["count"],
+        "image_info": result["image_info"],
+        "species_id": [species.id_for(p) for p in plants],
+        "boxes": boxes.tobytes() if binary else np.round(boxes, 1).ravel().tolist(),
+        "confidence": confidence.tobytes() if binary else np.round(confidence, 4).tolist(),
+    }
+    # Keep any per-plant extras (e.g. track ids) as their own columns
+    extra_fields = sorted({key for p in plants for key in p} - set(SPECIES_FIELDS) - {"bbox", "confidence"})
+    for field in extra_fields:
+        columns[field] = [p.get(field) for p in plants]
+    return columns
+
+
+def encode_compact(results: List[Dict[str, Any]], fmt: str) -> bytes:
+    """Encode one or more detection responses with a shared species table"""
+    binary = fmt == "msgpack"
+    species = SpeciesTable()
+    images = [to_columnar(result, species, binary) for result in results]
+    document = {
+        "format": "columnar-v1",
+        "species": species.entries,
+        "images": images,
+    }
+    return pack(document, fmt)
+
+
+def pack(document: Dict[str, Any], fmt: str) -> bytes:
+    """Serialize an already-columnar document as msgpack or orjson"""
+    if fmt == "msgpack":
+        return msgpack.packb(document, use_bin_type=True)
+    return orjson.dumps(document, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def media_type_for(fmt: str) -> str:
+    return MSGPACK_MEDIA_TYPES[0] if fmt == "msgpack" else COMPACT_JSON_MEDIA_TYPE
+
+
+def compact_response(results: List[Dict[str, Any]], fmt: str) -> Response:
+    """Build a Response in the negotiated compact format"""
+    return Response(
+        content=encode_compact(results, fmt),
+        media_type=media_type_for(fmt),
+        headers={"Vary": "Accept"},
+    )
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the Plant Detection API
+Runs uvicorn without auto-reload, with uvloop/httptools and tuned keep-alive
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000]
+
+All options can also be set through the environment (API_HOST, API_PORT,
+WEB_CONCURRENCY, KEEP_ALIVE_TIMEOUT, BACKLOG, LIMIT_CONCURRENCY).
+"""
+
+import os
+import sys
+import argparse
+import importlib.util
+from pathlib import Path
+
+import uvicorn
+
+
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def server_options(args: argparse.Namespace) -> dict:
+    """uvicorn keyword arguments for the production profile"""
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "reload": args.reload,
+        # uvicorn[standard] ships both; fall back gracefully on platforms without them (e.g. Windows)
+        "loop": "uvloop" if has_module("uvloop") else "asyncio",
+        "http": "httptools" if has_module("httptools") else "h11",
+        # Longer than the Node proxy / load balancer idle timeout so pooled connections are reused
+        "timeout_keep_alive": args.keep_alive,
+        "backlog": args.backlog,
+        "access_log": args.access_log,
+        # Keep the socket peer as request.client: scheduler.client_identity reads X-Forwarded-For
+        # itself, and only from TRUSTED_PROXIES (uvicorn would otherwise rewrite it by default)
+        "proxy_headers": False,
+        "app_dir": str(Path(__file__).resolve().parent),
+    }
+    if args.limit_concurrency:
+        options["limit_concurrency"] = args.limit_concurrency
+    return options
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Plant Detection API")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Worker processes; each loads its own model")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_TIMEOUT", "75")),
+                        help="Seconds to hold idle keep-alive connections open")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", "2048")))
+    parser.add_argument("--limit-concurrency", type=int, default=int(os.getenv("LIMIT_CONCURRENCY", "0")),
+                        help="Maximum concurrent connections per worker before 503s (0 = unlimited)")
+    parser.add_argument("--access-log", action="store_true", default=os.getenv("ACCESS_LOG", "0") == "1")
+    parser.add_argument("--reload", action="store_true", help="Development mode with auto-reload (single worker)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.reload:
+        args.workers = 1
+    options = server_options(args)
+    # Worker processes size their torch/OpenCV thread pools from this (see runtime.py)
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    print(f"🌱 Starting Plant Detection API on {args.host}:{args.port} "
+          f"(workers={args.workers}, loop={options['loop']}, http={options['http']}, "
+          f"keep-alive={args.keep_alive}s)")
+    uvicorn.run("main:app", **options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -56,6 +56,11 @@ def main():
     else:
         print("⚠️  Model download failed, but will download automatically on first run")
     
+    # Build TorchScript artifacts so workers skip rebuilding the model graph on startup
+    export_model = run_command("python export_model.py --backends torchscript", "Exporting optimized model artifacts")
+    if not export_model:
+        print("⚠️  Artifact export failed, the server will load the raw weights")
+    
     # Create a simple test script
     test_script = '''
 import torch
@@ -0,0 +1,241 @@
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Largest coordinate magnitude accepted by PointIndex; keeps cell numbers well inside int64
+MAX_COORDINATE = 1e9
+
+# Own cell plus the four neighbours "after" it, so every cross-cell pair is produced exactly once
+HALF_STENCIL = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised ``[(k, s) for k, (start, n) in enumerate(...) for s in range(start, start + n)]``"""
+    owners = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+
+def check_coordinates(*values: float):
+    """Raise ValueError unless every value is finite and within +-MAX_COORDINATE"""
+    for value in values:
+        if not math.isfinite(value) or abs(value) > MAX_COORDINATE:
+            raise ValueError(f"Coordinate {value} is not a finite number within +-{MAX_COORDINATE:g}")
+
+
+def grid_pairs(points: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Candidate pairs (i, j) of points sharing a grid cell or in adjacent cells.
+
+    With ``cell_size`` at least the largest interaction distance every pair
+    that can interact is returned once, in O(n + pairs) instead of O(n^2).
+    """
+    n = len(points)
+    if n < 2 or cell_size <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    cells = np.floor(points / cell_size).astype(np.int64)
+    origin = cells.min(axis=0) - 1
+    span = cells.max(axis=0) - origin + 2
+
+    def key(c: np.ndarray) -> np.ndarray:
+        return (c[:, 0] - origin[0]) * span[1] + (c[:, 1] - origin[1])
+
+    order = np.argsort(key(cells), kind="stable")
+    sorted_keys = key(cells)[order]
+    firsts, seconds = [], []
+    for dx, dy in HALF_STENCIL:
+        neighbour = key(cells + (dx, dy))
+        start = np.searchsorted(sorted_keys, neighbour, side="left")
+        end = np.searchsorted(sorted_keys, neighbour, side="right")
+        i, positions = expand_ranges(start, end - start)
+        j = order[positions]
+        if (dx, dy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        firsts.append(i)
+        seconds.append(j)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+class PointIndex:
+    """Uniform-grid index over 2-D points with incremental inserts, moves and removals.
+
+    Points live in NumPy arrays addressed by slot; the grid is a sorted array of
+    cell keys (CSR style), so a query is a handful of ``searchsorted`` calls plus
+    one vectorised distance filter. Inserts and moves go to a small unsorted
+    tail that queries scan directly, and removals just clear the slot's ``alive``
+    flag; the grid is rebuilt once the tail or the dead slots grow past
+    ``rebuild_fraction`` of the index.
+    """
+
+    def __init__(self, points_per_cell: float = 4.0, rebuild_fraction: float = 0.05):
+        self.points_per_cell = points_per_cell
+        self.rebuild_fraction = rebuild_fraction
+        self.ids: List[Any] = []
+        self.slots: Dict[Any, int] = {}
+        self.xy = np.empty((0, 2))
+        self.alive = np.empty(0, dtype=bool)
+        self.cell_size = 1.0
+        self.origin = np.zeros(2, dtype=np.int64)
+        self.bounds = np.zeros((2, 2))  # (min, max) corners of every indexed point (grows until a rebuild)
+        self.columns = self.span = 1
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.tail: List[int] = []  # slots added or moved since the last rebuild
+        self.dead = 0
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, point_id: Any) -> bool:
+        return point_id in self.slots
+
+    def bulk_load(self, ids: Sequence[Any], xy: np.ndarray):
+        """Replace the contents with ``ids`` at (n, 2) positions ``xy``"""
+        self.ids = list(ids)
+        self.slots = {point_id: slot for slot, point_id in enumerate(self.ids)}
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2).copy()
+        check_coordinates(*self.xy.ravel().tolist())
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.rebuild()
+
+    def upsert(self, point_id: Any, x: float, y: float):
+        """Insert a point, or move it if the id is already indexed"""
+        check_coordinates(x, y)
+        self.remove(point_id)
+        slot = len(self.ids)
+        if slot == len(self.xy):
+            self.xy = np.resize(self.xy, (max(16, 2 * slot), 2))
+            self.alive = np.resize(self.alive, max(16, 2 * slot))
+        self.ids.append(point_id)
+        self.slots[point_id] = slot
+        self.xy[slot] = (x, y)
+        self.alive[slot] = True
+        self.tail.append(slot)
+        if len(self.slots) == 1:
+            self.bounds = np.array([[x, y], [x, y]], dtype=float)
+        else:
+            self.bounds = np.array([np.minimum(self.bounds[0], (x, y)), np.maximum(self.bounds[1], (x, y))])
+        self._maybe_rebuild()
+
+    def remove(self, point_id: Any) -> bool:
+        slot = self.slots.pop(point_id, None)
+        if slot is None:
+            return False
+        self.alive[slot] = False
+        self.dead += 1
+        self._maybe_rebuild()
+        return True
+
+    def _maybe_rebuild(self):
+        if len(self.tail) + self.dead > max(32, self.rebuild_fraction * len(self.slots)):
+            self.rebuild()
+
+    def rebuild(self):
+        """Compact away removed slots and re-sort every point into the grid"""
+        live = np.flatnonzero(self.alive[:len(self.ids)])
+        self.ids = [self.ids[slot] for slot in live]
+        self.slots = {point_id: slot for slot, point_id in enumerate(self.ids)}
+        self.xy = self.xy[live]
+        self.alive = np.ones(len(live), dtype=bool)
+        self.tail, self.dead = [], 0
+        self.rebuilds += 1
+        if not len(live):
+            self.sorted_keys = self.order = np.empty(0, dtype=np.int64)
+            return
+        self.bounds = np.array([self.xy.min(axis=0), self.xy.max(axis=0)])
+        # Cells sized for ~points_per_cell points each over the occupied extent
+        # (never finer than the longer side split into n / points_per_cell, for points along a line)
+        extent = np.ptp(self.xy, axis=0)
+        fill = self.points_per_cell / len(live)
+        self.cell_size = max(float(np.sqrt(np.prod(extent) * fill)), float(extent.max()) * fill, 1e-6)
+        cells = np.floor(self.xy / self.cell_size).astype(np.int64)
+        self.origin = cells.min(axis=0)
+        self.columns = int(cells[:, 0].max() - self.origin[0] + 1)
+        self.span = int(cells[:, 1].max() - self.origin[1] + 1)
+        keys = (cells[:, 0] - self.origin[0]) * self.span + (cells[:, 1] - self.origin[1])
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def _candidates(self, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+        """Slots whose grid cell overlaps the rectangle, plus the unsorted tail"""
+        parts = []
+        if len(self.sorted_keys):
+            low = np.floor(np.array([x1, y1]) / self.cell_size).astype(np.int64) - self.origin
+            high = np.floor(np.array([x2, y2]) / self.cell_size).astype(np.int64) - self.origin
+            low[1], high[1] = max(low[1], 0), min(high[1], self.span - 1)
+            columns = np.arange(max(low[0], 0), min(high[0], self.columns - 1) + 1)
+            if len(columns) and low[1] <= high[1]:
+                start = np.searchsorted(self.sorted_keys, columns * self.span + low[1], side="left")
+                end = np.searchsorted(self.sorted_keys, columns * self.span + high[1], side="right")
+                _, positions = expand_ranges(start, end - start)
+                parts.append(self.order[positions])
+        if self.tail:
+            parts.append(np.array(self.tail, dtype=np.int64))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return candidates[self.alive[candidates]]
+
+    def within(self, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+        """Slots of points inside the axis-aligned rectangle (inclusive)"""
+        check_coordinates(x1, y1, x2, y2)
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        slots = self._candidates(x1, y1, x2, y2)
+        xy = self.xy[slots]
+        inside = (xy[:, 0] >= x1) & (xy[:, 0] <= x2) & (xy[:, 1] >= y1) & (xy[:, 1] <= y2)
+        return slots[inside]
+
+    def radius(self, x: float, y: float, r: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(slots, distances) of points within ``r`` of (x, y), nearest first"""
+        check_coordinates(x, y, r)
+        slots = self._candidates(x - r, y - r, x + r, y + r)
+        distance = np.hypot(self.xy[slots, 0] - x, self.xy[slots, 1] - y)
+        inside = distance <= r
+        slots, distance = slots[inside], distance[inside]
+        order = np.argsort(distance, kind="stable")
+        return slots[order], distance[order]
+
+    def nearest(self, x: float, y: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(slots, distances) of the ``k`` points nearest to (x, y), nearest first.
+
+        Searches a radius expected to hold ~k points and doubles it until k are
+        found; everything inside the searched radius is exact, so the result is too.
+        Once the radius reaches every indexed point, all points are ranked directly.
+        """
+        check_coordinates(x, y)
+        k = min(k, len(self.slots))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # Distance from (x, y) to the farthest corner of the bounds: a radius that covers every point
+        farthest = float(np.hypot(max(x - self.bounds[0, 0], self.bounds[1, 0] - x),
+                                  max(y - self.bounds[0, 1], self.bounds[1, 1] - y)))
+        r = self.cell_size * max(1.0, np.sqrt(k / self.points_per_cell))
+        while r < farthest:
+            slots = self._candidates(x - r, y - r, x + r, y + r)
+            distance = np.hypot(self.xy[slots, 0] - x, self.xy[slots, 1] - y)
+            inside = distance <= r
+            if inside.sum() >= k:
+                slots, distance = slots[inside], distance[inside]
+                break
+            r *= 2
+        else:
+            slots = np.flatnonzero(self.alive[:len(self.ids)])
+            distance = np.hypot(self.xy[slots, 0] - x, self.xy[slots, 1] - y)
+        if len(slots) > k:
+            keep = np.argpartition(distance, k - 1)[:k]
+            slots, distance = slots[keep], distance[keep]
+        order = np.argsort(distance, kind="stable")
+        return slots[order], distance[order]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "points": len(self.slots),
+            "cell_size": round(self.cell_size, 4),
+            "cells": int(len(np.unique(self.sorted_keys))) if len(self.sorted_keys) else 0,
+            "unsorted": len(self.tail),
+            "removed": self.dead,
+            "rebuilds": self.rebuilds,
+        }
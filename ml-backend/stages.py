@@ -0,0 +1,201 @@
+import io
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from buffers import decoded_bytes, memory_budget
+from detector import MAX_IMAGE_SIDE, TTA_VARIANTS, build_response
+from health import HEALTH_ANALYSIS, attach_health
+from masks import DEFAULT_MASK_SIZE, encode_rle, mask_polygons, coverage_metrics
+from pipeline import Frame, RunContext, Stage, register_stage
+
+
+@register_stage
+class DecodeStage(Stage):
+    name = "decode"
+    requires = ("contents",)
+    provides = ("image",)
+
+    def process(self, frame: Frame, context: RunContext):
+        frame.image = Image.open(io.BytesIO(frame.contents))
+
+
+@register_stage
+class ResizeStage(Stage):
+    """RGB conversion and the 1280px size cap (PlantDetector.preprocess_image), within the memory budget.
+
+    ``decode`` only reads the header; pixels are decoded here. The decode, RGB copy
+    and resized copy of every image in the batch are reserved in one go (waiting
+    while other requests hold the budget), so a batch never waits on bytes it
+    holds itself. As each image is done its scratch bytes are returned and only
+    the resized image stays reserved until the run ends.
+    """
+    name = "resize"
+    requires = ("image",)
+    provides = ("image",)
+
+    @staticmethod
+    def bytes_needed(image: Image.Image) -> int:
+        """Peak bytes to decode and resize ``image``; sets up reduced-scale JPEG decoding"""
+        scale = min(1.0, MAX_IMAGE_SIDE / max(image.size))
+        if image.format == "JPEG" and scale < 0.5:
+            # Decode at 1/2, 1/4 or 1/8 scale in the JPEG decoder when that still covers the target size
+            image.draft("RGB", (round(image.size[0] * scale), round(image.size[1] * scale)))
+            scale = min(1.0, MAX_IMAGE_SIDE / max(image.size))
+        target = (round(image.size[0] * scale), round(image.size[1] * scale))
+        needed = decoded_bytes(image.size, image.mode) + decoded_bytes(target, "RGB")
+        if image.mode != "RGB":
+            needed += decoded_bytes(image.size, "RGB")
+        return needed
+
+    def process_batch(self, frames: List[Frame], context: RunContext):
+        needed = [self.bytes_needed(frame.image) for frame in frames]
+        batch = memory_budget.reserve(sum(needed), context.deadline, self.name)
+        try:
+            for frame, nbytes in zip(frames, needed):
+                frame.image = self.detector.preprocess_image(frame.image)
+                kept = decoded_bytes(frame.image.size, frame.image.mode)
+                frame.reservation = batch.split(kept)
+                batch.shrink(batch.nbytes - (nbytes - kept))
+        finally:
+            # Frames not reached after a failure; the pipeline releases the per-frame shares
+            batch.release()
+
+    def process(self, frame: Frame, context: RunContext):
+        self.process_batch([frame], context)
+
+
+@register_stage
+class InferStage(Stage):
+    """One model call per batch at the largest inference size any image asks for"""
+    name = "infer"
+    requires = ("image",)
+    provides = ("inference_size", "result")
+
+    def process_batch(self, frames: List[Frame], context: RunContext):
+        images = [frame.image for frame in frames]
+        inference_size = max(self.detector.choose_inference_size(image, context.queue_depth, context.imgsz)
+                             for image in images)
+        # Lower confidence for more detections
+        results = self.detector.predict(images if len(images) > 1 else images[0], conf=0.25, imgsz=inference_size)
+        for frame, result in zip(frames, results):
+            frame.inference_size = inference_size
+            frame.result = result
+
+
+@register_stage
+class TTAStage(Stage):
+    """Flipped and downscaled variants in one batched call, fused back into one set of detections"""
+    name = "tta"
+    requires = ("image",)
+    provides = ("inference_size", "detections")
+
+    def process(self, frame: Frame, context: RunContext):
+        frame.inference_size = self.detector.choose_inference_size(frame.image, context.queue_depth, context.imgsz)
+        frame.detections = self.detector.predict_tta(frame.image, conf=0.25, imgsz=frame.inference_size)
+        frame.extras.setdefault("image_info", {})["tta_variants"] = len(TTA_VARIANTS)
+
+
+@register_stage
+class ClassifyStage(Stage):
+    """Map model classes to plant names and drop non-plants and low-confidence boxes"""
+    name = "classify"
+    requires = ("result",)
+    provides = ("candidates",)
+
+    def process(self, frame: Frame, context: RunContext):
+        boxes = frame.result.boxes
+        if boxes is None or len(boxes) == 0:
+            arrays = (np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+        else:
+            arrays = (boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+        frame.candidates = self.detector.plant_candidates(*arrays, frame.result.names)
+
+
+@register_stage
+class FuseStage(Stage):
+    """Merge duplicate plant boxes across classes (DETECTION_FUSION)"""
+    name = "fuse"
+    requires = ("candidates",)
+    provides = ("detections",)
+
+    def process(self, frame: Frame, context: RunContext):
+        frame.detections = self.detector.describe_plants(self.detector.merge_candidates(frame.candidates))
+
+
+@register_stage
+class SegmentStage(Stage):
+    """YOLO-seg inference: detections plus reduced-resolution masks"""
+    name = "segment"
+    requires = ("image",)
+    provides = ("inference_size", "detections", "segmentation")
+
+    def process(self, frame: Frame, context: RunContext):
+        frame.inference_size = self.detector.choose_inference_size(frame.image, context.queue_depth, context.imgsz)
+        segmented = self.detector.segment(frame.image, frame.inference_size,
+                                          context.options.get("mask_size", DEFAULT_MASK_SIZE))
+        frame.detections = segmented["plants"]
+        frame.segmentation = {"masks": segmented["masks"], "scale": segmented["scale"]}
+
+
+@register_stage
+class MaskStage(Stage):
+    """Encode masks (RLE or polygons) and compute mask/leaf areas and coverage"""
+    name = "masks"
+    requires = ("image", "detections", "segmentation")
+    provides = ("detections", "segmentation")
+
+    def process(self, frame: Frame, context: RunContext):
+        mask_format = context.options.get("mask_format", "rle")
+        masks, scale = frame.segmentation["masks"], frame.segmentation["scale"]
+        height, width = masks.shape[1:]
+        rgb = np.asarray(frame.image.resize((width, height), Image.Resampling.BILINEAR))
+        coverage = coverage_metrics(masks, rgb, scale)
+        for plant, mask, area, leaf_area in zip(frame.detections, masks, coverage["areas"].tolist(),
+                                                coverage["leaf_areas"].tolist()):
+            plant["mask"] = encode_rle(mask) if mask_format == "rle" else mask_polygons(mask, scale)
+            plant["maskArea"] = round(area, 1)
+            plant["leafArea"] = round(leaf_area, 1)
+        frame.segmentation = {
+            "format": mask_format,
+            "maskSize": {"width": width, "height": height},
+            "scale": round(scale, 4),
+            "coverage": coverage["summary"],
+        }
+
+
+@register_stage
+class HealthStage(Stage):
+    """Vegetation indices and stress ratios per plant (health.attach_health)"""
+    name = "health"
+    requires = ("image", "detections")
+    provides = ("detections",)
+
+    def process_batch(self, frames: List[Frame], context: RunContext):
+        for frame in frames:
+            attach_health(frame.image, frame.detections)
+
+
+@register_stage
+class SerializeStage(Stage):
+    """Assemble the standard response dict"""
+    name = "serialize"
+    requires = ("image", "detections")
+    provides = ("response",)
+
+    def process(self, frame: Frame, context: RunContext):
+        frame.response = build_response(frame.image, frame.detections, frame.inference_size, health=False)
+        frame.response["image_info"].update(frame.extras.get("image_info", {}))
+        if frame.segmentation is not None:
+            frame.response["segmentation"] = frame.segmentation
+
+
+def default_pipelines() -> Dict[str, List[str]]:
+    """Stage sets per endpoint; HEALTH_ANALYSIS=0 leaves the health stage out"""
+    enrich = ["health"] if HEALTH_ANALYSIS else []
+    return {
+        "detect": ["decode", "resize", "infer", "classify", "fuse", *enrich, "serialize"],
+        "detect_tta": ["decode", "resize", "tta", *enrich, "serialize"],
+        "segment": ["decode", "resize", "segment", "masks", *enrich, "serialize"],
+    }
@@ -0,0 +1,260 @@
+import io
+import json
+import math
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+from fastapi import WebSocket, WebSocketDisconnect
+
+from tracking import TemporalDetector
+from serialization import SpeciesTable, to_columnar, pack
+
+logger = logging.getLogger(__name__)
+
+JPEG_SOI = b"\xff\xd8"
+HINT_KEYS = ("max_size", "frame_skip", "detect_every")
+
+# cv2.imdecode flags that decode JPEGs directly at 1/2, 1/4 and 1/8 scale
+REDUCED_DECODE_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+def parse_frame_message(payload: bytes, next_id: int) -> Tuple[int, bytes]:
+    """Split a binary frame message into (frame_id, jpeg_bytes).
+
+    Frames may be sent as bare JPEG bytes (ids are assigned sequentially) or
+    prefixed with a 4-byte big-endian frame id chosen by the client.
+    """
+    if payload[:2] == JPEG_SOI:
+        return next_id, payload
+    return int.from_bytes(payload[:4], "big"), payload[4:]
+
+
+def parse_hints(text: str) -> Dict[str, int]:
+    """Parse a JSON hints message into integer hints; raises ValueError for anything malformed"""
+    try:
+        hints = json.loads(text)
+    except ValueError:
+        raise ValueError("Hints must be a JSON object")
+    if not isinstance(hints, dict):
+        raise ValueError("Hints must be a JSON object")
+    parsed = {}
+    for key in HINT_KEYS:
+        if key not in hints:
+            continue
+        value = hints[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"Hint {key!r} must be a number")
+        parsed[key] = int(value)
+    return parsed
+
+
+class FrameDecoder:
+    """Decodes JPEG frames into a reused per-client buffer bounded by ``max_size``"""
+
+    def __init__(self, max_size: int = 640):
+        self.max_size = max_size
+        self._buffer: Optional[np.ndarray] = None
+
+    def decode(self, jpeg: bytes) -> Tuple[np.ndarray, float]:
+        """Decode a frame and return (bgr_frame, scale) where original = frame * scale"""
+        data = np.frombuffer(jpeg, np.uint8)
+        # PIL only parses the header here, which gives the exact full-resolution size
+        full_w, full_h = Image.open(io.BytesIO(jpeg)).size
+        longest = max(full_h, full_w)
+
+        # Let libjpeg skip DCT work when the frame is far larger than needed
+        flag = cv2.IMREAD_COLOR
+        for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+            if longest / factor >= self.max_size:
+                flag = reduced_flag
+                break
+        frame = cv2.imdecode(data, flag)
+        if frame is None:
+            raise ValueError("Frame is not a decodable image")
+
+        height, width = frame.shape[:2]
+        scale = max(full_h / height, full_w / width)
+        if max(height, width) <= self.max_size:
+            return frame, scale
+
+        ratio = self.max_size / max(height, width)
+        target_shape = (int(height * ratio), int(width * ratio), 3)
+        if self._buffer is None or self._buffer.shape != target_shape:
+            self._buffer = np.empty(target_shape, dtype=np.uint8)
+        cv2.resize(frame, (target_shape[1], target_shape[0]), dst=self._buffer, interpolation=cv2.INTER_AREA)
+        return self._buffer, scale * (1 / ratio)
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox: a new frame replaces any frame not yet picked up"""
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, frame_id: int, jpeg: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = (frame_id, jpeg)
+        self._event.set()
+
+    async def get(self) -> Optional[Tuple[int, bytes]]:
+        """Wait for the newest frame; returns None once the slot is closed and empty"""
+        await self._event.wait()
+        self._event.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+    def close(self):
+        self._event.set()
+
+
+class FrameStreamSession:
+    """One WebSocket client streaming camera frames for detection.
+
+    Frames arrive on a receive loop and land in a ``LatestFrameSlot``; a
+    separate loop runs inference on the shared executor one frame at a time,
+    so when inference falls behind stale frames are dropped instead of queued.
+    With a ``TemporalDetector`` only keyframes run the model and the frames in
+    between are answered from tracked, interpolated boxes with stable ids.
+    Text messages carrying JSON update the ``max_size`` / ``frame_skip`` /
+    ``detect_every`` hints. With ``fmt`` set to ``compact`` or ``msgpack`` each
+    frame is sent in columnar form and species metadata is only sent the first
+    time a species appears in the session (``new_species``).
+    """
+
+    def __init__(self, websocket: WebSocket, detect_frame: Callable[[np.ndarray], List[Dict[str, Any]]],
+                 executor: Executor, max_size: int = 640, frame_skip: int = 0,
+                 temporal: Optional[TemporalDetector] = None, fmt: str = "json"):
+        self.websocket = websocket
+        self.detect_frame = detect_frame
+        self.executor = executor
+        self.decoder = FrameDecoder(max_size)
+        self.frame_skip = max(0, frame_skip)
+        self.temporal = temporal
+        self.fmt = fmt
+        self.species = SpeciesTable()
+        self.slot = LatestFrameSlot()
+        self.received = 0
+        self.skipped = 0
+        self.processed = 0
+        self._closed = False
+
+    async def run(self):
+        await self.websocket.accept()
+        receiver = asyncio.create_task(self._receive_loop())
+        try:
+            await self._process_loop()
+        finally:
+            receiver.cancel()
+
+    def apply_hints(self, hints: Dict[str, int]):
+        """Apply hints from ``parse_hints``"""
+        if "max_size" in hints:
+            self.decoder.max_size = max(32, hints["max_size"])
+        if "frame_skip" in hints:
+            self.frame_skip = max(0, hints["frame_skip"])
+        if "detect_every" in hints and self.temporal is not None:
+            self.temporal.detect_every = max(1, hints["detect_every"])
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    frame_id, jpeg = parse_frame_message(message["bytes"], self.received)
+                    self.received += 1
+                    # Frame-skip hint: only every (frame_skip + 1)-th frame is eligible
+                    if self.frame_skip and (self.received - 1) % (self.frame_skip + 1):
+                        self.skipped += 1
+                        continue
+                    self.slot.put(frame_id, jpeg)
+                elif message.get("text"):
+                    try:
+                        self.apply_hints(parse_hints(message["text"]))
+                    except ValueError as e:
+                        # A bad hint is the client's mistake; report it and keep the stream alive
+                        await self._send({"error": str(e)})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            self._closed = True
+            self.slot.close()
+
+    async def _process_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await self.slot.get()
+            if frame is None:
+                if self._closed:
+                    break
+                continue
+            frame_id, jpeg = frame
+            start_time = time.time()
+            try:
+                plants, image_info, keyframe = await loop.run_in_executor(self.executor, self._detect, jpeg)
+                payload = {
+                    "frame_id": frame_id,
+                    "plants": plants,
+                    "count": len(plants),
+                    "image_info": image_info,
+                    "keyframe": keyframe,
+                    "latency_ms": round((time.time() - start_time) * 1000, 1),
+                    "dropped_frames": self.slot.dropped,
+                    "skipped_frames": self.skipped,
+                }
+            except Exception as e:
+                logger.error(f"Error processing stream frame {frame_id}: {e}")
+                payload = {"frame_id": frame_id, "error": str(e)}
+            self.processed += 1
+            try:
+                await self._send(payload)
+            except (WebSocketDisconnect, RuntimeError):
+                break
+        keyframes = f", {self.temporal.keyframes} keyframes" if self.temporal is not None else ""
+        logger.info(
+            f"Stream closed: {self.received} frames received, {self.processed} processed{keyframes}, "
+            f"{self.slot.dropped} dropped, {self.skipped} skipped"
+        )
+
+    async def _send(self, payload: Dict[str, Any]):
+        if self.fmt == "json" or "error" in payload:
+            await self.websocket.send_json(payload)
+            return
+        known_species = len(self.species.entries)
+        document = to_columnar(payload, self.species, binary=self.fmt == "msgpack")
+        document.update({key: value for key, value in payload.items() if key not in ("plants", "image_info", "count")})
+        document["new_species"] = self.species.entries[known_species:]
+        data = pack(document, self.fmt)
+        if self.fmt == "msgpack":
+            await self.websocket.send_bytes(data)
+        else:
+            await self.websocket.send_text(data.decode())
+
+    def _detect(self, jpeg: bytes) -> Tuple[List[Dict[str, Any]], Dict[str, Any], bool]:
+        frame, scale = self.decoder.decode(jpeg)
+        if self.temporal is not None:
+            plants, keyframe = self.temporal.process(frame, self.detect_frame)
+        else:
+            plants, keyframe = self.detect_frame(frame), True
+        # Report boxes in the coordinate space of the frame the client sent
+        if scale != 1.0:
+            for plant in plants:
+                plant["bbox"] = {key: value * scale for key, value in plant["bbox"].items()}
+        height, width = frame.shape[:2]
+        image_info = {
+            "width": int(round(width * scale)),
+            "height": int(round(height * scale)),
+            "inference_width": width,
+            "inference_height": height,
+        }
+        return plants, image_info, keyframe
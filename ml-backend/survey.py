@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Offline garden survey: plant detection over a directory or archive of photos
+
+    python survey.py photos/ --output survey.jsonl
+    python survey.py photos.zip --output survey.parquet --batch-size 32 --decode-workers 4
+
+Decoding (process pool), batched inference and writing (background thread)
+run as a pipeline so the three overlap. Every flushed chunk of results is
+recorded in <output>.checkpoint; rerunning the same command skips images
+already written and continues where an interrupted run stopped. Images that
+could not be decoded are skipped too unless --retry-failed is given; a retried
+image gets a new record that supersedes its earlier error record.
+Parquet output (a directory of part files) requires pyarrow.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import tarfile
+import zipfile
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger("survey")
+
+WRITER_POLL_INTERVAL = 0.5  # seconds between checks that the writer is still alive while its queue is full
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+Source = Union[str, bytes]  # file path, or the raw bytes of an archive member
+
+
+def iter_sources(path: Path) -> Iterator[Tuple[str, Source]]:
+    """Yield (name, path-or-bytes) for every image under a directory or inside a zip/tar archive"""
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES):
+            yield str(file.relative_to(path)), str(file)
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                    yield name, archive.read(name)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and Path(member.name).suffix.lower() in IMAGE_SUFFIXES:
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{path} is not a directory, zip or tar archive")
+
+
+def decode_image(name: str, source: Source) -> Dict[str, Any]:
+    """Process pool worker: decode and preprocess one image into an RGB array"""
+    from detector import PlantDetector
+
+    try:
+        image = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+        image_format = image.format
+        image = PlantDetector.preprocess_image(image)
+        return {"image": name, "pixels": np.asarray(image), "format": image.format or image_format}
+    except Exception as e:
+        return {"image": name, "error": f"Could not decode image: {e}"}
+
+
+class Checkpoint:
+    """Append-only log of flushed output chunks and the images they contain"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        if path.exists():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break  # torn final line from an interrupted write
+
+    def completed(self, include_failed: bool = True) -> Set[str]:
+        """Images already written; ``include_failed`` False leaves out the ones written as errors"""
+        names = {name for entry in self.entries for name in entry["images"]}
+        if include_failed:
+            names.update(name for entry in self.entries for name in entry.get("failed", []))
+        return names
+
+    def record(self, entry: Dict[str, Any]):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append(entry)
+
+
+class JsonlSink:
+    """One JSON record per line; resumes by truncating anything written after the last checkpoint"""
+
+    def __init__(self, path: Path, checkpoint: Checkpoint):
+        offset = checkpoint.entries[-1]["offset"] if checkpoint.entries else 0
+        self.file = open(path, "r+b" if path.exists() else "wb")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.file.write(b"".join(json.dumps(r).encode() + b"\n" for r in records))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Directory of part files, one per flushed chunk; parts not in the checkpoint are discarded"""
+
+    def __init__(self, path: Path, checkpoint: Checkpoint):
+        if pa is None:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        path.mkdir(parents=True, exist_ok=True)
+        kept = {entry["part"] for entry in checkpoint.entries}
+        for part in path.glob("part-*.parquet"):
+            if part.name not in kept:
+                part.unlink()
+        self.next_part = len(kept)
+
+    def write(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        rows = [{**r, "plants": json.dumps(r["plants"])} for r in records]
+        name = f"part-{self.next_part:05d}.parquet"
+        staging = self.path / f".{name}.tmp"
+        pq.write_table(pa.Table.from_pylist(rows), staging)
+        staging.rename(self.path / name)
+        self.next_part += 1
+        return {"part": name}
+
+    def close(self):
+        pass
+
+
+class SurveyWriter(threading.Thread):
+    """Pipeline stage 3: writes result chunks and checkpoints them once they are durable"""
+
+    def __init__(self, sink, checkpoint: Checkpoint, chunk_size: int):
+        super().__init__(name="survey-writer", daemon=True)
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=4)
+        self.error: Optional[BaseException] = None
+
+    def put(self, records: Optional[List[Dict[str, Any]]]):
+        """Queue records (None: flush and stop); re-raises the writer's error instead of blocking on a dead writer"""
+        while True:
+            self.check()
+            try:
+                self.queue.put(records, timeout=WRITER_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+        if not self.is_alive():
+            raise RuntimeError("Survey writer stopped unexpectedly")
+
+    def run(self):
+        pending: List[Dict[str, Any]] = []
+        try:
+            while True:
+                records = self.queue.get()
+                if records is not None:
+                    pending.extend(records)
+                if pending and (records is None or len(pending) >= self.chunk_size):
+                    entry = self.sink.write(pending)
+                    self.checkpoint.record({**entry,
+                                            "images": [r["image"] for r in pending if r["error"] is None],
+                                            "failed": [r["image"] for r in pending if r["error"] is not None]})
+                    pending = []
+                if records is None:
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.sink.close()
+
+
+def to_record(name: str, response: Optional[Dict[str, Any]], error: Optional[str] = None) -> Dict[str, Any]:
+    if response is None:
+        return {"image": name, "width": None, "height": None, "inference_size": None,
+                "count": 0, "plants": [], "error": error}
+    info = response["image_info"]
+    return {"image": name, "width": info["width"], "height": info["height"],
+            "inference_size": info.get("inference_size"), "count": response["count"],
+            "plants": response["plants"], "error": None}
+
+
+def detect_batch(detector, batch: List[Dict[str, Any]], imgsz: Optional[int],
+                 tta: bool = False) -> List[Dict[str, Any]]:
+    """Pipeline stage 2: one batched model call for a list of decoded images"""
+    from detector import build_response
+
+    images = []
+    for item in batch:
+        image = Image.fromarray(item["pixels"])
+        image.format = item["format"]
+        images.append(image)
+    inference_size = max(detector.choose_inference_size(image, 0, imgsz) for image in images)
+    if tta:
+        # One batched call per image over its augmented variants
+        return [
+            to_record(item["image"], build_response(
+                image, detector.predict_tta(image, conf=0.25, imgsz=inference_size, verbose=False), inference_size))
+            for item, image in zip(batch, images)
+        ]
+    results = detector.predict(images, conf=0.25, imgsz=inference_size, verbose=False)
+    return [
+        to_record(item["image"], build_response(image, detector.enhance_plant_detection([result]), inference_size))
+        for item, image, result in zip(batch, images, results)
+    ]
+
+
+def run_survey(args: argparse.Namespace) -> Dict[str, Any]:
+    from detector import PlantDetector
+    from runtime import Runtime, RuntimeConfig
+
+    output = Path(args.output)
+    fmt = args.format or ("parquet" if output.suffix == ".parquet" else "jsonl")
+    checkpoint = Checkpoint(output.with_name(output.name + ".checkpoint"))
+    done = checkpoint.completed(include_failed=not args.retry_failed)
+    sink = ParquetSink(output, checkpoint) if fmt == "parquet" else JsonlSink(output, checkpoint)
+    writer = SurveyWriter(sink, checkpoint, args.chunk_size)
+
+    Runtime(RuntimeConfig.from_env(1)).apply()
+    detector = PlantDetector()
+    writer.start()
+
+    processed = failed = skipped = 0
+
+    def pending_sources():
+        nonlocal skipped
+        for name, source in iter_sources(Path(args.source)):
+            if name in done:
+                skipped += 1
+            else:
+                yield name, source
+
+    sources = pending_sources()
+    start = last_report = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    in_flight: deque = deque()
+
+    def flush_batch():
+        nonlocal processed
+        if batch:
+            writer.put(detect_batch(detector, batch, args.imgsz, args.tta))
+            processed += len(batch)
+            batch.clear()
+
+    # Pipeline stage 1: keep the decode pool a couple of batches ahead of inference
+    with ProcessPoolExecutor(max_workers=args.decode_workers) as pool:
+        exhausted = False
+        while not exhausted or in_flight:
+            while not exhausted and len(in_flight) < args.batch_size * 2:
+                item = next(sources, None)
+                submitted = processed + failed + len(batch) + len(in_flight)
+                if item is None or (args.limit and submitted >= args.limit):
+                    exhausted = True
+                else:
+                    in_flight.append(pool.submit(decode_image, *item))
+            if not in_flight:
+                break
+            decoded = in_flight.popleft().result()
+            if "error" in decoded:
+                writer.put([to_record(decoded["image"], None, decoded["error"])])
+                failed += 1
+            else:
+                batch.append(decoded)
+            if len(batch) >= args.batch_size:
+                flush_batch()
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                logger.info(f"{processed} images, {processed / (now - start):.1f} images/s")
+                last_report = now
+        flush_batch()
+
+    writer.put(None)
+    writer.join()
+    if writer.error is not None:
+        raise writer.error
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped,
+        "seconds": round(elapsed, 1),
+        "images_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "output": str(output),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run plant detection over a directory or archive of photos")
+    parser.add_argument("source", help="Directory, .zip or .tar(.gz) of images")
+    parser.add_argument("--output", required=True, help="survey.jsonl, or survey.parquet (directory of parts)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="Output format (default: from the output suffix)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per model call")
+    parser.add_argument("--decode-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--chunk-size", type=int, default=256, help="Records per flushed/checkpointed chunk")
+    parser.add_argument("--imgsz", type=int, default=None, help="Fixed inference size (default: adaptive)")
+    parser.add_argument("--tta", action="store_true",
+                        help="Test-time augmentation (flips and scales): slower, better recall")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many images (0 = all)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Retry images an earlier run could not decode instead of skipping them")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress logs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_survey(args)
+    print(f"✅ Surveyed {summary['processed']} images ({summary['failed']} unreadable, "
+          f"{summary['skipped']} already done) in {summary['seconds']}s - "
+          f"{summary['images_per_second']} images/s -> {summary['output']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the decode memory budget (buffers.py) and the resize stage that uses it
+
+    python test_buffers.py        # or: python -m pytest test_buffers.py
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+import stages
+from buffers import MemoryBudget, MemoryBudgetExceeded, decoded_bytes
+from detector import PlantDetector
+from pipeline import Frame, RunContext
+
+
+def resize_stage():
+    return stages.ResizeStage(SimpleNamespace(preprocess_image=PlantDetector.preprocess_image))
+
+
+def grey_frames(count: int):
+    return [Frame(image=Image.new("L", (2000, 1000), 128)) for _ in range(count)]
+
+
+def with_budget(budget, fn):
+    original = stages.memory_budget
+    stages.memory_budget = budget
+    try:
+        return fn()
+    finally:
+        stages.memory_budget = original
+
+
+def test_reservation_split_and_shrink():
+    budget = MemoryBudget(1000)
+    batch = budget.reserve(600)
+    part = batch.split(200)
+    assert (batch.nbytes, part.nbytes, budget.in_use) == (400, 200, 600)
+    batch.shrink(100)
+    assert budget.in_use == 300
+    batch.release()
+    part.release()
+    assert budget.in_use == 0
+
+
+def test_resize_batch_never_waits_on_itself():
+    # The budget holds one image's working set; the batch is admitted as a whole instead of
+    # each later image waiting on the resized copies the earlier ones keep
+    per_image = stages.ResizeStage.bytes_needed(Image.new("L", (2000, 1000)))
+    budget = MemoryBudget(per_image, wait=5.0)
+    frames = grey_frames(3)
+    start = time.monotonic()
+    with_budget(budget, lambda: resize_stage().process_batch(frames, RunContext()))
+    assert time.monotonic() - start < 2.5 and budget.stats["waited"] == 0
+    kept = decoded_bytes((1280, 640), "RGB")
+    assert all(frame.image.size == (1280, 640) and frame.reservation.nbytes == kept for frame in frames)
+    assert budget.in_use == 3 * kept
+    for frame in frames:
+        frame.reservation.release()
+    assert budget.in_use == 0
+
+
+def test_resize_batch_rejected_without_holding_memory():
+    per_image = stages.ResizeStage.bytes_needed(Image.new("L", (2000, 1000)))
+    budget = MemoryBudget(2 * per_image, wait=0.1)
+    other = budget.reserve(per_image)
+    frames = grey_frames(2)
+    try:
+        with_budget(budget, lambda: resize_stage().process_batch(frames, RunContext()))
+    except MemoryBudgetExceeded:
+        pass
+    else:
+        raise AssertionError("batch larger than the free budget was admitted")
+    assert budget.in_use == per_image and all(frame.reservation is None for frame in frames)
+    other.release()
+
+
+TESTS = [
+    test_reservation_split_and_shrink,
+    test_resize_batch_never_waits_on_itself,
+    test_resize_batch_rejected_without_holding_memory,
+]
+
+
+def main():
+    print("🧪 Memory Budget Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
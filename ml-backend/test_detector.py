@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for test-time augmentation in the detector (detector.py)
+
+    python test_detector.py        # or: python -m pytest test_detector.py
+"""
+
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from PIL import Image, ImageDraw
+
+from detector import TTA_VARIANTS, PlantDetector
+from fusion import fusion_settings
+
+# An off-centre box, so a flip that is not undone lands somewhere else
+BOX = (100, 60, 300, 140)
+SIZE = (640, 480)
+
+
+class FakeBoxes:
+    def __init__(self, xyxy, confidence: float, class_id: int):
+        self.xyxy = torch.tensor([xyxy], dtype=torch.float32)
+        self.conf = torch.tensor([confidence])
+        self.cls = torch.tensor([float(class_id)])
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class FakeDetector(PlantDetector):
+    """PlantDetector without a model: "detects" the red rectangle in each image it is given"""
+
+    def __init__(self):
+        self.fusion = fusion_settings()
+        self.seen = []
+
+    def predict(self, images, **kwargs):
+        results = []
+        for image in images if isinstance(images, list) else [images]:
+            red = np.asarray(image)[..., 0] > 200
+            ys, xs = np.nonzero(red)
+            box = [xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]
+            self.seen.append(box)
+            results.append(SimpleNamespace(boxes=FakeBoxes(box, 0.9, 58), names={58: "potted plant"}))
+        return results
+
+
+def garden_image() -> Image.Image:
+    image = Image.new("RGB", SIZE, (60, 110, 50))
+    ImageDraw.Draw(image).rectangle([BOX[0], BOX[1], BOX[2] - 1, BOX[3] - 1], fill=(255, 0, 0))
+    return image
+
+
+def bbox(detection):
+    return [detection["bbox"][key] for key in ("x1", "y1", "x2", "y2")]
+
+
+def test_each_variant_maps_back_to_original_coordinates():
+    for scale, flip in TTA_VARIANTS:
+        detector = FakeDetector()
+        detections = detector.predict_tta(garden_image(), variants=((scale, flip),))
+        assert len(detections) == 1
+        assert np.allclose(bbox(detections[0]), BOX, atol=2.0), (scale, flip, bbox(detections[0]))
+        # The model really saw a transformed copy
+        x1 = round(SIZE[0] * scale) - BOX[2] * scale if flip else BOX[0] * scale
+        assert abs(detector.seen[0][0] - x1) <= 2, (scale, flip, detector.seen[0])
+
+
+def test_variants_fuse_into_one_box():
+    detector = FakeDetector()
+    detections = detector.predict_tta(garden_image())
+    assert len(detector.seen) == len(TTA_VARIANTS)
+    assert len(detections) == 1
+    assert np.allclose(bbox(detections[0]), BOX, atol=2.0), bbox(detections[0])
+    assert abs(detections[0]["confidence"] - 0.9) < 1e-6
+    assert detections[0]["label"] == "houseplant"
+
+
+TESTS = [
+    test_each_variant_maps_back_to_original_coordinates,
+    test_variants_fuse_into_one_box,
+]
+
+
+def main():
+    print("🧪 Detector TTA Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-class box fusion (fusion.py)
+
+    python test_fusion.py        # or: python -m pytest test_fusion.py
+"""
+
+import sys
+
+import numpy as np
+
+from fusion import box_iou, cluster_boxes, fuse_boxes
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [0, 0, 0, 0]], dtype=float)
+    iou = box_iou(a, b)
+    assert iou.shape == (2, 3)
+    assert np.allclose(iou[0], [1.0, 50 / 150, 0.0])
+    assert np.allclose(iou[1], 0.0)
+
+
+def test_cluster_boxes_keeps_best_of_each_group():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60], [0, 0, 9, 10]], dtype=float)
+    scores = np.array([0.6, 0.9, 0.5, 0.7])
+    keep, owner = cluster_boxes(boxes, scores, 0.5)
+    assert keep.tolist() == [1, 2]
+    assert owner.tolist() == [1, 1, 2, 1]
+
+
+def test_cluster_boxes_degenerate_and_empty():
+    keep, owner = cluster_boxes(np.zeros((0, 4)), np.zeros(0), 0.5)
+    assert len(keep) == 0 and len(owner) == 0
+    boxes = np.array([[5, 5, 5, 5], [5, 5, 5, 5]], dtype=float)  # zero area: overlap nothing
+    keep, owner = cluster_boxes(boxes, np.array([0.4, 0.8]), 0.5)
+    assert sorted(keep.tolist()) == [0, 1] and owner.tolist() == [0, 1]
+
+
+def test_wbf_averages_by_score():
+    boxes = np.array([[0, 0, 10, 10], [2, 0, 12, 10], [100, 100, 110, 110]], dtype=float)
+    scores = np.array([0.75, 0.25, 0.5])
+    fused = fuse_boxes(boxes, scores, iou_threshold=0.5, method="wbf")
+    assert fused["keep"].tolist() == [0, 2]
+    assert np.allclose(fused["boxes"][0], [0.5, 0, 10.5, 10])
+    assert np.allclose(fused["boxes"][1], boxes[2])
+    assert fused["scores"].tolist() == [0.75, 0.5]
+    assert fused["members"].tolist() == [2, 1]
+    assert fused["group"].tolist() == [0, 0, 1]
+
+
+def test_nms_keeps_original_boxes():
+    boxes = np.array([[0, 0, 10, 10], [2, 0, 12, 10]], dtype=float)
+    fused = fuse_boxes(boxes, np.array([0.3, 0.9]), iou_threshold=0.5, method="nms")
+    assert fused["keep"].tolist() == [1]
+    assert np.allclose(fused["boxes"], boxes[1:])
+
+
+def test_fuse_boxes_empty():
+    fused = fuse_boxes(np.zeros((0, 4)), np.zeros(0))
+    assert len(fused["boxes"]) == 0 and len(fused["group"]) == 0
+
+
+TESTS = [
+    test_box_iou,
+    test_cluster_boxes_keeps_best_of_each_group,
+    test_cluster_boxes_degenerate_and_empty,
+    test_wbf_averages_by_score,
+    test_nms_keeps_original_boxes,
+    test_fuse_boxes_empty,
+]
+
+
+def main():
+    print("🧪 Box Fusion Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for per-plant health indices (health.py)
+
+    python test_health.py        # or: python -m pytest test_health.py
+"""
+
+import sys
+
+import numpy as np
+from PIL import Image
+
+from health import CHANNELS, analyze_health, attach_health, box_sums, pixel_maps
+
+
+def test_box_sums_match_slicing():
+    rng = np.random.default_rng(0)
+    maps = rng.random((3, 20, 30)).astype(np.float32)
+    boxes = np.array([[0, 0, 30, 20], [5, 2, 6, 3], [10, 4, 25, 19]])
+    sums = box_sums(maps, boxes)
+    assert sums.shape == (3, 3)
+    for row, (x1, y1, x2, y2) in zip(sums, boxes):
+        assert np.allclose(row, maps[:, y1:y2, x1:x2].sum(axis=(1, 2)), rtol=1e-5)
+
+
+def test_pixel_maps_shape_and_green():
+    rgb = np.zeros((4, 6, 3), np.uint8)
+    rgb[:, :3] = (40, 160, 40)
+    maps = pixel_maps(rgb)
+    assert maps.shape == (len(CHANNELS), 4, 6) and maps.dtype == np.float32
+    green = maps[CHANNELS.index("green")]
+    assert green[:, :3].all() and not green[:, 3:].any()
+
+
+def test_analyze_health_scores_colours():
+    rgb = np.zeros((40, 60, 3), np.uint8)
+    rgb[:, :20] = (40, 160, 40)    # healthy green
+    rgb[:, 20:40] = (200, 180, 30)  # yellowing
+    rgb[:, 40:] = (128, 128, 128)  # grey: no foliage
+    results = analyze_health(rgb, np.array([[0, 0, 20, 40], [20, 0, 40, 40], [40, 0, 60, 40]], dtype=float))
+    healthy, yellow, grey = results
+    assert healthy["status"] == "healthy" and healthy["score"] == 100.0
+    assert healthy["greenRatio"] == 1.0 and healthy["indices"]["exg"] > 0
+    assert yellow["yellowingRatio"] == 1.0 and yellow["status"] == "stressed"
+    assert grey["status"] == "unknown" and grey["foliageFraction"] == 0.0
+
+
+def test_analyze_health_clips_boxes():
+    rgb = np.full((10, 10, 3), (40, 160, 40), np.uint8)
+    results = analyze_health(rgb, np.array([[-5, -5, 50, 50], [9.6, 9.6, 12, 12], [3, 3, 3, 3]]))
+    assert len(results) == 3
+    assert all(result["status"] == "healthy" for result in results)
+    assert analyze_health(rgb, np.zeros((0, 4))) == []
+
+
+def test_attach_health_downscales():
+    image = Image.new("RGB", (1000, 500), (40, 160, 40))
+    detections = [{"bbox": {"x1": 100, "y1": 100, "x2": 400, "y2": 300}}]
+    attach_health(image, detections)
+    assert detections[0]["health"]["status"] == "healthy"
+    attach_health(image, [])
+
+
+TESTS = [
+    test_box_sums_match_slicing,
+    test_pixel_maps_shape_and_green,
+    test_analyze_health_scores_colours,
+    test_analyze_health_clips_boxes,
+    test_attach_health_downscales,
+]
+
+
+def main():
+    print("🧪 Plant Health Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
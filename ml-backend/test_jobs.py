@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the job store and upload spool behind /api/jobs (jobs.py)
+
+    python test_jobs.py        # or: python -m pytest test_jobs.py
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from jobs import BlobStore, JobStore, content_hash
+
+MODEL = "yolov5s"
+
+
+def new_job(store: JobStore, names=("a.jpg", "b.jpg")) -> str:
+    items = [(content_hash(name.encode()), name) for name in names]
+    return store.create(image_url=names[0], image_metadata=[{"filename": name} for name in names],
+                        items=items, client_id="ip:1.2.3.4")
+
+
+def test_job_lifecycle():
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(str(Path(directory) / "jobs.db"))
+        job_id = new_job(store)
+        job = store.get(job_id)
+        assert (job["status"], job["progress"], job["clientId"]) == ("processing", 0, "ip:1.2.3.4")
+        assert job["imageMetadata"][1] == {"filename": "b.jpg"}
+        assert store.item_counts(job_id) == {"pending": 2, "running": 0, "completed": 0, "failed": 0}
+
+        first, second = store.items(job_id)
+        store.mark_item(job_id, 0, "running", attempts=1)
+        assert store.item_counts(job_id)["running"] == 1
+        assert store.complete_item(job_id, 0, first["contentHash"], MODEL, {"count": 1}) == (1, 2)
+        assert store.get(job_id)["progress"] == 0.5
+        store.mark_item(job_id, 1, "pending", attempts=1, error_message="timeout")
+        assert store.items(job_id)[1]["errorMessage"] == "timeout"
+        store.complete_item(job_id, 1, second["contentHash"], MODEL, {"count": 2})
+        assert store.item_results(job_id, MODEL) == [{"count": 1}, {"count": 2}]
+
+        store.complete(job_id, {"plants": []}, confidence=0.8, processing_time=120)
+        job = store.get(job_id)
+        assert job["status"] in JobStore.TERMINAL_STATUSES and job["progress"] == 1
+        assert job["yoloData"] == {"plants": []} and job["completedAt"]
+        assert store.get("missing") is None
+
+
+def test_failed_job():
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(str(Path(directory) / "jobs.db"))
+        job_id = new_job(store, ("a.jpg",))
+        store.mark_item(job_id, 0, "failed", attempts=3, error_message="bad image")
+        store.fail(job_id, "1 image(s) failed", processing_time=5)
+        job = store.get(job_id)
+        assert (job["status"], job["errorMessage"]) == ("failed", "1 image(s) failed")
+        assert store.resumable() == []
+
+
+def test_restart_recovery():
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "jobs.db")
+        store = JobStore(path)
+        resumable = new_job(store)
+        store.complete_item(resumable, 0, store.items(resumable)[0]["contentHash"], MODEL, {"count": 1})
+        legacy = store.create(image_url="old.jpg", image_metadata=[])  # no item manifest
+        done = new_job(store, ("c.jpg",))
+        store.complete(done, {}, confidence=0, processing_time=0)
+
+        restarted = JobStore(path)
+        assert restarted.recover_interrupted() == 1
+        legacy_job = restarted.get(legacy)
+        assert legacy_job["status"] == "failed" and "restart" in legacy_job["errorMessage"]
+        assert [job["id"] for job in restarted.resumable()] == [resumable]
+        # Finished items are not recomputed after the restart
+        first, second = restarted.items(resumable)
+        assert (first["status"], second["status"]) == ("completed", "pending")
+        assert restarted.cached_result(first["contentHash"], MODEL) == {"count": 1}
+        assert restarted.cached_result(first["contentHash"], "other-model") is None
+        assert restarted.get(done)["status"] == "completed"
+
+
+def test_shared_uploads_are_kept_until_every_job_finishes():
+    with tempfile.TemporaryDirectory() as directory:
+        store = JobStore(str(Path(directory) / "jobs.db"))
+        first = new_job(store, ("a.jpg", "b.jpg"))
+        new_job(store, ("b.jpg",))
+        store.complete(first, {}, confidence=0, processing_time=0)
+        assert store.releasable_hashes(first) == [content_hash(b"a.jpg")]
+
+
+def test_blob_store():
+    with tempfile.TemporaryDirectory() as directory:
+        blobs = BlobStore(directory)
+        key = content_hash(b"pixels")
+        blobs.put(key, b"pixels")
+        blobs.put(key, b"pixels")
+        assert blobs.get(key) == b"pixels"
+        assert [path.name for path in Path(directory).rglob("*") if path.is_file()] == [key]
+        blobs.delete(key)
+        blobs.delete(key)
+        assert blobs.get(key) is None
+
+
+TESTS = [
+    test_job_lifecycle,
+    test_failed_job,
+    test_restart_recovery,
+    test_shared_uploads_are_kept_until_every_job_finishes,
+    test_blob_store,
+]
+
+
+def main():
+    print("🧪 Job Store Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the garden layout engine (layout.py)
+
+    python test_layout.py        # or: python -m pytest test_layout.py
+"""
+
+import sys
+
+import numpy as np
+
+from layout import SPACING_M, GroundProjection, build_layout, resolve_collisions
+
+IMAGE_INFO = {"width": 640, "height": 480}
+
+
+def detection(x1, y1, x2, y2, category="herb", label="basil", confidence=0.8):
+    return {"bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1},
+            "label": label, "category": category, "confidence": confidence, "scientific_name": "Ocimum basilicum"}
+
+
+def clustered_detections(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    detections = []
+    for x, y in rng.uniform([250, 200], [350, 280], size=(count, 2)):
+        detections.append(detection(x - 10, y - 15, x + 10, y + 15))
+    # A few crowding the image edges
+    detections += [detection(0, 450, 15, 480), detection(2, 455, 20, 480), detection(620, 0, 640, 20)]
+    return detections
+
+
+def positions_and_radii(layout):
+    plants = layout["plants"]
+    positions = np.array([[p["position"]["x"], p["position"]["y"]] for p in plants])
+    radius = np.array([p["footprint"]["radius"] for p in plants])
+    return positions, radius
+
+
+def test_layout_has_no_overlaps_and_stays_in_bounds():
+    layout = build_layout(clustered_detections(30), IMAGE_INFO)
+    positions, radius = positions_and_radii(layout)
+    i, j = np.triu_indices(len(positions), k=1)
+    gaps = np.hypot(*(positions[i] - positions[j]).T) - (radius[i] + radius[j])
+    assert gaps.min() > -5e-3, gaps.min()  # positions are rounded to millimetres
+    width, depth = layout["dimensions"]["width"], layout["dimensions"]["depth"]
+    assert (positions >= 0).all() and (positions[:, 0] <= width).all() and (positions[:, 1] <= depth).all()
+    stats = layout["metadata"]["processingStats"]
+    assert stats["plantsPlaced"] == 33 and stats["initialCollisions"] > 0
+    assert stats["resolutionIterations"] < 50
+    assert layout["recommendations"][0]["type"] == "spacing"
+
+
+def test_footprints_respect_category_spacing():
+    layout = build_layout([detection(100, 100, 104, 104, "tree", "ginkgo"), detection(300, 100, 500, 300)],
+                          IMAGE_INFO, ground_width_m=6.4)
+    tree, herb = layout["plants"]
+    assert tree["footprint"]["radius"] == SPACING_M["tree"] / 2
+    assert herb["footprint"]["radius"] == herb["footprint"]["canopy"] / 2 == 1.0
+    # Bottom-centre anchor at 1 cm per pixel
+    assert herb["position"] == {"x": 4.0, "y": 3.0, "z": 0}
+
+
+def test_homography_projection():
+    # Ground is twice as wide as the pixels suggest and shifted by (1, 2) metres
+    homography = [[0.02, 0, 1], [0, 0.01, 2], [0, 0, 1]]
+    projection = GroundProjection(640, 480, homography=homography)
+    assert np.allclose(projection.to_ground(np.array([[100.0, 100.0]])), [[3.0, 3.0]])
+    low, high = projection.bounds()
+    assert np.allclose(low, [1, 2]) and np.allclose(high, [13.8, 6.8])
+    layout = build_layout([detection(90, 90, 110, 110)], IMAGE_INFO, homography=homography, anchor="center")
+    assert layout["plants"][0]["position"] == {"x": 3.0, "y": 3.0, "z": 0}
+    assert layout["projection"]["type"] == "homography"
+
+
+def test_coincident_plants_are_separated():
+    positions, initial, _ = resolve_collisions(np.array([[1.0, 1.0]] * 3), np.full(3, 0.2),
+                                               np.array([0.0, 0.0]), np.array([4.0, 3.0]))
+    assert initial == 3
+    i, j = np.triu_indices(3, k=1)
+    assert (np.hypot(*(positions[i] - positions[j]).T) >= 0.4 - 2e-3).all()
+
+
+def test_empty_layout():
+    layout = build_layout([], IMAGE_INFO)
+    assert layout["plants"] == [] and layout["confidence"] == 0.0 and layout["recommendations"] == []
+    assert layout["dimensions"]["width"] == 4.0 and layout["dimensions"]["depth"] == 3.0
+
+
+TESTS = [
+    test_layout_has_no_overlaps_and_stays_in_bounds,
+    test_footprints_respect_category_spacing,
+    test_homography_projection,
+    test_coincident_plants_are_separated,
+    test_empty_layout,
+]
+
+
+def main():
+    print("🧪 Garden Layout Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for segmentation mask helpers (masks.py)
+
+    python test_masks.py        # or: python -m pytest test_masks.py
+"""
+
+import sys
+
+import numpy as np
+
+from masks import (coverage_metrics, counts_to_string, decode_rle, encode_rle, mask_polygons, mask_shape,
+                   resize_masks, string_to_counts, unletterbox)
+
+
+def test_rle_round_trip():
+    rng = np.random.default_rng(0)
+    for shape in ((1, 1), (7, 5), (64, 48)):
+        for mask in (rng.random(shape) > 0.5, np.zeros(shape, bool), np.ones(shape, bool)):
+            rle = encode_rle(mask)
+            assert rle["size"] == list(shape)
+            assert np.array_equal(decode_rle(rle), mask)
+
+
+def test_rle_matches_coco():
+    # Column-major runs that always start with background, as pycocotools writes them
+    assert encode_rle(np.zeros((2, 2), bool))["counts"] == "4"
+    assert encode_rle(np.ones((2, 2), bool))["counts"] == "04"
+    mask = np.array([[0, 1], [0, 1]], bool)
+    assert string_to_counts(encode_rle(mask)["counts"]) == [2, 2]
+    assert np.array_equal(decode_rle({"size": [2, 2], "counts": [2, 2]}), mask)
+
+
+def test_counts_string_round_trip():
+    counts = [0, 3, 1000, 2, 70000, 1, 5]
+    assert string_to_counts(counts_to_string(counts)) == counts
+
+
+def test_decode_rle_rejects_wrong_size():
+    # Oversized totals (including ones that wrap around in int64) are rejected before anything is allocated
+    for rle in ({"size": [3, 3], "counts": [4]}, {"size": [1, 1], "counts": [0, 10 ** 13]},
+                {"size": [2, 2], "counts": [2 ** 62, 2 ** 62, 2 ** 62, 2 ** 62 + 4]},
+                {"size": [2, 2], "counts": [5, -1]}, {"size": [2, 2], "counts": [2 ** 70]},
+                {"size": [2, 2], "counts": [[1, 3]]}, {"size": [-2, -2], "counts": [4]}):
+        try:
+            decode_rle(rle)
+        except ValueError:
+            continue
+        raise AssertionError(f"{rle} was accepted")
+
+
+def test_mask_polygons():
+    mask = np.zeros((20, 20), bool)
+    mask[5:15, 4:10] = True
+    polygons = mask_polygons(mask, scale=2.0)
+    assert len(polygons) == 1
+    xs, ys = polygons[0][0::2], polygons[0][1::2]
+    assert (min(xs), max(xs), min(ys), max(ys)) == (8.0, 18.0, 10.0, 28.0)
+
+
+def test_resize_masks():
+    masks = np.zeros((3, 10, 20), bool)
+    masks[1, :, :10] = True
+    resized = resize_masks(masks, (40, 20))
+    assert resized.shape == (3, 20, 40)
+    assert resized[1, :, :18].all() and not resized[1, :, 22:].any()
+    assert resize_masks(np.zeros((0, 10, 20), bool), (40, 20)).shape == (0, 20, 40)
+
+
+def test_unletterbox_and_mask_shape():
+    # A 200x100 image letterboxed into 64x64 leaves 16 rows of padding above and below
+    masks = np.zeros((1, 64, 64), bool)
+    assert unletterbox(masks, (200, 100)).shape == (1, 32, 64)
+    assert mask_shape((1000, 500), 256) == (256, 128)
+    assert mask_shape((100, 50), 256) == (100, 50)
+
+
+def test_coverage_metrics():
+    rgb = np.zeros((10, 10, 3), np.uint8)
+    rgb[:, :5] = (20, 200, 20)  # green left half
+    masks = np.zeros((2, 10, 10), bool)
+    masks[0, :, :6] = True
+    masks[1, :, 4:8] = True
+    metrics = coverage_metrics(masks, rgb, scale=2.0)
+    assert metrics["areas"].tolist() == [240.0, 160.0]
+    assert metrics["leaf_areas"].tolist() == [200.0, 40.0]
+    summary = metrics["summary"]
+    assert summary["canopyCoverage"] == 0.8 and summary["leafCoverage"] == 0.5
+    assert summary["overlapArea"] == 80.0
+
+
+def test_coverage_metrics_without_masks():
+    metrics = coverage_metrics(np.zeros((0, 10, 10), bool), np.zeros((10, 10, 3), np.uint8), scale=1.0)
+    assert len(metrics["areas"]) == 0
+    assert metrics["summary"]["canopyCoverage"] == 0.0
+
+
+TESTS = [
+    test_rle_round_trip,
+    test_rle_matches_coco,
+    test_counts_string_round_trip,
+    test_decode_rle_rejects_wrong_size,
+    test_mask_polygons,
+    test_resize_masks,
+    test_unletterbox_and_mask_shape,
+    test_coverage_metrics,
+    test_coverage_metrics_without_masks,
+]
+
+
+def main():
+    print("🧪 Mask Helper Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-behind analysis writer (persistence.py)
+
+    python test_persistence.py        # or: python -m pytest test_persistence.py
+"""
+
+import sys
+import time
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from persistence import AnalysisWriter
+
+# The ai_analyses table as Prisma creates it (prisma/schema.prisma, model AIAnalysis)
+AI_ANALYSES_SCHEMA = """
+    CREATE TABLE "ai_analyses" (
+        "id" TEXT NOT NULL PRIMARY KEY,
+        "imageUrl" TEXT NOT NULL,
+        "imageMetadata" TEXT,
+        "plantNetData" TEXT,
+        "yoloData" TEXT,
+        "samData" TEXT,
+        "gardenLayout" TEXT NOT NULL,
+        "confidence" REAL NOT NULL,
+        "processingTime" INTEGER NOT NULL,
+        "status" TEXT NOT NULL DEFAULT 'processing',
+        "errorMessage" TEXT,
+        "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        "completedAt" DATETIME
+    )
+"""
+
+
+def prisma_db(directory: str) -> str:
+    path = str(Path(directory) / "dev.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(AI_ANALYSES_SCHEMA)
+    return path
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_flushes_into_prisma_schema():
+    with tempfile.TemporaryDirectory() as directory:
+        path = prisma_db(directory)
+        writer = AnalysisWriter(path, flush_interval_ms=20)
+        writer.start()
+        try:
+            writer.enqueue("garden.jpg", {"width": 640}, {"plants": [{"label": "basil"}]}, 0.8, 120)
+            writer.enqueue("broken.jpg", None, None, 0.0, 5, status="failed", error_message="bad image")
+            wait_for(lambda: writer.stats["written"] == 2)
+            failed, completed = sorted(writer.recent(), key=lambda analysis: analysis["imageUrl"])
+        finally:
+            writer.stop()
+        assert completed["yoloData"] == {"plants": [{"label": "basil"}]}
+        assert completed["imageMetadata"] == {"width": 640} and completed["gardenLayout"] == {}
+        assert (completed["status"], completed["confidence"], completed["processingTime"]) == ("completed", 0.8, 120)
+        # Prisma stores SQLite DateTime as epoch milliseconds
+        assert completed["completedAt"] - completed["createdAt"] == 120
+        assert (failed["status"], failed["errorMessage"], failed["yoloData"]) == ("failed", "bad image", None)
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_batches_and_final_flush():
+    with tempfile.TemporaryDirectory() as directory:
+        path = prisma_db(directory)
+        # Never flushes on its own within the test: everything is written by stop()
+        writer = AnalysisWriter(path, flush_interval_ms=60000, max_batch=4)
+        writer.start()
+        for i in range(10):
+            writer.enqueue(f"{i}.jpg", None, {"count": i}, 0.5, 1)
+        assert writer.stats["written"] == 0
+        writer.stop()
+        assert writer.stats == {"written": 10, "dropped": 0, "batches": 3, "errors": 0}
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ai_analyses").fetchone()[0] == 10
+
+
+def test_full_queue_drops_instead_of_blocking():
+    with tempfile.TemporaryDirectory() as directory:
+        writer = AnalysisWriter(prisma_db(directory), max_queue=2)
+        for i in range(5):
+            writer.enqueue(f"{i}.jpg", None, None, 0.0, 0)
+        assert writer.stats["dropped"] == 3
+        writer.start()
+        writer.stop()
+        assert writer.stats["written"] == 2
+
+
+def test_write_errors_are_counted():
+    with tempfile.TemporaryDirectory() as directory:
+        writer = AnalysisWriter(str(Path(directory) / "empty.db"))  # no ai_analyses table
+        writer.start()
+        writer.enqueue("a.jpg", None, None, 0.0, 0)
+        writer.stop()
+        assert writer.stats["errors"] == 1 and writer.stats["written"] == 0
+
+
+TESTS = [
+    test_flushes_into_prisma_schema,
+    test_batches_and_final_flush,
+    test_full_queue_drops_instead_of_blocking,
+    test_write_errors_are_counted,
+]
+
+
+def main():
+    print("🧪 Analysis Persistence Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
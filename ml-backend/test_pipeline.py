@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for the stage pipeline runner (pipeline.py)
+
+    python test_pipeline.py        # or: python -m pytest test_pipeline.py
+"""
+
+import os
+import sys
+
+from buffers import MemoryBudget
+from deadlines import Deadline, DeadlineExceeded, RequestCancelled
+from pipeline import (STAGES, Frame, Pipeline, RunContext, Stage, build_pipelines, pipeline_config,
+                      register_stage)
+
+
+class Step(Stage):
+    """Appends its name to the frame's trace; ``action`` runs first"""
+
+    def __init__(self, name, requires=(), provides=(), action=None, **dependencies):
+        super().__init__(**dependencies)
+        self.name, self.requires, self.provides, self.action = name, requires, provides, action
+
+    def process(self, frame: Frame, context: RunContext):
+        if self.action:
+            self.action(frame, context)
+        frame.extras.setdefault("trace", []).append(self.name)
+
+
+def expire(frame, context):
+    context.deadline.expires_at = 0.0
+
+
+def disconnect(frame, context):
+    context.deadline.cancel("disconnect")
+
+
+def fail(frame, context):
+    raise RuntimeError("model crashed")
+
+
+def reserving_pipeline(budget, middle):
+    def reserve(frame, context):
+        frame.reservation = budget.reserve(100)
+
+    return Pipeline("test", [Step("decode", ("contents",), ("image",), reserve),
+                             Step("infer", ("image",), ("detections",), middle),
+                             Step("respond", ("detections",), ("response",))])
+
+
+def run_expecting(pipeline, frames, context, exception):
+    try:
+        pipeline.run_batch(frames, context)
+    except exception as e:
+        return e
+    raise AssertionError(f"{exception.__name__} not raised")
+
+
+def test_stages_run_in_order_over_the_batch():
+    calls = []
+    pipeline = Pipeline("test", [Step("a", provides=("image",)), Step("b", ("image",), ("detections",)),
+                                 Step("c", ("detections",), ("response",))],
+                        hooks=[lambda *args: calls.append((args[0], args[1], args[3]))])
+    frames = pipeline.run_batch([Frame(contents=b"1"), Frame(contents=b"2")], RunContext())
+    assert [frame.extras["trace"] for frame in frames] == [["a", "b", "c"]] * 2
+    assert calls == [("test", "a", 2), ("test", "b", 2), ("test", "c", 2)]
+
+
+def test_pipeline_is_checked_when_built():
+    for stages, message in (([Step("b", ("image",), ("response",))], "needs ['image']"),
+                            ([Step("a", provides=("bogus",))], "unknown frame fields"),
+                            ([Step("a", provides=("image",))], "never provides")):
+        try:
+            Pipeline("bad", stages)
+        except ValueError as e:
+            assert message in str(e), e
+        else:
+            raise AssertionError(f"pipeline accepted: {message}")
+
+
+def test_deadline_stops_before_the_next_stage():
+    budget = MemoryBudget(1000)
+    frames = [Frame(contents=b"1"), Frame(contents=b"2")]
+    error = run_expecting(reserving_pipeline(budget, expire), frames, RunContext(deadline=Deadline(60)),
+                          DeadlineExceeded)
+    assert error.stage == "respond" and error.status_code == 504
+    assert all(frame.extras["trace"] == ["decode", "infer"] for frame in frames)
+    assert budget.in_use == 0
+
+
+def test_cancellation_propagates():
+    budget = MemoryBudget(1000)
+    frames = [Frame(contents=b"1")]
+    error = run_expecting(reserving_pipeline(budget, disconnect), frames, RunContext(), RequestCancelled)
+    assert (error.reason, error.stage, error.status_code) == ("disconnect", "respond", 499)
+    assert frames[0].response is None and budget.in_use == 0
+    # Already cancelled: nothing runs at all
+    deadline = Deadline()
+    deadline.cancel("disconnect")
+    frames = [Frame(contents=b"1")]
+    error = run_expecting(reserving_pipeline(budget, None), frames, RunContext(deadline=deadline), RequestCancelled)
+    assert error.stage == "decode" and "trace" not in frames[0].extras
+
+
+def test_stage_failure_releases_reservations():
+    budget = MemoryBudget(1000)
+    frames = [Frame(contents=b"1"), Frame(contents=b"2")]
+    run_expecting(reserving_pipeline(budget, fail), frames, RunContext(), RuntimeError)
+    assert budget.in_use == 0
+
+
+def test_config_and_registry():
+    original = dict(os.environ)
+    try:
+        os.environ["PIPELINE_DETECT"] = "decode, test-respond"
+        config = pipeline_config({"detect": ["decode", "resize", "infer"], "segment": ["decode", "segment"]})
+        assert config == {"detect": ["decode", "test-respond"], "segment": ["decode", "segment"]}
+    finally:
+        os.environ.clear()
+        os.environ.update(original)
+
+    @register_stage
+    class Respond(Stage):
+        name = "test-respond"
+        requires = ("contents",)
+        provides = ("response",)
+
+        def process(self, frame, context):
+            frame.response = {"bytes": len(frame.contents), "detector": self.detector}
+
+    try:
+        pipelines = build_pipelines({"detect": ["test-respond"]}, detector="fake")
+        assert pipelines["detect"].run(Frame(contents=b"abc"), RunContext()).response == {"bytes": 3, "detector": "fake"}
+        try:
+            build_pipelines({"detect": ["test-respond", "nope"]})
+        except ValueError as e:
+            assert "nope" in str(e)
+        else:
+            raise AssertionError("unknown stage accepted")
+    finally:
+        STAGES.pop("test-respond")
+
+
+TESTS = [
+    test_stages_run_in_order_over_the_batch,
+    test_pipeline_is_checked_when_built,
+    test_deadline_stops_before_the_next_stage,
+    test_cancellation_propagates,
+    test_stage_failure_releases_reservations,
+    test_config_and_registry,
+]
+
+
+def main():
+    print("🧪 Pipeline Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
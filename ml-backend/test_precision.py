@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for CPU precision mode selection (precision.py)
+A stub network and detect callable stand in for the predictor, so no weights are needed
+
+    python test_precision.py        # or: python -m pytest test_precision.py
+"""
+
+import sys
+
+import numpy as np
+import torch
+
+from precision import MODES, detection_agreement, select_precision_mode
+
+BOXES = np.array([[0, 0, 10, 10], [20, 20, 40, 40], [50, 0, 60, 30]], dtype=float)
+CLASSES = np.array([0.0, 1.0, 0.0])
+
+
+def test_detection_agreement():
+    reference = (BOXES, CLASSES)
+    assert detection_agreement(reference, reference) == 1.0
+    assert detection_agreement(reference, (BOXES + 1, CLASSES)) == 1.0  # small shifts still match
+    assert detection_agreement(reference, (BOXES[:2], CLASSES[:2])) == 2 / 3
+    assert detection_agreement(reference, (BOXES, np.array([0.0, 0.0, 0.0]))) == 2 / 3
+    extra = (np.vstack([BOXES, [[70, 70, 80, 80]]]), np.append(CLASSES, 2.0))
+    assert detection_agreement(reference, extra) == 3 / 4
+    empty = (np.zeros((0, 4)), np.zeros(0))
+    assert detection_agreement(empty, empty) == 1.0
+    assert detection_agreement(reference, empty) == 0.0
+
+
+def test_each_box_matches_once():
+    reference = (np.array([[0, 0, 10, 10], [0, 0, 10, 10]], dtype=float), np.array([0.0, 0.0]))
+    assert detection_agreement(reference, (reference[0][:1], reference[1][:1])) == 0.5
+
+
+def test_forced_mode_skips_benchmark():
+    net = torch.nn.Conv2d(3, 4, 3)
+    calls = []
+    selection = select_precision_mode(net, lambda: calls.append(1), requested="channels_last")
+    assert selection["mode"] == "channels_last" and selection["selected_by"] == "config" and not calls
+    assert net.weight.is_contiguous(memory_format=torch.channels_last)
+    assert select_precision_mode(net, lambda: None, requested="fp64")["mode"] == "fp32"
+
+
+def test_benchmark_keeps_fp32_without_detections():
+    net = torch.nn.Conv2d(3, 4, 3)
+    selection = select_precision_mode(net, lambda: (np.zeros((0, 4)), np.zeros(0)), min_speedup=0.0,
+                                      iterations=1)
+    assert selection["mode"] == "fp32" and selection["selected_by"] == "benchmark"
+    assert set(selection["candidates"]) == set(MODES)
+
+
+def test_benchmark_rejects_disagreeing_modes():
+    net = torch.nn.Conv2d(3, 4, 3)
+
+    def detect():
+        # Channels-last "loses" a detection, so only modes without it may win
+        if net.weight.is_contiguous(memory_format=torch.channels_last) and not net.weight.is_contiguous():
+            return BOXES[:1], CLASSES[:1]
+        return BOXES, CLASSES
+
+    selection = select_precision_mode(net, detect, min_speedup=0.0, iterations=1)
+    assert not MODES[selection["mode"]].channels_last
+    assert selection["candidates"]["channels_last"]["agreement"] == round(1 / 3, 4)
+
+
+TESTS = [
+    test_detection_agreement,
+    test_each_box_matches_once,
+    test_forced_mode_skips_benchmark,
+    test_benchmark_keeps_fp32_without_detections,
+    test_benchmark_rejects_disagreeing_modes,
+]
+
+
+def main():
+    print("🧪 Precision Mode Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
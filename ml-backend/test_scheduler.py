@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for the fair inference scheduler (scheduler.py)
+
+    python test_scheduler.py        # or: python -m pytest test_scheduler.py
+"""
+
+import sys
+import threading
+from types import SimpleNamespace
+
+import scheduler
+from scheduler import (BULK, INTERACTIVE, InferenceScheduler, LaneConfig, RateLimitExceeded, RequestTooLarge,
+                       TokenBucket, client_identity)
+
+
+def connection(host, **headers):
+    return SimpleNamespace(client=SimpleNamespace(host=host) if host else None,
+                           headers={key.replace("_", "-"): value for key, value in headers.items()})
+
+
+def limits(rate: float = 1.0, burst: float = 2.0):
+    return {INTERACTIVE: LaneConfig(rate, burst), BULK: LaneConfig(rate, burst)}
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2.0, burst=4.0)
+    now = bucket.updated
+    assert bucket.try_acquire(3, now) and not bucket.try_acquire(2, now)
+    assert bucket.retry_after(2) == 0.5
+    assert bucket.try_acquire(2, now + 0.5)
+    assert bucket.try_acquire(4, now + 100)  # refill is capped at the burst
+    assert not bucket.try_acquire(1, now + 100)
+    assert bucket.retry_after(5) == float("inf")
+    assert bucket.full_at() == now + 102
+
+
+def test_rate_limit_per_client_and_lane():
+    pool = InferenceScheduler(workers=1, lane_configs=limits())
+    try:
+        pool.admit("a", INTERACTIVE, 2)
+        pool.admit("a", BULK, 2)
+        pool.admit("b", INTERACTIVE, 2)
+        try:
+            pool.admit("a", INTERACTIVE, 1)
+        except RateLimitExceeded as e:
+            assert e.client_id == "a" and e.lane == INTERACTIVE and 0 < e.retry_after <= 1
+        else:
+            raise AssertionError("over-limit request was admitted")
+    finally:
+        pool.shutdown()
+
+
+def test_request_larger_than_burst_is_rejected_outright():
+    pool = InferenceScheduler(workers=1, lane_configs=limits(burst=2.0))
+    try:
+        try:
+            pool.admit("a", BULK, 3)
+        except RequestTooLarge as e:
+            assert e.lane == BULK and e.cost == 3 and e.burst == 2.0
+        else:
+            raise AssertionError("request larger than the burst was admitted")
+        # Nothing was charged, so a request that fits still goes through
+        pool.admit("a", BULK, 2)
+    finally:
+        pool.shutdown()
+
+
+def test_idle_buckets_are_swept():
+    pool = InferenceScheduler(workers=1, lane_configs=limits(rate=1000.0))
+    try:
+        for i in range(50):
+            pool.admit(f"client-{i}", INTERACTIVE, 1)
+        assert len(pool.buckets) == 50
+        pool._sweep_buckets(max(bucket.full_at() for bucket in pool.buckets.values()))
+        assert pool.buckets == {}
+        # A drained bucket that has not refilled yet is kept
+        pool.admit("busy", INTERACTIVE, 2)
+        pool._sweep_buckets(pool.buckets[("busy", INTERACTIVE)].updated)
+        assert list(pool.buckets) == [("busy", INTERACTIVE)]
+    finally:
+        pool.shutdown()
+
+
+def test_work_runs_and_interactive_goes_first():
+    started, gate = threading.Event(), threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        gate.wait()
+
+    pool = InferenceScheduler(workers=1, lane_configs=limits(burst=100), interactive_burst=2)
+    try:
+        # Occupy the only worker so everything below is queued before scheduling starts
+        blocker = pool.submit_for("x", BULK, block)
+        assert started.wait(5)
+        futures = [pool.submit_for("x", BULK, order.append, "bulk")]
+        futures += [pool.submit_for("y", INTERACTIVE, order.append, f"interactive-{i}") for i in range(3)]
+        gate.set()
+        for future in [blocker] + futures:
+            future.result(timeout=5)
+        assert order == ["interactive-0", "interactive-1", "bulk", "interactive-2"]
+    finally:
+        pool.shutdown()
+
+
+def test_client_identity_ignores_headers_from_untrusted_peers():
+    spoofed = connection("203.0.113.9", x_user_id="admin", x_api_key="k", x_forwarded_for="10.0.0.1")
+    assert client_identity(spoofed) == "ip:203.0.113.9"
+    assert client_identity(connection(None)) == "ip:unknown"
+
+
+def test_client_identity_behind_trusted_proxy():
+    assert client_identity(connection("127.0.0.1", x_user_id="42", x_api_key="k")) == "user:42"
+    assert client_identity(connection("127.0.0.1", x_api_key="k")).startswith("key:")
+    # The client may prepend anything to X-Forwarded-For; the proxy appends the real peer
+    chain = connection("127.0.0.1", x_forwarded_for="6.6.6.6, 198.51.100.7, ::1")
+    assert client_identity(chain) == "ip:198.51.100.7"
+    assert client_identity(connection("::1")) == "ip:::1"
+
+
+def test_trusted_proxy_networks():
+    original = scheduler.trusted_proxies
+    try:
+        scheduler.trusted_proxies = scheduler.parse_networks("10.0.0.0/8, not-an-ip, ")
+        assert len(scheduler.trusted_proxies) == 1
+        assert client_identity(connection("10.1.2.3", x_user_id="7")) == "user:7"
+        assert client_identity(connection("127.0.0.1", x_user_id="7")) == "ip:127.0.0.1"
+    finally:
+        scheduler.trusted_proxies = original
+
+
+TESTS = [
+    test_token_bucket,
+    test_rate_limit_per_client_and_lane,
+    test_request_larger_than_burst_is_rejected_outright,
+    test_idle_buckets_are_swept,
+    test_work_runs_and_interactive_goes_first,
+    test_client_identity_ignores_headers_from_untrusted_peers,
+    test_client_identity_behind_trusted_proxy,
+    test_trusted_proxy_networks,
+]
+
+
+def main():
+    print("🧪 Scheduler Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact columnar response formats (serialization.py)
+Checks needing orjson or msgpack are skipped when the optional package is missing
+
+    python test_serialization.py        # or: python -m pytest test_serialization.py
+"""
+
+import sys
+import json
+
+import numpy as np
+
+import serialization
+from serialization import SpeciesTable, encode_compact, negotiate_format, to_columnar
+
+
+def plant(label: str, x1: float, confidence: float, **extra):
+    return {"label": label, "category": "herb", "properties": ["digestive"], "scientific_name": f"{label} sp.",
+            "bbox": {"x1": x1, "y1": 2.0, "x2": x1 + 10, "y2": 12.0}, "confidence": confidence, **extra}
+
+
+def response(*plants):
+    return {"plants": list(plants), "count": len(plants), "image_info": {"width": 100, "height": 80}}
+
+
+def test_negotiate_format():
+    assert negotiate_format(None) == "json"
+    assert negotiate_format("application/json") == "json"
+    if serialization.msgpack is not None:
+        assert negotiate_format("application/x-msgpack, */*") == "msgpack"
+    if serialization.orjson is not None:
+        assert negotiate_format("Application/Vnd.Plant-Detection.Compact+JSON") == "compact"
+
+
+def test_species_table_assigns_ids_once():
+    species = SpeciesTable()
+    assert [species.id_for(plant(label, 0, 0.5)) for label in ("mint", "basil", "mint")] == [0, 1, 0]
+    assert [entry["label"] for entry in species.entries] == ["mint", "basil"]
+    assert set(species.entries[0]) == set(serialization.SPECIES_FIELDS)
+
+
+def test_to_columnar_text():
+    species = SpeciesTable()
+    columns = to_columnar(response(plant("mint", 1.04, 0.91234), plant("sage", 20, 0.5, track_id=7)),
+                          species, binary=False)
+    assert columns["species_id"] == [0, 1]
+    assert columns["boxes"] == [1.0, 2.0, 11.0, 12.0, 20.0, 2.0, 30.0, 12.0]
+    assert np.allclose(columns["confidence"], [0.9123, 0.5])  # float32 values, rounded to 4 places
+    assert columns["track_id"] == [None, 7]
+    assert columns["count"] == 2
+
+
+def test_to_columnar_binary():
+    columns = to_columnar(response(plant("mint", 1.5, 0.25)), SpeciesTable(), binary=True)
+    assert np.frombuffer(columns["boxes"], "<f4").tolist() == [1.5, 2.0, 11.5, 12.0]
+    assert np.frombuffer(columns["confidence"], "<f4").tolist() == [0.25]
+
+
+def test_to_columnar_no_plants():
+    columns = to_columnar(response(), SpeciesTable(), binary=False)
+    assert columns["boxes"] == [] and columns["species_id"] == []
+
+
+def test_encode_compact_shares_species():
+    if serialization.orjson is None:
+        return
+    results = [response(plant("mint", 0, 0.9)), response(plant("mint", 5, 0.8), plant("thyme", 9, 0.7))]
+    document = json.loads(encode_compact(results, "compact"))
+    assert document["format"] == "columnar-v1"
+    assert [entry["label"] for entry in document["species"]] == ["mint", "thyme"]
+    assert [image["species_id"] for image in document["images"]] == [[0], [0, 1]]
+
+
+def test_encode_msgpack():
+    if serialization.msgpack is None:
+        return
+    document = serialization.msgpack.unpackb(encode_compact([response(plant("mint", 3, 0.5))], "msgpack"))
+    boxes = np.frombuffer(document["images"][0]["boxes"], "<f4")
+    assert boxes.tolist() == [3.0, 2.0, 13.0, 12.0]
+
+
+TESTS = [
+    test_negotiate_format,
+    test_species_table_assigns_ids_once,
+    test_to_columnar_text,
+    test_to_columnar_binary,
+    test_to_columnar_no_plants,
+    test_encode_compact_shares_species,
+    test_encode_msgpack,
+]
+
+
+def main():
+    print("🧪 Response Serialization Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the garden spatial index (spatial.PointIndex)
+Each query is checked against a brute-force scan of the same points
+
+    python test_spatial.py        # or: python -m pytest test_spatial.py
+"""
+
+import sys
+import math
+
+import numpy as np
+
+from spatial import MAX_COORDINATE, PointIndex, grid_pairs
+
+
+def brute_nearest(xy: np.ndarray, x: float, y: float, k: int) -> np.ndarray:
+    return np.sort(np.hypot(xy[:, 0] - x, xy[:, 1] - y))[:k]
+
+
+def random_index(n: int = 500, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(-50, 50, size=(n, 2))
+    index = PointIndex()
+    index.bulk_load([f"p{i}" for i in range(n)], xy)
+    return index, xy
+
+
+def test_within_matches_brute_force():
+    index, xy = random_index()
+    slots = index.within(-10, -20, 15, 5)
+    expected = np.flatnonzero((xy[:, 0] >= -10) & (xy[:, 0] <= 15) & (xy[:, 1] >= -20) & (xy[:, 1] <= 5))
+    assert sorted(index.ids[s] for s in slots) == sorted(f"p{i}" for i in expected)
+
+
+def test_radius_is_sorted_and_complete():
+    index, xy = random_index()
+    slots, distances = index.radius(3, -4, 12)
+    expected = np.hypot(xy[:, 0] - 3, xy[:, 1] + 4)
+    assert len(slots) == int((expected <= 12).sum())
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_nearest_matches_brute_force():
+    index, xy = random_index()
+    for x, y, k in ((0, 0, 1), (40, -45, 7), (500, 500, 3), (-3, 2, 500)):
+        _, distances = index.nearest(x, y, k)
+        assert np.allclose(distances, brute_nearest(xy, x, y, k))
+
+
+def test_incremental_updates():
+    index, xy = random_index(n=100)
+    index.upsert("p0", 1000, 1000)
+    index.upsert("new", 0.5, 0.5)
+    assert index.remove("p1")
+    assert not index.remove("missing")
+    slots, distances = index.nearest(1000, 1000, 1)
+    assert index.ids[slots[0]] == "p0" and distances[0] == 0
+    assert "p1" not in index and "new" in index
+    assert len(index) == 100
+    # Enough changes to force a rebuild keeps every answer intact
+    for i in range(2, 60):
+        index.upsert(f"p{i}", -float(i), float(i))
+    slots, _ = index.nearest(-59, 59, 1)
+    assert index.ids[slots[0]] == "p59"
+    assert index.stats()["rebuilds"] >= 2
+
+
+def test_points_on_a_line():
+    index = PointIndex()
+    index.bulk_load(list(range(1000)), np.column_stack([np.arange(1000.0), np.zeros(1000)]))
+    assert index.stats()["cells"] > 10
+    slots, _ = index.nearest(500.2, 0, 3)
+    assert sorted(index.ids[s] for s in slots) == [499, 500, 501]
+
+
+def test_rejects_invalid_coordinates():
+    index, _ = random_index(n=10)
+    for value in (math.nan, math.inf, -math.inf, MAX_COORDINATE * 10):
+        for query in (lambda: index.nearest(value, 0, 1), lambda: index.within(0, 0, value, 1),
+                      lambda: index.radius(0, value, 1), lambda: index.upsert("bad", value, 0)):
+            try:
+                query()
+            except ValueError:
+                continue
+            raise AssertionError(f"{value} was accepted")
+    assert "bad" not in index
+
+
+def test_nearest_far_query_terminates():
+    index, xy = random_index(n=50)
+    _, distances = index.nearest(MAX_COORDINATE, -MAX_COORDINATE, 5)
+    assert np.allclose(distances, brute_nearest(xy, MAX_COORDINATE, -MAX_COORDINATE, 5))
+
+
+def test_empty_index():
+    index = PointIndex()
+    assert len(index.nearest(0, 0, 3)[0]) == 0
+    assert len(index.within(0, 0, 1, 1)) == 0
+
+
+def test_grid_pairs_finds_every_close_pair():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 20, size=(200, 2))
+    i, j = grid_pairs(points, 1.5)
+    found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i)  # no pair twice
+    distance = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    close = {(a, b) for a, b in zip(*np.nonzero(np.triu(distance <= 1.5, k=1)))}
+    assert close <= found
+
+
+TESTS = [
+    test_within_matches_brute_force,
+    test_radius_is_sorted_and_complete,
+    test_nearest_matches_brute_force,
+    test_incremental_updates,
+    test_points_on_a_line,
+    test_rejects_invalid_coordinates,
+    test_nearest_far_query_terminates,
+    test_empty_index,
+    test_grid_pairs_finds_every_close_pair,
+]
+
+
+def main():
+    print("🧪 Spatial Index Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
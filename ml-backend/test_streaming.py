@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the WebSocket frame stream helpers (streaming.py)
+
+    python test_streaming.py        # or: python -m pytest test_streaming.py
+"""
+
+import io
+import sys
+import asyncio
+
+import numpy as np
+from PIL import Image
+
+from streaming import FrameDecoder, LatestFrameSlot, parse_frame_message, parse_hints
+
+
+def jpeg(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 120, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_parse_frame_message():
+    frame = jpeg(16, 16)
+    assert parse_frame_message(frame, 7) == (7, frame)
+    assert parse_frame_message((1234).to_bytes(4, "big") + frame, 7) == (1234, frame)
+
+
+def test_parse_hints():
+    assert parse_hints('{"max_size": 480.0, "frame_skip": 2, "other": "x"}') == {"max_size": 480, "frame_skip": 2}
+    assert parse_hints("{}") == {}
+
+
+def test_parse_hints_rejects_malformed():
+    for text in ("not json", "[1, 2]", '"text"', '{"max_size": "big"}', '{"frame_skip": null}',
+                 '{"detect_every": true}', '{"max_size": NaN}', '{"max_size": Infinity}'):
+        try:
+            parse_hints(text)
+        except ValueError:
+            continue
+        raise AssertionError(f"{text} was accepted")
+
+
+def test_frame_decoder_scales_large_frames():
+    decoder = FrameDecoder(max_size=200)
+    frame, scale = decoder.decode(jpeg(1600, 1200))
+    assert max(frame.shape[:2]) == 200 and np.isclose(scale, 8.0)
+    frame, scale = decoder.decode(jpeg(100, 50))
+    assert frame.shape[:2] == (50, 100) and scale == 1.0
+
+
+def test_latest_frame_slot_keeps_newest():
+    async def scenario():
+        slot = LatestFrameSlot()
+        slot.put(1, b"a")
+        slot.put(2, b"b")
+        newest = await slot.get()
+        slot.close()
+        return newest, await slot.get(), slot.dropped
+
+    assert asyncio.run(scenario()) == ((2, b"b"), None, 1)
+
+
+TESTS = [
+    test_parse_frame_message,
+    test_parse_hints,
+    test_parse_hints_rejects_malformed,
+    test_frame_decoder_scales_large_frames,
+    test_latest_frame_slot_keeps_newest,
+]
+
+
+def main():
+    print("🧪 Frame Stream Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
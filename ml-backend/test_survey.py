@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline survey's checkpointing and writer thread (survey.py)
+
+    python test_survey.py        # or: python -m pytest test_survey.py
+"""
+
+import sys
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+from survey import Checkpoint, JsonlSink, SurveyWriter, to_record
+
+
+class FailingSink:
+    def write(self, records):
+        raise OSError("No space left on device")
+
+    def close(self):
+        pass
+
+
+def test_writer_checkpoints_chunks():
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / "survey.jsonl"
+        checkpoint = Checkpoint(output.with_name("survey.jsonl.checkpoint"))
+        writer = SurveyWriter(JsonlSink(output, checkpoint), checkpoint, chunk_size=2)
+        writer.start()
+        writer.put([to_record("a.jpg", None, "unreadable")])
+        writer.put([to_record("b.jpg", {"image_info": {"width": 4, "height": 3}, "count": 0, "plants": []})])
+        writer.put([to_record("c.jpg", None, "unreadable")])
+        writer.put(None)
+        writer.join()
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [line["image"] for line in lines] == ["a.jpg", "b.jpg", "c.jpg"]
+        resumed = Checkpoint(checkpoint.path)
+        assert [entry["offset"] for entry in resumed.entries][-1] == output.stat().st_size
+        assert resumed.completed() == {"a.jpg", "b.jpg", "c.jpg"}
+        assert resumed.completed(include_failed=False) == {"b.jpg"}
+
+
+def test_writer_failure_does_not_hang_producer():
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Checkpoint(Path(directory) / "out.checkpoint")
+        writer = SurveyWriter(FailingSink(), checkpoint, chunk_size=1)
+        writer.start()
+        raised = []
+
+        def produce():
+            try:
+                for i in range(20):  # far more than the queue holds
+                    writer.put([to_record(f"{i}.jpg", None, "unreadable")])
+                writer.put(None)
+            except OSError as e:
+                raised.append(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        producer.join(timeout=10)
+        assert not producer.is_alive(), "producer blocked on a dead writer"
+        assert raised and "No space" in str(raised[0])
+
+
+TESTS = [
+    test_writer_checkpoints_chunks,
+    test_writer_failure_does_not_hang_producer,
+]
+
+
+def main():
+    print("🧪 Survey Writer Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for W3C trace context and OTLP/JSON span export (tracing.py)
+
+    python test_tracing.py        # or: python -m pytest test_tracing.py
+"""
+
+import sys
+
+from tracing import SpanContext, Tracer, otlp_request, otlp_value, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+class ListExporter:
+    def __init__(self):
+        self.payloads = []
+
+    def export(self, payload):
+        self.payloads.append(payload)
+
+
+def test_parse_traceparent():
+    context = parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (TRACE_ID, SPAN_ID, True)
+    assert parse_traceparent(f" 00-{TRACE_ID.upper()}-{SPAN_ID}-00 ").sampled is False
+    # Future versions may append fields
+    assert parse_traceparent(f"01-{TRACE_ID}-{SPAN_ID}-01-extra").trace_id == TRACE_ID
+
+
+def test_parse_traceparent_rejects_invalid():
+    for value in (None, "", "garbage", f"ff-{TRACE_ID}-{SPAN_ID}-01", f"00-{TRACE_ID}-{SPAN_ID}-01-extra",
+                  f"00-{'0' * 32}-{SPAN_ID}-01", f"00-{TRACE_ID}-{'0' * 16}-01", f"00-{TRACE_ID[:-1]}-{SPAN_ID}-01"):
+        assert parse_traceparent(value) is None, value
+
+
+def test_traceparent_round_trip():
+    context = SpanContext(TRACE_ID, SPAN_ID, True)
+    parsed = parse_traceparent(context.traceparent())
+    assert (parsed.trace_id, parsed.span_id, parsed.sampled) == (TRACE_ID, SPAN_ID, True)
+
+
+def test_sampling_follows_parent_and_rate_limit():
+    tracer = Tracer(ListExporter(), sample_ratio=0.0, max_per_second=2)
+    assert tracer.start_span("a", SpanContext(TRACE_ID, SPAN_ID, False)).context.sampled is False
+    sampled = [tracer.start_span("a", SpanContext(TRACE_ID, SPAN_ID, True)).context.sampled for _ in range(5)]
+    assert sampled[:2] == [True, True] and not any(sampled[2:])
+    # A new trace with ratio 0 is never sampled, but still gets ids to propagate
+    span = tracer.start_span("a")
+    assert not span.context.sampled and len(span.context.trace_id) == 32
+
+
+def test_child_spans_export_as_one_trace():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_ratio=1.0)
+    root = tracer.start_span("GET /", attributes={"http.request.method": "GET"})
+    child = root.child("inference", {"imgsz": 640})
+    child.set_error("boom")
+    child.end()
+    root.end()
+    tracer.start()
+    tracer.stop()
+    spans = [span for payload in exporter.payloads
+             for span in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert [span["name"] for span in spans] == ["inference", "GET /"]
+    assert spans[0]["traceId"] == spans[1]["traceId"] == root.context.trace_id
+    assert spans[0]["parentSpanId"] == root.context.span_id and "parentSpanId" not in spans[1]
+    assert spans[0]["status"] == {"code": 2, "message": "boom"}
+
+
+def test_otlp_encoding():
+    assert otlp_value(True) == {"boolValue": True}
+    assert otlp_value(3) == {"intValue": "3"}
+    assert otlp_value(0.5) == {"doubleValue": 0.5}
+    assert otlp_value([1, "a"]) == {"arrayValue": {"values": [{"intValue": "1"}, {"stringValue": "a"}]}}
+    resource = otlp_request([], {"service.name": "ml-backend"})["resourceSpans"][0]["resource"]
+    assert resource == {"attributes": [{"key": "service.name", "value": {"stringValue": "ml-backend"}}]}
+
+
+TESTS = [
+    test_parse_traceparent,
+    test_parse_traceparent_rejects_invalid,
+    test_traceparent_round_trip,
+    test_sampling_follows_parent_and_rate_limit,
+    test_child_spans_export_as_one_trace,
+    test_otlp_encoding,
+]
+
+
+def main():
+    print("🧪 Tracing Tests")
+    print("=" * 45)
+    failed = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    print("=" * 45)
+    print(f"{len(TESTS) - failed}/{len(TESTS)} passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import secrets
+import threading
+import urllib.request
+from typing import Dict, Any, List, Optional
+
+from metrics import metrics
+from scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+SAMPLED_FLAG = 0x01
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+
+
+class SpanContext:
+    """W3C trace context: 32-hex trace id, 16-hex span id and the sampled flag"""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a ``traceparent`` header; None when absent or invalid (the trace then starts here)"""
+    match = TRACEPARENT_RE.match(value.strip().lower()) if value else None
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    # Version ff is forbidden; version 00 has nothing after the flags; all-zero ids are invalid
+    if version == "ff" or (version == "00" and rest) or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & SAMPLED_FLAG))
+
+
+class Span:
+    """A timed operation. Spans of unsampled traces keep their context for propagation but record nothing."""
+
+    __slots__ = ("tracer", "name", "context", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str] = None,
+                 kind: int = KIND_INTERNAL, start_ns: Optional[int] = None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        if self.recording:
+            self.attributes.update(attributes)
+
+    def set_error(self, message: str):
+        if self.recording:
+            self.error = message
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns if end_ns is not None else time.time_ns()
+            if self.recording:
+                self.tracer.export(self)
+
+    def child(self, name: str, attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None) -> "Span":
+        span = Span(self.tracer, name, SpanContext(self.context.trace_id, secrets.token_hex(8), self.context.sampled),
+                    self.context.span_id, start_ns=start_ns)
+        if attributes:
+            span.set_attributes(attributes)
+        return span
+
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    """OTLP/JSON AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    encoded = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": otlp_attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+def otlp_request(spans: List[Span], resource: Dict[str, Any]) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of finished spans"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": otlp_attributes(resource)},
+        "scopeSpans": [{"scope": {"name": "ml-backend"}, "spans": [otlp_span(span) for span in spans]}],
+    }]}
+
+
+class FileExporter:
+    """Appends one OTLP/JSON export request per line (the collector file exporter's format)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class OTLPHttpExporter:
+    """POSTs OTLP/JSON to ``<endpoint>/v1/traces`` (OpenTelemetry collector or Jaeger/Tempo OTLP receivers)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, payload: Dict[str, Any]):
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Creates spans and exports finished ones in batches from a background thread.
+
+    A trace is recorded when the incoming ``traceparent`` says it was sampled or,
+    for traces that start here, with probability ``sample_ratio`` (decided from
+    the trace id, so every worker agrees). Either way at most ``max_per_second``
+    new traces are recorded, so tracing cost stays flat at full load. Like the
+    analysis writer, export never blocks requests: spans beyond ``max_queue`` are
+    dropped and counted in ``/metrics``.
+    """
+
+    def __init__(self, exporter=None, sample_ratio: float = 0.05, max_per_second: float = 20,
+                 resource: Optional[Dict[str, Any]] = None, flush_interval_ms: int = 1000,
+                 max_batch: int = 512, max_queue: int = 10000):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self.limit = TokenBucket(max_per_second, max(1.0, max_per_second))
+        self.limit_lock = threading.Lock()
+        self.resource = {"service.name": "ml-backend", **(resource or {})}
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Export everything still buffered and stop the exporter thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample(self, trace_id: str, parent: Optional[SpanContext]) -> bool:
+        wanted = parent.sampled if parent is not None else int(trace_id[16:], 16) < self.sample_ratio * 2 ** 64
+        if not wanted:
+            return False
+        with self.limit_lock:
+            if not self.limit.try_acquire(1):
+                metrics.inc("tracing.rate_limited")
+                return False
+        metrics.inc("tracing.traces_sampled")
+        return True
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, kind: int = KIND_SERVER,
+                   attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """Entry span of a request, continuing ``parent``'s trace when there is one"""
+        trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        sampled = self.enabled and self._sample(trace_id, parent)
+        span = Span(self, name, SpanContext(trace_id, secrets.token_hex(8), sampled),
+                    parent.span_id if parent is not None else None, kind)
+        if attributes:
+            span.set_attributes(attributes)
+        return span
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("tracing.spans_dropped")
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Span]):
+        try:
+            self.exporter.export(otlp_request(batch, self.resource))
+            metrics.inc("tracing.spans_exported", len(batch))
+        except Exception as e:
+            metrics.inc("tracing.export_errors")
+            logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            batch = self._drain()
+            while batch:
+                self._write(batch)
+                batch = self._drain() if len(batch) == self.max_batch else []
+        # Final flush on shutdown
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+
+def tracer_from_env(resource: Optional[Dict[str, Any]] = None) -> Tracer:
+    """Tracer configured by TRACE_EXPORTER (none|file|otlp) and the TRACE_* settings"""
+    kind = os.getenv("TRACE_EXPORTER", "none")
+    exporter = None
+    if kind == "file":
+        exporter = FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    elif kind == "otlp":
+        exporter = OTLPHttpExporter(os.getenv("TRACE_OTLP_ENDPOINT",
+                                              os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")))
+    elif kind != "none":
+        logger.warning(f"Unknown TRACE_EXPORTER {kind!r}, tracing disabled")
+    return Tracer(exporter,
+                  sample_ratio=float(os.getenv("TRACE_SAMPLE_RATIO", "0.05")),
+                  max_per_second=float(os.getenv("TRACE_MAX_PER_SECOND", "20")),
+                  resource=resource)
+
+
+class TracingMiddleware:
+    """Server span per HTTP request, continuing the caller's W3C ``traceparent``.
+
+    The span is available to endpoints as ``request.state.span`` and its context
+    is returned in the ``traceparent`` response header so clients can find the
+    trace.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(TRACEPARENT_HEADER.encode(), b"").decode("latin-1"))
+        span = self.tracer.start_span(f"{scope['method']} {scope['path']}", parent, attributes={
+            "http.request.method": scope["method"],
+            "url.path": scope["path"],
+        })
+        scope.setdefault("state", {})["span"] = span
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                span.set_attributes({"http.response.status_code": message["status"]})
+                if message["status"] >= 500:
+                    span.set_error(f"HTTP {message['status']}")
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (TRACEPARENT_HEADER.encode(), span.context.traceparent().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except Exception as e:
+            span.set_error(repr(e))
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                span.name = f"{scope['method']} {route.path}"
+                span.set_attributes({"http.route": route.path})
+            span.end()
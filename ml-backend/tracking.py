@@ -0,0 +1,259 @@
+import logging
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Match rows to columns greedily by descending IoU above ``threshold``"""
+    matches = []
+    if iou.size == 0:
+        return matches
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols])
+    used_rows, used_cols = set(), set()
+    for row, col in zip(rows[order], cols[order]):
+        if row not in used_rows and col not in used_cols:
+            matches.append((int(row), int(col)))
+            used_rows.add(row)
+            used_cols.add(col)
+    return matches
+
+
+def bbox_to_array(bbox: Dict[str, float]) -> np.ndarray:
+    return np.array([bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]], dtype=np.float64)
+
+
+def array_to_bbox(box: np.ndarray) -> Dict[str, float]:
+    x1, y1, x2, y2 = (float(v) for v in box)
+    return {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1}
+
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter over (cx, cy, w, h) as used by SORT/ByteTrack"""
+
+    def __init__(self, box: np.ndarray):
+        cx, cy, w, h = self._to_cxcywh(box)
+        self.state = np.array([cx, cy, w, h, 0, 0, 0, 0], dtype=np.float64)
+        scale = max(w, h)
+        self.covariance = np.diag([scale, scale, scale, scale, 10 * scale, 10 * scale, 10 * scale, 10 * scale]) ** 2 * 0.01
+        self.transition = np.eye(8)
+        self.transition[:4, 4:] = np.eye(4)
+        self.measurement = np.eye(4, 8)
+
+    @staticmethod
+    def _to_cxcywh(box: np.ndarray) -> np.ndarray:
+        return np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, box[2] - box[0], box[3] - box[1]])
+
+    def _noise(self, scale_position: float, scale_velocity: float) -> np.ndarray:
+        size = max(self.state[2], self.state[3], 1.0)
+        position = (scale_position * size) ** 2
+        velocity = (scale_velocity * size) ** 2
+        return np.diag([position] * 4 + [velocity] * 4)
+
+    def predict(self) -> np.ndarray:
+        self.state = self.transition @ self.state
+        self.state[2:4] = np.maximum(self.state[2:4], 1.0)
+        self.covariance = self.transition @ self.covariance @ self.transition.T + self._noise(0.05, 0.00625)
+        return self.box
+
+    def update(self, box: np.ndarray):
+        innovation_cov = self.measurement @ self.covariance @ self.measurement.T + self._noise(0.05, 0)[:4, :4]
+        gain = self.covariance @ self.measurement.T @ np.linalg.inv(innovation_cov)
+        self.state = self.state + gain @ (self._to_cxcywh(box) - self.measurement @ self.state)
+        self.covariance = (np.eye(8) - gain @ self.measurement) @ self.covariance
+
+    @property
+    def box(self) -> np.ndarray:
+        cx, cy, w, h = self.state[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+class Track:
+    """A plant followed across frames; keeps the label of its most confident detection"""
+
+    def __init__(self, track_id: int, detection: Dict[str, Any]):
+        self.track_id = track_id
+        self.filter = KalmanBoxFilter(bbox_to_array(detection["bbox"]))
+        self.detection = dict(detection)
+        self.best_confidence = detection["confidence"]
+        self.hits = 1
+        self.missed = 0
+
+    def update(self, detection: Dict[str, Any]):
+        self.filter.update(bbox_to_array(detection["bbox"]))
+        self.hits += 1
+        self.missed = 0
+        # Keep the identity (label, category, ...) of the best observation so labels stay stable
+        if detection["confidence"] >= self.best_confidence:
+            self.best_confidence = detection["confidence"]
+            self.detection = dict(detection)
+        else:
+            self.detection["confidence"] = detection["confidence"]
+
+    def to_detection(self, interpolated: bool) -> Dict[str, Any]:
+        detection = dict(self.detection)
+        detection["bbox"] = array_to_bbox(self.filter.box)
+        detection["track_id"] = self.track_id
+        detection["interpolated"] = interpolated
+        return detection
+
+
+class PlantTracker:
+    """ByteTrack-style association of detections to tracks.
+
+    High-confidence detections are matched to predicted track boxes first; the
+    remaining tracks then get a second chance against low-confidence detections,
+    which keeps plants that briefly dip in confidence from spawning new ids.
+    """
+
+    def __init__(self, high_threshold: float = 0.5, match_iou: float = 0.3, low_match_iou: float = 0.5,
+                 max_missed: int = 30, min_hits: int = 1):
+        self.high_threshold = high_threshold
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def predict(self) -> List[Dict[str, Any]]:
+        """Advance every track one frame and return the interpolated boxes"""
+        for track in self.tracks:
+            track.filter.predict()
+        return [
+            track.to_detection(interpolated=True)
+            for track in self.tracks
+            if track.missed == 0 and track.hits >= self.min_hits
+        ]
+
+    def update(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Associate a fresh set of detections and return tracked detections with ids"""
+        for track in self.tracks:
+            track.filter.predict()
+
+        high = [d for d in detections if d["confidence"] >= self.high_threshold]
+        low = [d for d in detections if d["confidence"] < self.high_threshold]
+        unmatched_tracks = list(range(len(self.tracks)))
+
+        # First association: confident detections against all tracks
+        unmatched_high = self._associate(high, unmatched_tracks, self.match_iou)
+        # Second association: weak detections only refresh existing tracks
+        self._associate(low, unmatched_tracks, self.low_match_iou)
+
+        for track_index in unmatched_tracks:
+            self.tracks[track_index].missed += 1
+        for detection in unmatched_high:
+            self.tracks.append(Track(self._next_id, detection))
+            self._next_id += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        return [
+            track.to_detection(interpolated=False)
+            for track in self.tracks
+            if track.missed == 0 and track.hits >= self.min_hits
+        ]
+
+    def _associate(self, detections: List[Dict[str, Any]], unmatched_tracks: List[int],
+                   threshold: float) -> List[Dict[str, Any]]:
+        """Match detections to the still-unmatched tracks in place; return unmatched detections"""
+        if not detections or not unmatched_tracks:
+            return list(detections)
+        track_boxes = np.array([self.tracks[i].filter.box for i in unmatched_tracks])
+        detection_boxes = np.array([bbox_to_array(d["bbox"]) for d in detections])
+        matches = greedy_match(iou_matrix(track_boxes, detection_boxes), threshold)
+        matched_detections = set()
+        matched_tracks = set()
+        for row, col in matches:
+            self.tracks[unmatched_tracks[row]].update(detections[col])
+            matched_detections.add(col)
+            matched_tracks.add(unmatched_tracks[row])
+        unmatched_tracks[:] = [i for i in unmatched_tracks if i not in matched_tracks]
+        return [d for i, d in enumerate(detections) if i not in matched_detections]
+
+
+class SceneChangeDetector:
+    """Cheap frame-difference metric on a tiny grayscale thumbnail"""
+
+    def __init__(self, threshold: float = 12.0, thumbnail_size: Tuple[int, int] = (64, 36)):
+        self.threshold = threshold
+        self.thumbnail_size = thumbnail_size
+        self._reference: Optional[np.ndarray] = None
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def difference(self, frame: np.ndarray) -> float:
+        """Mean absolute difference (0-255) between ``frame`` and the last keyframe"""
+        if self._reference is None:
+            return float("inf")
+        return float(np.mean(np.abs(self.thumbnail(frame) - self._reference)))
+
+    def changed(self, frame: np.ndarray) -> bool:
+        return self.difference(frame) > self.threshold
+
+    def set_reference(self, frame: np.ndarray):
+        self._reference = self.thumbnail(frame)
+
+
+class TemporalDetector:
+    """Runs full detection only on keyframes and interpolates tracks in between.
+
+    A keyframe is taken every ``detect_every`` frames, when the scene changes
+    beyond ``scene_change_threshold``, or when the frame size changes (e.g. a
+    new resolution hint).
+    """
+
+    def __init__(self, detect_every: int = 5, scene_change_threshold: float = 12.0,
+                 tracker: Optional[PlantTracker] = None):
+        self.detect_every = max(1, detect_every)
+        self.tracker = tracker or PlantTracker()
+        self.scene = SceneChangeDetector(scene_change_threshold)
+        self._frames_since_keyframe = 0
+        self._frame_shape: Optional[Tuple[int, ...]] = None
+        self.keyframes = 0
+        self.interpolated_frames = 0
+
+    def is_keyframe(self, frame: np.ndarray) -> bool:
+        if frame.shape != self._frame_shape:
+            self.tracker.reset()
+            return True
+        if self._frames_since_keyframe + 1 >= self.detect_every:
+            return True
+        return self.scene.changed(frame)
+
+    def process(self, frame: np.ndarray,
+                detect: Callable[[np.ndarray], List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return (tracked detections, keyframe) for one frame"""
+        if self.is_keyframe(frame):
+            self._frame_shape = frame.shape
+            self._frames_since_keyframe = 0
+            self.scene.set_reference(frame)
+            self.keyframes += 1
+            return self.tracker.update(detect(frame)), True
+
+        self._frames_since_keyframe += 1
+        self.interpolated_frames += 1
+        return self.tracker.predict(), False
@@ -4,11 +4,14 @@ One-Click YOLOv5 Test for Virtual Garden
 Run this after starting the backend to verify AI detection
 """
 
-import requests
-import json
 from PIL import Image, ImageDraw
 import io
 
+from garden_client import PlantDetectionClient, PlantDetectionError
+
+# Pooled client shared by all calls below
+client = PlantDetectionClient(timeout=20)
+
 def create_plant_test_image():
     """Create a clear plant image for testing"""
     img = Image.new('RGB', (640, 480), color=(135, 206, 235))  # Sky blue
@@ -61,12 +64,7 @@ def test_yolov5_detection():
     
     # Check backend status first
     try:
-        health = requests.get("http://localhost:8000/health", timeout=3)
-        if health.status_code != 200:
-            print("❌ Backend not responding correctly")
-            return False
-        
-        health_data = health.json()
+        health_data = client.health(timeout=3)
         print(f"✅ Backend Status: {health_data.get('status')}")
         print(f"✅ Model Loaded: {health_data.get('model_loaded')}")
         
@@ -87,67 +85,58 @@ def test_yolov5_detection():
     # Convert to API format
     img_bytes = io.BytesIO()
     test_img.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
+    image = ('test_plant.png', img_bytes.getvalue())
     
     # Test plant detection
     print("\n🤖 Running YOLOv5 detection...")
     try:
-        files = {'file': ('test_plant.png', img_bytes, 'image/png')}
-        response = requests.post("http://localhost:8000/api/detect-plants", 
-                               files=files, timeout=20)
+        data = client.detect(image)
         
-        if response.status_code == 200:
-            data = response.json()
-            
-            print("✅ YOLOv5 Detection Complete!")
-            print(f"   Success: {data.get('success')}")
-            print(f"   Plants detected: {data.get('count', 0)}")
-            print(f"   Image size: {data.get('image_info', {}).get('width')}x{data.get('image_info', {}).get('height')}")
-            
-            # Show detection results
-            plants = data.get('plants', [])
-            if plants:
-                print(f"\n🌿 Detected Plants:")
-                for i, plant in enumerate(plants):
-                    bbox = plant.get('bbox', {})
-                    print(f"   {i+1}. {plant.get('label').upper()}")
-                    print(f"      Confidence: {plant.get('confidence', 0):.3f}")
-                    print(f"      Location: ({bbox.get('x1', 0):.0f},{bbox.get('y1', 0):.0f}) "
-                          f"to ({bbox.get('x2', 0):.0f},{bbox.get('y2', 0):.0f})")
-                    print(f"      Category: {plant.get('category')}")
-                    print(f"      Scientific: {plant.get('scientific_name')}")
-                    if plant.get('properties'):
-                        print(f"      Properties: {', '.join(plant.get('properties', []))}")
-                    print()
-                
-                # Test image quality analysis
-                print("🔬 Testing image quality analysis...")
-                img_bytes.seek(0)
-                files = {'file': ('test_plant.png', img_bytes, 'image/png')}
-                quality_response = requests.post("http://localhost:8000/api/analyze-image-quality", 
-                                               files=files, timeout=10)
-                
-                if quality_response.status_code == 200:
-                    quality_data = quality_response.json()
-                    quality = quality_data.get('quality', {})
-                    print(f"   Quality Score: {quality.get('score', 0):.1f}/100")
-                    print(f"   Brightness: {quality.get('brightness', 0):.1f}")
-                    print(f"   Contrast: {quality.get('contrast', 0):.1f}")
-                    print(f"   Sharpness: {quality.get('sharpness', 0):.1f}")
-                    print(f"   Recommendation: {quality.get('recommendation')}")
-                
-            else:
-                print("\n⚠️  No plants detected")
-                print("   This might be normal - YOLOv5 general model may not detect synthetic plants")
-                print("   Try with a real plant image for better results")
+        print("✅ YOLOv5 Detection Complete!")
+        print(f"   Success: {data.get('success')}")
+        print(f"   Plants detected: {data.get('count', 0)}")
+        print(f"   Image size: {data.get('image_info', {}).get('width')}x{data.get('image_info', {}).get('height')}")
+        
+        # Show detection results
+        plants = data.get('plants', [])
+        if plants:
+            print(f"\n🌿 Detected Plants:")
+            for i, plant in enumerate(plants):
+                bbox = plant.get('bbox', {})
+                print(f"   {i+1}. {plant.get('label').upper()}")
+                print(f"      Confidence: {plant.get('confidence', 0):.3f}")
+                print(f"      Location: ({bbox.get('x1', 0):.0f},{bbox.get('y1', 0):.0f}) "
+                      f"to ({bbox.get('x2', 0):.0f},{bbox.get('y2', 0):.0f})")
+                print(f"      Category: {plant.get('category')}")
+                print(f"      Scientific: {plant.get('scientific_name')}")
+                if plant.get('properties'):
+                    print(f"      Properties: {', '.join(plant.get('properties', []))}")
+                print()
             
-            return True
+            # Test image quality analysis
+            print("🔬 Testing image quality analysis...")
+            try:
+                quality = client.analyze_image_quality(image, timeout=10)
+                print(f"   Quality Score: {quality.get('score', 0):.1f}/100")
+                print(f"   Brightness: {quality.get('brightness', 0):.1f}")
+                print(f"   Contrast: {quality.get('contrast', 0):.1f}")
+                print(f"   Sharpness: {quality.get('sharpness', 0):.1f}")
+                print(f"   Recommendation: {quality.get('recommendation')}")
+            except PlantDetectionError:
+                pass
             
         else:
-            print(f"❌ Detection failed: {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
-            
+            print("\n⚠️  No plants detected")
+            print("   This might be normal - YOLOv5 general model may not detect synthetic plants")
+            print("   Try with a real plant image for better results")
+        
+        return True
+        
+    except PlantDetectionError as e:
+        print(f"❌ Detection failed: {e.status_code}")
+        print(f"Response: {e}")
+        return False
+        
     except Exception as e:
         print(f"❌ Detection error: {e}")
         return False
@@ -4,35 +4,39 @@ Test script for Virtual Garden Plant Detection Backend
 Verifies backend setup and API functionality
 """
 
-import requests
-import json
-import time
 import sys
-from pathlib import Path
+
+from garden_client import (
+    PlantDetectionClient,
+    PlantDetectionError,
+    BackendUnavailableError,
+    BackendTimeoutError,
+)
+
+# One pooled client shared by every test (keep-alive connections are reused)
+client = PlantDetectionClient(timeout=10)
 
 def test_backend_connection():
     """Test if backend is running and accessible"""
     print("🔍 Testing backend connection...")
     
     try:
-        response = requests.get("http://localhost:8000/health", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Backend is running!")
-            print(f"   Status: {data.get('status')}")
-            print(f"   Model loaded: {data.get('model_loaded')}")
-            return True
-        else:
-            print(f"❌ Backend returned status code: {response.status_code}")
-            return False
-    except requests.exceptions.ConnectionError:
+        data = client.health(timeout=5)
+        print("✅ Backend is running!")
+        print(f"   Status: {data.get('status')}")
+        print(f"   Model loaded: {data.get('model_loaded')}")
+        return True
+    except BackendUnavailableError:
         print("❌ Cannot connect to backend on http://localhost:8000")
         print("   Make sure the backend is running:")
         print("   python launch_backend.py")
         return False
-    except requests.exceptions.Timeout:
+    except BackendTimeoutError:
         print("❌ Backend connection timeout")
         return False
+    except PlantDetectionError as e:
+        print(f"❌ Backend returned status code: {e.status_code}")
+        return False
     except Exception as e:
         print(f"❌ Error testing backend: {e}")
         return False
@@ -50,27 +54,21 @@ def test_plant_detection():
         img = Image.new('RGB', (200, 200), color='green')
         img_bytes = io.BytesIO()
         img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
         
         # Test the API
-        files = {'file': ('test_plant.png', img_bytes, 'image/png')}
-        response = requests.post("http://localhost:8000/api/detect-plants", 
-                               files=files, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Plant detection API working!")
-            print(f"   Success: {data.get('success')}")
-            print(f"   Plants detected: {data.get('count', 0)}")
-            if data.get('plants'):
-                for i, plant in enumerate(data['plants'][:2]):  # Show first 2
-                    print(f"   Plant {i+1}: {plant.get('label')} "
-                          f"(confidence: {plant.get('confidence', 0):.2f})")
-            return True
-        else:
-            print(f"❌ API returned status code: {response.status_code}")
-            return False
+        data = client.detect(('test_plant.png', img_bytes.getvalue()))
+        print("✅ Plant detection API working!")
+        print(f"   Success: {data.get('success')}")
+        print(f"   Plants detected: {data.get('count', 0)}")
+        if data.get('plants'):
+            for i, plant in enumerate(data['plants'][:2]):  # Show first 2
+                print(f"   Plant {i+1}: {plant.get('label')} "
+                      f"(confidence: {plant.get('confidence', 0):.2f})")
+        return True
             
+    except PlantDetectionError as e:
+        print(f"❌ API returned status code: {e.status_code}")
+        return False
     except ImportError:
         print("⚠️  PIL not available for image testing")
         print("   API endpoint exists but cannot test with actual image")
@@ -84,20 +82,17 @@ def test_api_endpoints():
     print("\n🔗 Testing API endpoints...")
     
     endpoints = [
-        ("GET", "/", "Root endpoint"),
-        ("GET", "/health", "Health check"),
-        ("GET", "/api/plant-categories", "Plant categories")
+        (client.root, "Root endpoint"),
+        (client.health, "Health check"),
+        (client.plant_categories, "Plant categories")
     ]
     
-    for method, endpoint, description in endpoints:
+    for call, description in endpoints:
         try:
-            url = f"http://localhost:8000{endpoint}"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                print(f"   ✅ {description}: OK")
-            else:
-                print(f"   ❌ {description}: Status {response.status_code}")
+            call(timeout=5)
+            print(f"   ✅ {description}: OK")
+        except PlantDetectionError as e:
+            print(f"   ❌ {description}: Status {e.status_code}")
         except Exception as e:
             print(f"   ❌ {description}: Error - {e}")
 
@@ -12,11 +12,16 @@ from pathlib import Path
 from PIL import Image, ImageDraw
 import io
 
+from garden_client import PlantDetectionClient, PlantDetectionError
+
 class SystemTester:
     def __init__(self):
         self.frontend_url = "http://localhost:5173"  # Vite dev server
         self.backend_url = "http://localhost:8000"   # FastAPI backend
         self.api_proxy_url = "http://localhost:5173/api"  # Express proxy
+        # Pooled connections: one session for the frontend/proxy, one client for the ML API
+        self.session = requests.Session()
+        self.backend = PlantDetectionClient(self.backend_url, timeout=15)
         
     def print_header(self, title):
         print("\n" + "="*60)
@@ -34,7 +39,7 @@ class SystemTester:
         self.print_header("FRONTEND TESTS")
         
         try:
-            response = requests.get(self.frontend_url, timeout=5)
+            response = self.session.get(self.frontend_url, timeout=5)
             if response.status_code == 200:
                 self.print_test("Frontend Loading", True, "React application is running")
             else:
@@ -46,7 +51,7 @@ class SystemTester:
         
         # Test API proxy endpoints
         try:
-            response = requests.get(f"{self.api_proxy_url}/ping", timeout=5)
+            response = self.session.get(f"{self.api_proxy_url}/ping", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 self.print_test("API Proxy", True, data.get("message", "OK"))
@@ -57,7 +62,7 @@ class SystemTester:
         
         # Test garden status endpoint
         try:
-            response = requests.get(f"{self.api_proxy_url}/garden/status", timeout=5)
+            response = self.session.get(f"{self.api_proxy_url}/garden/status", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 self.print_test("Garden API", True, f"Version: {data.get('version')}")
@@ -80,7 +85,7 @@ class SystemTester:
         
         # Test backend status check
         try:
-            response = requests.get(f"{self.api_proxy_url}/backend/status", timeout=5)
+            response = self.session.get(f"{self.api_proxy_url}/backend/status", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 running = data.get('running', False)
@@ -94,7 +99,7 @@ class SystemTester:
                 if not running:
                     # Try to start backend
                     print("\n🚀 Attempting to start backend...")
-                    start_response = requests.post(f"{self.api_proxy_url}/backend/start", timeout=30)
+                    start_response = self.session.post(f"{self.api_proxy_url}/backend/start", timeout=30)
                     if start_response.status_code == 200:
                         start_data = start_response.json()
                         self.print_test("Backend Start Command", start_data.get('success', False), 
@@ -122,7 +127,7 @@ class SystemTester:
         max_retries = 6
         for attempt in range(max_retries):
             try:
-                response = requests.get(f"{self.api_proxy_url}/backend/status", timeout=5)
+                response = self.session.get(f"{self.api_proxy_url}/backend/status", timeout=5)
                 if response.status_code == 200:
                     data = response.json()
                     running = data.get('running', False)
@@ -154,15 +159,13 @@ class SystemTester:
         self.print_header("DIRECT BACKEND TESTS")
         
         try:
-            response = requests.get(f"{self.backend_url}/health", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                self.print_test("Backend Health", True, f"Status: {data.get('status')}")
-                self.print_test("Model Loaded", data.get('model_loaded', False))
-                return True
-            else:
-                self.print_test("Backend Health", False, f"Status: {response.status_code}")
-                return False
+            data = self.backend.health(timeout=5)
+            self.print_test("Backend Health", True, f"Status: {data.get('status')}")
+            self.print_test("Model Loaded", data.get('model_loaded', False))
+            return True
+        except PlantDetectionError as e:
+            self.print_test("Backend Health", False, f"Status: {e.status_code}")
+            return False
         except Exception as e:
             self.print_test("Backend Health", False, f"Error: {e}")
             return False
@@ -183,37 +186,27 @@ class SystemTester:
         # Convert to bytes
         img_bytes = io.BytesIO()
         img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
+        image = ('test_plant.png', img_bytes.getvalue())
         
         # Test through direct backend
         backend_success = False
         try:
-            files = {'file': ('test_plant.png', img_bytes, 'image/png')}
-            response = requests.post(f"{self.backend_url}/api/detect-plants", 
-                                   files=files, timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                plant_count = data.get('count', 0)
-                self.print_test("Direct Backend Detection", True, f"Detected {plant_count} plants")
-                backend_success = True
-            else:
-                self.print_test("Direct Backend Detection", False, f"Status: {response.status_code}")
+            data = self.backend.detect(image)
+            plant_count = data.get('count', 0)
+            self.print_test("Direct Backend Detection", True, f"Detected {plant_count} plants")
+            backend_success = True
+        except PlantDetectionError as e:
+            self.print_test("Direct Backend Detection", False, f"Status: {e.status_code}")
         except Exception as e:
             self.print_test("Direct Backend Detection", False, f"Error: {e}")
         
         # Test image quality analysis
         try:
-            img_bytes.seek(0)
-            files = {'file': ('test_plant.png', img_bytes, 'image/png')}
-            response = requests.post(f"{self.backend_url}/api/analyze-image-quality", 
-                                   files=files, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                quality = data.get('quality', {})
-                score = quality.get('score', 0)
-                self.print_test("Image Quality Analysis", True, f"Score: {score:.1f}/100")
-            else:
-                self.print_test("Image Quality Analysis", False, f"Status: {response.status_code}")
+            quality = self.backend.analyze_image_quality(image, timeout=10)
+            score = quality.get('score', 0)
+            self.print_test("Image Quality Analysis", True, f"Score: {score:.1f}/100")
+        except PlantDetectionError as e:
+            self.print_test("Image Quality Analysis", False, f"Status: {e.status_code}")
         except Exception as e:
             self.print_test("Image Quality Analysis", False, f"Error: {e}")
         
@@ -224,22 +217,19 @@ class SystemTester:
         self.print_header("PLANT DATABASE TESTS")
         
         try:
-            response = requests.get(f"{self.backend_url}/api/plant-categories", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                categories = data.get('categories', {})
-                plant_count = len(categories)
-                self.print_test("Plant Database", True, f"{plant_count} plants available")
-                
-                # Show sample plants
-                if plant_count > 0:
-                    sample_plants = list(categories.keys())[:5]
-                    self.print_test("Sample Plants", True, f"{', '.join(sample_plants)}")
-                
-                return True
-            else:
-                self.print_test("Plant Database", False, f"Status: {response.status_code}")
-                return False
+            categories = self.backend.plant_categories(timeout=5)
+            plant_count = len(categories)
+            self.print_test("Plant Database", True, f"{plant_count} plants available")
+            
+            # Show sample plants
+            if plant_count > 0:
+                sample_plants = list(categories.keys())[:5]
+                self.print_test("Sample Plants", True, f"{', '.join(sample_plants)}")
+            
+            return True
+        except PlantDetectionError as e:
+            self.print_test("Plant Database", False, f"Status: {e.status_code}")
+            return False
         except Exception as e:
             self.print_test("Plant Database", False, f"Error: {e}")
             return False